@@ -8,7 +8,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app import app, db, Car
+from app import app, db, Car, bump_inventory_version
 
 def add_sample_cars():
     with app.app_context():
@@ -122,6 +122,7 @@ def add_sample_cars():
         for car_data in sample_cars:
             car = Car(**car_data)
             db.session.add(car)
+        bump_inventory_version()
 
         # Salvar no banco
         db.session.commit()
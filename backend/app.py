@@ -1,14 +1,53 @@
 # -*- coding: utf-8 -*-
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended import jwt_required as verified_jwt_required
+from flask_jwt_extended.exceptions import NoAuthorizationError
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm.exc import StaleDataError
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.test import EnvironBuilder
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import wrap_file
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from functools import wraps
+import glob
+import gzip
+import hashlib
+import json
 import os
+import queue
+import threading
+import time
+import uuid
 from dotenv import load_dotenv
 
+from catalog_snapshot import CatalogSnapshot, CarFragments, json_object
+from similar_cars import SimilarCarsIndex
+from image_processing import (ImageTranscoder, EXTENSION_MIMETYPES, IMAGE_EXTENSIONS, PENDING_MARKER, decode_data_uri,
+                              output_extension)
+import pricing_analytics
+from rate_limiting import RateLimiter
+from request_profiling import RequestProfile, PROFILE_ID_PATTERN, list_profiles, prune_profiles
+from saved_search_index import SavedSearchIndex
+from view_tracking import ViewBuffer, decay_factor
+
+try:
+    import brotli
+except ImportError:  # Brotli é opcional; sem ele as respostas usam apenas gzip
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos, apenas entre threads
+    fcntl = None
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -16,16 +55,76 @@ app = Flask(__name__)
 
 # Configurações
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///buycarr.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///buycarr.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-string')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+# Preço a partir do qual um carro (que não seja camioneta ou autocarro) é classificado como premium
+app.config['PREMIUM_PRICE_THRESHOLD'] = float(os.getenv('PREMIUM_PRICE_THRESHOLD', 1000000))
+# Pasta dos corpos do catálogo compartilhados entre os workers do gunicorn
+app.config['CATALOG_CACHE_DIR'] = os.getenv('CATALOG_CACHE_DIR', os.path.join(app.instance_path, 'catalog_cache'))
+# Imagens enviadas: convertidas em segundo plano para IMAGE_FORMAT, sem EXIF e com no máximo IMAGE_MAX_DIMENSION px
+app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'uploads')
+app.config['IMAGE_FORMAT'] = os.getenv('IMAGE_FORMAT', 'webp')  # webp ou jpeg
+app.config['IMAGE_MAX_DIMENSION'] = int(os.getenv('IMAGE_MAX_DIMENSION', 1600))
+app.config['IMAGE_QUALITY'] = int(os.getenv('IMAGE_QUALITY', 80))
+app.config['IMAGE_WORKERS'] = int(os.getenv('IMAGE_WORKERS', 2))
+# Limite de requisições por IP/usuário (ver RATE_LIMITS); o estado fica num SQLite próprio, compartilhado entre workers
+app.config['RATE_LIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+app.config['RATE_LIMIT_DB'] = os.getenv('RATE_LIMIT_DB', os.path.join(app.instance_path, 'rate_limits.db'))
+# Quantos proxies na frente do app preenchem X-Forwarded-For (1 no Render); 0 usa o IP da conexão
+app.config['TRUSTED_PROXY_COUNT'] = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+# Perfis de requisições pedidos por admins com o cabeçalho X-Profile (ver /api/admin/profiles)
+app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+app.config['PROFILE_MAX_FILES'] = int(os.getenv('PROFILE_MAX_FILES', 200))
+# Visualizações de carros: gravadas em lote a cada VIEW_FLUSH_INTERVAL segundos por worker;
+# a pontuação "em alta" cai pela metade a cada TRENDING_HALF_LIFE_HOURS sem visualizações
+app.config['VIEW_FLUSH_INTERVAL'] = float(os.getenv('VIEW_FLUSH_INTERVAL', 5))
+app.config['TRENDING_HALF_LIFE_HOURS'] = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 24))
+
+if app.config['TRUSTED_PROXY_COUNT']:
+    proxies = app.config['TRUSTED_PROXY_COUNT']
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
 
 # Inicializar extensões
 db = SQLAlchemy(app)
 jwt = JWTManager(app)
 CORS(app)
 
+# Chave do environ em que /api/batch entrega às sub-requisições a identidade já verificada
+BATCH_IDENTITY_ENVIRON_KEY = 'buycarr.batch_identity'
+
+def jwt_required(optional=False, **options):
+    """jwt_required do flask_jwt_extended, exceto dentro de /api/batch.
+    
+    O lote verifica o token uma vez; as sub-requisições rodam no mesmo app context (o g
+    com o token decodificado é o do lote) e recebem a identidade pelo environ, sem
+    decodificar e validar o JWT de novo a cada sub-requisição.
+    """
+    def decorate(view):
+        verified_view = verified_jwt_required(optional=optional, **options)(view)
+        
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            batch_identity = request.environ.get(BATCH_IDENTITY_ENVIRON_KEY)
+            if batch_identity is None:
+                return verified_view(*args, **kwargs)
+            if batch_identity['identity'] is None and not optional:
+                raise NoAuthorizationError('Missing Authorization Header')
+            return app.ensure_sync(view)(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def register_sql_functions(dbapi_connection, connection_record):
+    # Decaimento da pontuação "em alta" dentro do UPSERT das visualizações (o SQLite nem sempre
+    # é compilado com as funções matemáticas)
+    half_life = app.config['TRENDING_HALF_LIFE_HOURS'] * 3600
+    dbapi_connection.create_function('trending_decay', 1, lambda elapsed: decay_factor(elapsed, half_life),
+                                     deterministic=True)
+
+with app.app_context():
+    event.listen(db.engine, 'connect', register_sql_functions)
+
 # Modelos do banco de dados
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -34,8 +133,8 @@ class User(db.Model):
     phone = db.Column(db.String(20), nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     profile_photo = db.Column(db.String(500), nullable=True)
-    is_admin = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    is_admin = db.Column(db.Boolean, default=False, index=True)  # contato do admin busca is_admin=1
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     def __repr__(self):
         return f'<User {self.email}>'
@@ -52,14 +151,37 @@ class Car(db.Model):
     transmission = db.Column(db.String(20), nullable=False)
     car_type = db.Column(db.String(50), nullable=False)  # Novo campo: tipo do carro
     description = db.Column(db.Text, nullable=True)
-    status = db.Column(db.String(20), default='Disponível')
+    status = db.Column(db.String(20), default='Disponível', index=True)
     images = db.Column(db.Text, nullable=True)  # JSON string com URLs das imagens
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    version = db.Column(db.Integer, nullable=False, default=1)  # Controle de concorrência otimista
+    category = db.Column(db.String(20), nullable=True, index=True)  # Calculada em classify_car
+    
+    __mapper_args__ = {'version_id_col': version}
     
     def __repr__(self):
         return f'<Car {self.brand} {self.model}>'
 
+# Categorias do catálogo, na ordem em que o app as exibe
+CAR_CATEGORIES = ['normal', 'premium', 'pickup', 'bus']
+
+def classify_car(car_type, price):
+    """Mesma regra que o CarCatalog.js aplicava no dispositivo"""
+    car_type = (car_type or '').lower()
+    if 'truck' in car_type or 'camioneta' in car_type:
+        return 'pickup'
+    if 'bus' in car_type or 'ônibus' in car_type:
+        return 'bus'
+    if price is not None and price >= app.config['PREMIUM_PRICE_THRESHOLD']:
+        return 'premium'
+    return 'normal'
+
+@db.event.listens_for(Car, 'before_insert')
+@db.event.listens_for(Car, 'before_update')
+def set_car_category(mapper, connection, car):
+    car.category = classify_car(car.car_type, car.price)
+
 class Favorite(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -81,13 +203,22 @@ class Reservation(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     car_id = db.Column(db.Integer, db.ForeignKey('car.id'), nullable=False)
     message = db.Column(db.Text, nullable=True)
-    status = db.Column(db.String(20), default='Pendente')  # Pendente, Aprovado, Rejeitado, Concluído
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    status = db.Column(db.String(20), default='Pendente')  # Pendente, Vendido, Cancelado
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # lista do admin, mais recentes primeiro
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1)  # Controle de concorrência otimista
     
     user = db.relationship('User', backref=db.backref('reservations', lazy=True))
     car = db.relationship('Car', backref=db.backref('reservations', lazy=True))
     
+    __table_args__ = (
+        # Vendas por período filtram status='Vendido' e agrupam pela data da venda (updated_at)
+        db.Index('ix_reservation_status_updated_at', 'status', 'updated_at'),
+        # Reservas do usuário (e a mais recente por carro no bundle)
+        db.Index('ix_reservation_user_id_created_at', 'user_id', 'created_at'),
+    )
+    __mapper_args__ = {'version_id_col': version}
+    
     def __repr__(self):
         return f'<Reservation {self.id}>'
 
@@ -98,18 +229,639 @@ class Comment(db.Model):
     comment = db.Column(db.Text, nullable=False)
     rating = db.Column(db.Integer, nullable=False)  # 1-5 estrelas
     photo = db.Column(db.String(500), nullable=True)  # URL da foto
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     user = db.relationship('User', backref=db.backref('comments', lazy=True))
     car = db.relationship('Car', backref=db.backref('comments', lazy=True))
     
+    # Comentários de um carro, mais recentes primeiro, e o resumo de notas por carro
+    __table_args__ = (db.Index('ix_comment_car_id_created_at', 'car_id', 'created_at'),)
+    
     def __repr__(self):
         return f'<Comment {self.id}>'
 
+class DeletedCar(db.Model):
+    # Marca de exclusão (tombstone) usada pela sincronização incremental do catálogo
+    id = db.Column(db.Integer, primary_key=True)
+    car_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<DeletedCar {self.car_id}>'
+
+class InventoryState(db.Model):
+    # Linha única com a versão do inventário, incrementada em toda alteração de carros
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class EventOutbox(db.Model):
+    # Eventos gravados na mesma transação da alteração; cada worker os lê e envia via SSE
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    # Ids nunca reutilizados, mesmo depois que a limpeza esvazia a tabela (Last-Event-ID)
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    def __repr__(self):
+        return f'<EventOutbox {self.id} {self.event_type}>'
+
+class UploadSession(db.Model):
+    # Upload retomável: as partes são gravadas em ordem num arquivo .part até completar size bytes
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=True)  # hash esperado do arquivo completo
+    received = db.Column(db.Integer, nullable=False, default=0)  # bytes confirmados
+    status = db.Column(db.String(20), default='Aberto')  # Aberto, Concluído
+    url = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<UploadSession {self.id} {self.received}/{self.size}>'
+
+class Job(db.Model):
+    # Fila de tarefas em segundo plano, gravada na mesma transação da alteração que a originou;
+    # executada por worker.py, fora do tempo de resposta das rotas
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON com os argumentos do handler
+    dedupe_key = db.Column(db.String(100), nullable=True)  # no máximo um job pendente por chave
+    status = db.Column(db.String(20), nullable=False, default='Pendente')  # Pendente, Executando, Concluído, Falhou
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # próxima tentativa
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        # O worker busca o próximo job pendente por run_at
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+        # Vários commits seguidos geram um único job pendente (INSERT OR IGNORE em enqueue_job)
+        db.Index('ux_job_pending_dedupe_key', 'dedupe_key', unique=True,
+                 sqlite_where=db.text("status = 'Pendente'")),
+    )
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.job_type} {self.status}>'
+
+class CarView(db.Model):
+    # Visualizações por carro, gravadas em lote pelo buffer de cada worker (flush_car_views)
+    car_id = db.Column(db.Integer, db.ForeignKey('car.id'), primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    trending_score = db.Column(db.Float, nullable=False, default=0.0)  # decaída até scored_at
+    scored_at = db.Column(db.Float, nullable=False)  # time.time() da última gravação
+    last_viewed_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<CarView {self.car_id} {self.views}>'
+
+class SavedSearch(db.Model):
+    # Filtros salvos pelo comprador; filtros ausentes (None) aceitam qualquer valor
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=True)
+    brand = db.Column(db.String(50), nullable=True)
+    car_type = db.Column(db.String(50), nullable=True)
+    min_price = db.Column(db.Float, nullable=True)
+    max_price = db.Column(db.Float, nullable=True)
+    min_year = db.Column(db.Integer, nullable=True)
+    max_year = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SavedSearch {self.id} {self.user_id}>'
+
+class SavedSearchMatch(db.Model):
+    # Carro novo ou alterado que satisfez uma busca salva (gravado pelo job saved_searches.match)
+    id = db.Column(db.Integer, primary_key=True)
+    saved_search_id = db.Column(db.Integer, db.ForeignKey('saved_search.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    car_id = db.Column(db.Integer, db.ForeignKey('car.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # O mesmo carro não é avisado duas vezes para a mesma busca (INSERT OR IGNORE no job)
+        db.UniqueConstraint('saved_search_id', 'car_id', name='unique_saved_search_car'),
+        # Lista de correspondências do usuário, mais recentes primeiro
+        db.Index('ix_saved_search_match_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f'<SavedSearchMatch {self.saved_search_id} -> {self.car_id}>'
+
+# Sincronização incremental: margem para gravações que fizeram commit depois do
+# token ser emitido e por quanto tempo os tombstones são mantidos
+SYNC_OVERLAP = timedelta(seconds=5)
+SYNC_TOMBSTONE_RETENTION = timedelta(days=30)
+
+def car_to_dict(car):
+    return {
+        'id': car.id,
+        'brand': car.brand,
+        'model': car.model,
+        'year': car.year,
+        'mileage': car.mileage,
+        'price': car.price,
+        'color': car.color,
+        'fuel_type': car.fuel_type,
+        'transmission': car.transmission,
+        'car_type': car.car_type,
+        'description': car.description,
+        'status': car.status,
+        'images': car.images,
+        'created_at': car.created_at.isoformat(),
+        'version': car.version,
+        'category': car.category
+    }
+
+def json_rows(rows, to_dict):
+    """Lista JSON (bytes) codificada linha a linha conforme as linhas saem do cursor"""
+    return b'[' + b', '.join(app.json.dumps(to_dict(row)).encode('utf-8') for row in rows) + b']'
+
+def bump_inventory_version():
+    """Invalida os caches do catálogo em todos os workers quando a transação fizer commit"""
+    db.session.execute(
+        db.update(InventoryState).where(InventoryState.id == 1).values(version=InventoryState.version + 1)
+    )
+    # O worker monta o catálogo da nova versão antes que a primeira requisição precise
+    enqueue_job('catalog.warm', dedupe_key='catalog.warm')
+
+def get_inventory_version():
+    return db.session.execute(db.select(InventoryState.version).where(InventoryState.id == 1)).scalar() or 0
+
+def record_event(event_type, **payload):
+    """Adiciona um evento ao outbox; só fica visível para o SSE quando a transação fizer commit"""
+    db.session.add(EventOutbox(event_type=event_type, payload=json.dumps(payload)))
+
+# Handlers dos jobs em segundo plano, por tipo; executados por worker.py
+JOB_HANDLERS = {}
+
+def job_handler(job_type):
+    """Registra o handler de um tipo de job. Handlers podem rodar mais de uma vez
+    para o mesmo job (nova tentativa após falha ou queda do worker), então devem ser idempotentes."""
+    def register(function):
+        JOB_HANDLERS[job_type] = function
+        return function
+    return register
+
+def enqueue_job(job_type, dedupe_key=None, delay=None, **payload):
+    """Agenda um job; só fica visível para o worker quando a transação fizer commit.
+    
+    Com dedupe_key, um job igual ainda pendente absorve este (nenhuma linha nova).
+    """
+    now = datetime.utcnow()
+    db.session.execute(
+        db.insert(Job).prefix_with('OR IGNORE').values(
+            job_type=job_type, payload=json.dumps(payload), dedupe_key=dedupe_key, status='Pendente',
+            attempts=0, run_at=now + (delay or timedelta()), created_at=now
+        )
+    )
+
+# Eventos em tempo real (SSE)
+EVENT_POLL_INTERVAL = 1.0  # segundos entre leituras do outbox por worker
+EVENT_HEARTBEAT_INTERVAL = 15  # comentário SSE para manter a conexão viva em proxies
+EVENT_STREAM_MAX_DURATION = 300  # o cliente reconecta com Last-Event-ID depois disso
+EVENT_RETENTION = timedelta(days=1)
+EVENT_REPLAY_LIMIT = 500
+
+def event_to_sse(event_id, event_type, payload):
+    return f'id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n'
+
+class EventBroker:
+    """Lê o outbox uma vez por intervalo e repassa os eventos às conexões SSE deste worker.
+    
+    Cada worker do gunicorn tem o seu broker; o SQLite é o meio compartilhado entre eles,
+    então uma consulta por intervalo atende qualquer número de painéis conectados.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self._last_id = 0
+        self._last_prune = 0
+    
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=1000)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                with app.app_context():
+                    self._last_id = db.session.execute(db.select(db.func.max(EventOutbox.id))).scalar() or 0
+                    db.session.remove()
+                self._thread = threading.Thread(target=self._run, name='event-broker', daemon=True)
+                self._thread.start()
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+    
+    def _run(self):
+        while True:
+            time.sleep(EVENT_POLL_INTERVAL)
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                with app.app_context():
+                    rows = db.session.execute(
+                        db.select(EventOutbox.id, EventOutbox.event_type, EventOutbox.payload)
+                        .where(EventOutbox.id > self._last_id)
+                        .order_by(EventOutbox.id)
+                        .limit(EVENT_REPLAY_LIMIT)
+                    ).all()
+                    self._prune()
+                    db.session.remove()
+            except Exception as e:
+                print(f"Erro ao ler eventos do outbox: {e}")
+                continue
+            
+            if not rows:
+                continue
+            self._last_id = rows[-1].id
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for row in rows:
+                for subscriber in subscribers:
+                    try:
+                        subscriber.put_nowait(tuple(row))
+                    except queue.Full:
+                        # Cliente lento: descarta, ele recupera pelo Last-Event-ID ao reconectar
+                        pass
+    
+    def _prune(self):
+        if time.time() - self._last_prune < 600:
+            return
+        self._last_prune = time.time()
+        # O evento mais recente nunca é apagado: bancos criados antes do AUTOINCREMENT reutilizariam
+        # ids a partir de 1 com a tabela vazia, e brokers e clientes (Last-Event-ID) com o id antigo
+        # perderiam todos os eventos novos
+        db.session.execute(
+            db.delete(EventOutbox).where(
+                EventOutbox.created_at < datetime.utcnow() - EVENT_RETENTION,
+                EventOutbox.id < db.select(db.func.max(EventOutbox.id)).scalar_subquery()
+            )
+        )
+        db.session.commit()
+
+event_broker = EventBroker()
+
+# Compressão das respostas
+COMPRESSION_MIN_SIZE = 1024  # bytes; abaixo disso o cabeçalho custa mais do que economiza
+COMPRESSION_LEVELS = {
+    # (dinâmico, pré-comprimido em cache)
+    'gzip': (6, 9),
+    'br': (4, 9),  # qualidade 10+ custa ~15x mais CPU para ~5% menos bytes
+}
+CATALOG_CACHE_MAX_ENTRIES = 64
+
+def negotiate_encoding():
+    offers = ['br', 'gzip'] if brotli else ['gzip']
+    return request.accept_encodings.best_match(offers) or 'identity'
+
+def compress_body(body, encoding, cached=False):
+    level = COMPRESSION_LEVELS[encoding][1 if cached else 0]
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+# Corpos JSON do catálogo por chave, válidos enquanto a versão do inventário não mudar.
+# Corpos grandes ficam em arquivos <chave>-<versão>.<codificação> em CATALOG_CACHE_DIR,
+# escritos por um único processo e servidos por todos os workers direto do page cache
+# (sendfile no gunicorn). Corpos pequenos ficam só na memória do worker.
+catalog_cache = {}
+catalog_cache_lock = threading.Lock()
+catalog_build_lock = threading.Lock()
+
+@contextmanager
+def catalog_file_lock(path):
+    """Trava exclusiva entre processos (flock) para montar cada chave uma única vez"""
+    with open(path, 'a') as file:
+        if fcntl:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+def write_catalog_files(base, body):
+    encodings = [encoding for encoding in COMPRESSION_LEVELS if encoding != 'br' or brotli]
+    # identity por último: sua presença indica que todas as codificações estão prontas
+    for encoding in encodings + ['identity']:
+        data = body if encoding == 'identity' else compress_body(body, encoding, cached=True)
+        tmp_path = f'{base}.{encoding}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, f'{base}.{encoding}')
+
+def prune_catalog_files(digest, version):
+    # Remove apenas versões anteriores; quem já abriu o arquivo continua lendo normalmente
+    prefix = f'{digest}-'
+    for entry in os.scandir(app.config['CATALOG_CACHE_DIR']):
+        if not entry.name.startswith(prefix):
+            continue
+        file_version = entry.name[len(prefix):].split('.', 1)[0]
+        if file_version.isdigit() and int(file_version) < version:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+def load_catalog_entry(cache_key, version, build_payload, rebuild=False):
+    """Entrada do cache para a versão; com rebuild, regrava os arquivos mesmo que o identity exista"""
+    cache_dir = app.config['CATALOG_CACHE_DIR']
+    digest = hashlib.sha1(cache_key.encode('utf-8')).hexdigest()[:16]
+    base = os.path.join(cache_dir, f'{digest}-{version}')
+    shared_entry = {'version': version, 'body': None, 'base': base}
+    if not rebuild and os.path.exists(f'{base}.identity'):
+        return shared_entry
+    
+    # Single-flight: entre threads pelo lock do processo, entre workers pelo flock
+    with catalog_build_lock, catalog_file_lock(os.path.join(cache_dir, f'{digest}.lock')):
+        if not rebuild and os.path.exists(f'{base}.identity'):
+            return shared_entry
+        body = build_payload()
+        if not isinstance(body, bytes):
+            body = app.json.dumps(body).encode('utf-8')
+        if len(body) < COMPRESSION_MIN_SIZE:
+            return {'version': version, 'body': body, 'base': None}
+        write_catalog_files(base, body)
+        prune_catalog_files(digest, version)
+        return shared_entry
+
+def clear_catalog_cache():
+    with catalog_cache_lock:
+        catalog_cache.clear()
+    cache_dir = app.config['CATALOG_CACHE_DIR']
+    digests = {name.split('-', 1)[0] for name in os.listdir(cache_dir) if not name.endswith(('.lock', '.tmp'))}
+    for digest in digests:
+        # Com o flock da chave: outro processo pode estar gravando essa chave agora (ex.: worker.py
+        # aquecendo o cache enquanto um worker do gunicorn inicia), e apagar só parte dos arquivos
+        # deixaria um identity apontando para codificações que não existem mais
+        with catalog_file_lock(os.path.join(cache_dir, f'{digest}.lock')):
+            for path in glob.glob(os.path.join(cache_dir, f'{digest}-*')):
+                if path.endswith('.tmp'):
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+# Snapshot colunar do catálogo usado pelas rotas de leitura no lugar do ORM.
+# Um snapshot novo é montado quando a versão do inventário muda e trocado numa única atribuição.
+CATALOG_SNAPSHOT_COLUMNS = [
+    Car.id, Car.brand, Car.model, Car.year, Car.mileage, Car.price, Car.color, Car.fuel_type,
+    Car.transmission, Car.car_type, Car.description, Car.status, Car.images, Car.created_at,
+    Car.updated_at, Car.version, Car.category
+]
+catalog_snapshot_state = {'current': (None, None)}
+catalog_snapshot_lock = threading.Lock()
+# JSON de cada carro já serializado; a cada versão só os carros alterados são refeitos
+car_fragments = CarFragments(app.json.dumps)
+
+def get_catalog_snapshot():
+    version = get_inventory_version()
+    current_version, snapshot = catalog_snapshot_state['current']
+    if current_version == version:
+        return snapshot
+    
+    with catalog_snapshot_lock:
+        current_version, snapshot = catalog_snapshot_state['current']
+        if current_version != version:
+            rows = db.session.execute(db.select(*CATALOG_SNAPSHOT_COLUMNS).order_by(Car.id)).all()
+            snapshot = CatalogSnapshot(rows)
+            catalog_snapshot_state['current'] = (version, snapshot)
+            car_fragments.retain(snapshot)
+        return snapshot
+
+def catalog_response(cache_key, build_payload, retry=True):
+    version = get_inventory_version()
+    etag = f'"{cache_key}-{version}"'
+    if request.if_none_match.contains_weak(etag.strip('"')):
+        return Response(status=304, headers={'ETag': etag, 'Vary': 'Accept-Encoding'})
+    
+    entry = catalog_cache.get(cache_key)
+    if entry is None or entry['version'] != version:
+        entry = load_catalog_entry(cache_key, version, build_payload)
+        with catalog_cache_lock:
+            if len(catalog_cache) >= CATALOG_CACHE_MAX_ENTRIES:
+                catalog_cache.clear()
+            catalog_cache[cache_key] = entry
+    
+    file = None
+    encoding = 'identity'
+    if entry['body'] is None:
+        encoding = negotiate_encoding()
+        try:
+            file = open(f"{entry['base']}.{encoding}", 'rb')
+        except FileNotFoundError:
+            # Outro worker já publicou uma versão mais nova e removeu esta: recarrega uma vez.
+            # Se o arquivo da mesma versão continuar faltando, os arquivos são regravados.
+            with catalog_cache_lock:
+                catalog_cache.pop(cache_key, None)
+            if retry:
+                return catalog_response(cache_key, build_payload, retry=False)
+            entry = load_catalog_entry(cache_key, version, build_payload, rebuild=True)
+            if entry['body'] is None:
+                file = open(f"{entry['base']}.{encoding}", 'rb')
+            else:
+                encoding = 'identity'  # o corpo refeito ficou pequeno e só está na memória
+    
+    if file is None:
+        response = Response(entry['body'], status=200, mimetype='application/json')
+    else:
+        response = Response(wrap_file(request.environ, file), status=200,
+                            mimetype='application/json', direct_passthrough=True)
+        response.content_length = os.fstat(file.fileno()).st_size
+    
+    response.headers['ETag'] = etag
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+# Perfil sob demanda: um admin envia "X-Profile: 1" e a requisição roda sob o cProfile, com as
+# consultas SQL cronometradas. Sem o cabeçalho, o custo é uma leitura de cabeçalho por requisição:
+# os listeners do SQL só ficam registrados enquanto há alguma requisição sendo perfilada.
+active_profile = threading.local()
+profile_listeners_lock = threading.Lock()
+profile_listeners = {'count': 0}
+
+def profile_sql_start(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(active_profile, 'current', None)
+    if profile is not None:
+        profile.sql_started()
+
+def profile_sql_end(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(active_profile, 'current', None)
+    if profile is not None:
+        profile.sql_finished(statement, parameters)
+
+def set_profile_listeners(delta):
+    with profile_listeners_lock:
+        profile_listeners['count'] += delta
+        if delta > 0 and profile_listeners['count'] == 1:
+            event.listen(db.engine, 'before_cursor_execute', profile_sql_start)
+            event.listen(db.engine, 'after_cursor_execute', profile_sql_end)
+        elif delta < 0 and profile_listeners['count'] == 0:
+            event.remove(db.engine, 'before_cursor_execute', profile_sql_start)
+            event.remove(db.engine, 'after_cursor_execute', profile_sql_end)
+
+@app.before_request
+def start_profile():
+    if not request.headers.get('X-Profile'):
+        return
+    try:
+        verify_jwt_in_request(optional=True)
+        user_id = get_jwt_identity()
+    except Exception:
+        return  # token inválido: a requisição segue normalmente, sem perfil
+    user = db.session.get(User, int(user_id)) if user_id else None
+    if not user or not user.is_admin:
+        return
+    
+    profile = RequestProfile(request.method, request.full_path.rstrip('?'), request.endpoint, user.id)
+    set_profile_listeners(1)
+    active_profile.current = profile
+    active_profile.environ = request.environ
+    profile.start()
+
+def stop_profile():
+    profile = getattr(active_profile, 'current', None)
+    # As sub-requisições de /api/batch também passam por teardown_request; só a requisição
+    # que iniciou o perfil o encerra
+    if profile is None or active_profile.environ is not request.environ:
+        return None
+    profile.stop()
+    active_profile.current = active_profile.environ = None
+    set_profile_listeners(-1)
+    return profile
+
+@app.after_request
+def finish_profile(response):
+    # Registrado antes de compress_response, então roda depois dele e inclui a compressão
+    profile = stop_profile()
+    if profile is None:
+        return response
+    try:
+        profile_dir = app.config['PROFILE_DIR']
+        os.makedirs(profile_dir, exist_ok=True)
+        profile.save(profile_dir, response.status_code)
+        prune_profiles(profile_dir, app.config['PROFILE_MAX_FILES'])
+        response.headers['X-Profile-Id'] = profile.id
+    except Exception as e:
+        print(f"Erro ao gravar o perfil da requisição: {e}")
+    return response
+
+@app.teardown_request
+def discard_profile(exc):
+    # Exceção não tratada: after_request não roda, mas o profiler e os listeners precisam ser desligados
+    stop_profile()
+
+@app.after_request
+def compress_response(response):
+    # Respostas JSON dinâmicas (reservas, comentários...) são comprimidas a cada requisição
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype != 'application/json'):
+        return response
+    
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_SIZE:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding == 'identity':
+        return response
+    
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def build_cars_body():
+    snapshot = get_catalog_snapshot()
+    return json_object(cars=car_fragments.render(snapshot, range(len(snapshot))))
+
+def build_categories_body():
+    snapshot = get_catalog_snapshot()
+    groups = {category: snapshot.rows_by_category.get(category, ()) for category in CAR_CATEGORIES}
+    return json_object(
+        categories=json_object(**{
+            category: car_fragments.render(snapshot, rows) for category, rows in groups.items()
+        }),
+        counts=app.json.dumps({category: len(rows) for category, rows in groups.items()}).encode('utf-8'),
+        premium_price_threshold=app.json.dumps(app.config['PREMIUM_PRICE_THRESHOLD']).encode('utf-8')
+    )
+
+# Limite de requisições: (capacidade do balde, segundos para reabastecê-lo por completo).
+# Rotas públicas caras de servir e o login (tentativas de senha); cada política tem um balde
+# por usuário autenticado ou, sem token, por IP.
+RATE_LIMITS = {
+    'auth': (10, 60),
+    'catalog': (120, 60),
+    'comments': (60, 60),
+}
+rate_limiter = RateLimiter(app.config['RATE_LIMIT_DB'])
+
+def rate_limit_client():
+    batch_identity = request.environ.get(BATCH_IDENTITY_ENVIRON_KEY)
+    if batch_identity is not None:
+        # Sub-requisição de /api/batch: o token já foi verificado pelo lote
+        identity = batch_identity['identity']
+        return f'user:{identity}' if identity else f'ip:{request.remote_addr}'
+    if request.headers.get('Authorization'):
+        try:
+            verify_jwt_in_request(optional=True)
+            identity = get_jwt_identity()
+        except Exception:
+            identity = None  # token inválido: a própria rota decide se o recusa
+        if identity:
+            return f'user:{identity}'
+    return f'ip:{request.remote_addr}'
+
+def rate_limit(policy):
+    """Recusa com 429 quando o cliente esgota o balde da política.
+    
+    Fica na própria rota (e não num before_request) para valer também dentro de /api/batch.
+    """
+    capacity, period = RATE_LIMITS[policy]
+    def decorate(view):
+        @wraps(view)
+        def limited(*args, **kwargs):
+            if app.config['RATE_LIMIT_ENABLED']:
+                try:
+                    allowed, remaining, retry_after = rate_limiter.hit(
+                        f'{policy}:{rate_limit_client()}', capacity, capacity / period)
+                except Exception as e:
+                    # Falha no armazenamento do limite não derruba a rota
+                    print(f"Erro no limite de requisições: {e}")
+                    allowed = True
+                if not allowed:
+                    response = jsonify({'error': 'Muitas requisições. Tente novamente mais tarde',
+                                        'retry_after': retry_after})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(retry_after)
+                    return response
+            return view(*args, **kwargs)
+        return limited
+    return decorate
+
 # Rotas da API
 
 # Autenticação
 @app.route('/api/auth/register', methods=['POST'])
+@rate_limit('auth')
 def register():
     try:
         data = request.get_json()
@@ -158,6 +910,7 @@ def register():
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
 @app.route('/api/auth/login', methods=['POST'])
+@rate_limit('auth')
 def login():
     try:
         data = request.get_json()
@@ -189,6 +942,7 @@ def login():
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
 @app.route('/api/auth/admin/login', methods=['POST'])
+@rate_limit('auth')
 def admin_login():
     try:
         data = request.get_json()
@@ -242,66 +996,160 @@ def get_current_user():
     except Exception as e:
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+# Visualizações e ranking "em alta". get_car só incrementa o contador do worker; o buffer grava
+# todos os carros vistos no intervalo num único UPSERT, decaindo a pontuação anterior até agora.
+CAR_VIEW_UPSERT = db.text('''
+INSERT INTO car_view (car_id, views, trending_score, scored_at, last_viewed_at)
+SELECT :car_id, :views, :views, :now, :viewed_at FROM car WHERE car.id = :car_id
+ON CONFLICT (car_id) DO UPDATE SET
+    views = views + excluded.views,
+    trending_score = trending_score * trending_decay(excluded.scored_at - scored_at) + excluded.views,
+    scored_at = excluded.scored_at,
+    last_viewed_at = excluded.last_viewed_at
+''')
+TRENDING_REFRESH = 30  # segundos entre releituras do ranking por worker
+TRENDING_TOP = 10  # carros em alta nas estatísticas do admin
+trending_cache = {'expires': 0, 'scores': {}}
+trending_lock = threading.Lock()
+
+def flush_car_views(counts):
+    now, viewed_at = time.time(), datetime.utcnow()
+    with app.app_context():
+        # Carros excluídos nesse meio tempo não estão em car e são ignorados pelo SELECT
+        db.session.execute(CAR_VIEW_UPSERT, [
+            {'car_id': car_id, 'views': views, 'now': now, 'viewed_at': viewed_at}
+            for car_id, views in sorted(counts.items())
+        ])
+        db.session.commit()
+
+car_views = ViewBuffer(flush_car_views, interval=app.config['VIEW_FLUSH_INTERVAL'])
+
+def get_trending_scores():
+    """{car_id: (pontuação decaída até agora, visualizações)}, relido a cada TRENDING_REFRESH segundos"""
+    if trending_cache['expires'] > time.time():
+        return trending_cache['scores']
+    
+    with trending_lock:
+        if trending_cache['expires'] <= time.time():
+            now = time.time()
+            half_life = app.config['TRENDING_HALF_LIFE_HOURS'] * 3600
+            rows = db.session.execute(
+                db.select(CarView.car_id, CarView.views, CarView.trending_score, CarView.scored_at)
+            )
+            trending_cache['scores'] = {
+                row.car_id: (row.trending_score * decay_factor(now - row.scored_at, half_life), row.views)
+                for row in rows
+            }
+            trending_cache['expires'] = now + TRENDING_REFRESH
+        return trending_cache['scores']
+
+def trending_rows(snapshot, rows):
+    """Linhas do snapshot da maior para a menor pontuação; empates mantêm a ordem do catálogo"""
+    scores = get_trending_scores()
+    ids = snapshot.ids
+    return sorted(rows, key=lambda row: -scores.get(ids[row], (0.0, 0))[0])
+
 # Carros
 @app.route('/api/cars', methods=['GET'])
+@rate_limit('catalog')
 def get_cars():
     try:
-        cars = Car.query.all()
-        cars_data = []
-        
-        for car in cars:
-            cars_data.append({
-                'id': car.id,
-                'brand': car.brand,
-                'model': car.model,
-                'year': car.year,
-                'mileage': car.mileage,
-                'price': car.price,
-                'color': car.color,
-                'fuel_type': car.fuel_type,
-                'transmission': car.transmission,
-                'car_type': car.car_type,
-                'description': car.description,
-                'status': car.status,
-                'images': car.images,
-                'created_at': car.created_at.isoformat()
-            })
-        
-        return jsonify({'cars': cars_data}), 200
+        category = request.args.get('category')
+        sort = request.args.get('sort')
+        if sort is not None and sort != 'trending':
+            return jsonify({'error': 'Ordenação inválida. Use: trending'}), 400
+        if category is not None and category not in CAR_CATEGORIES:
+            return jsonify({'error': f'Categoria inválida. Use uma de: {", ".join(CAR_CATEGORIES)}'}), 400
+        
+        if sort == 'trending':
+            # A ordem muda com as visualizações, não com o inventário: montada por requisição a partir
+            # dos fragmentos JSON já serializados, sem passar pelos arquivos do cache do catálogo
+            snapshot = get_catalog_snapshot()
+            rows = snapshot.rows_by_category.get(category, ()) if category else range(len(snapshot))
+            body = json_object(cars=car_fragments.render(snapshot, trending_rows(snapshot, rows)))
+            return Response(body, status=200, mimetype='application/json')
+        
+        if category is None:
+            return catalog_response('cars', build_cars_body)
+        
+        def build_category():
+            snapshot = get_catalog_snapshot()
+            rows = snapshot.rows_by_category.get(category, ())
+            return json_object(cars=car_fragments.render(snapshot, rows))
+        
+        return catalog_response(f'cars-category-{category}', build_category)
         
     except Exception as e:
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+# Catálogo agrupado por categoria, já na forma em que o app exibe as seções
+@app.route('/api/cars/categories', methods=['GET'])
+@rate_limit('catalog')
+def get_cars_by_category():
+    try:
+        return catalog_response('cars-categories', build_categories_body)
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
 @app.route('/api/cars/<int:car_id>', methods=['GET'])
 def get_car(car_id):
     try:
-        car = Car.query.get(car_id)
+        car_data = get_catalog_snapshot().get(car_id)
         
-        if not car:
+        if not car_data:
             return jsonify({'error': 'Carro não encontrado'}), 404
         
-        car_data = {
-            'id': car.id,
-            'brand': car.brand,
-            'model': car.model,
-            'year': car.year,
-            'mileage': car.mileage,
-            'price': car.price,
-            'color': car.color,
-            'fuel_type': car.fuel_type,
-            'transmission': car.transmission,
-            'car_type': car.car_type,
-            'description': car.description,
-            'status': car.status,
-            'images': car.images,
-            'created_at': car.created_at.isoformat()
-        }
-        
+        car_views.record(car_id)
         return jsonify({'car': car_data}), 200
         
     except Exception as e:
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+@app.route('/api/cars/changes', methods=['GET'])
+@rate_limit('catalog')
+def get_car_changes():
+    try:
+        # O token é emitido antes da consulta, assim nada gravado durante ela é perdido
+        now = datetime.utcnow()
+        since = request.args.get('since')
+        
+        if not since:
+            cars = Car.query.all()
+            return jsonify({
+                'cars': [car_to_dict(car) for car in cars],
+                'deleted': [],
+                'token': now.isoformat(),
+                'full': True
+            }), 200
+        
+        try:
+            since_dt = datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({'error': 'Token de sincronização inválido'}), 400
+        
+        # Tombstones mais antigos já foram removidos: o cliente precisa recarregar tudo
+        if since_dt < now - SYNC_TOMBSTONE_RETENTION:
+            return jsonify({'error': 'Token de sincronização expirado', 'full_reload': True}), 410
+        
+        window_start = since_dt - SYNC_OVERLAP
+        cars = Car.query.filter(Car.updated_at > window_start).all()
+        deleted = set(db.session.execute(
+            db.select(DeletedCar.car_id).where(DeletedCar.deleted_at > window_start)
+        ).scalars())
+        # O SQLite pode reutilizar o id de um carro excluído; o carro atual prevalece
+        deleted.difference_update(car.id for car in cars)
+        
+        return jsonify({
+            'cars': [car_to_dict(car) for car in cars],
+            'deleted': sorted(deleted),
+            'token': now.isoformat(),
+            'full': False
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
 @app.route('/api/cars', methods=['POST'])
 @jwt_required()
 def create_car():
@@ -348,25 +1196,14 @@ def create_car():
         print(f"Carro criado: {car}")
         
         db.session.add(car)
+        db.session.flush()
+        record_event('car.created', car_id=car.id, status=car.status)
+        enqueue_job('saved_searches.match', dedupe_key=f'saved_searches.match:{car.id}', car_id=car.id)
+        bump_inventory_version()
         db.session.commit()
         print("Carro salvo no banco de dados!")
         
-        car_data = {
-            'id': car.id,
-            'brand': car.brand,
-            'model': car.model,
-            'year': car.year,
-            'mileage': car.mileage,
-            'price': car.price,
-            'color': car.color,
-            'fuel_type': car.fuel_type,
-            'transmission': car.transmission,
-            'car_type': car.car_type,
-            'description': car.description,
-            'status': car.status,
-            'images': car.images,
-            'created_at': car.created_at.isoformat()
-        }
+        car_data = car_to_dict(car)
         
         print(f"Retornando sucesso: {car_data}")
         return jsonify({
@@ -379,6 +1216,15 @@ def create_car():
         db.session.rollback()
         return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
 
+def parse_version(value):
+    """Versão enviada pelo cliente para o controle otimista (None se não enviada).
+    Levanta ValueError se não for um número inteiro."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).strip().isdigit():
+        raise ValueError(f'Versão inválida: {value!r}')
+    return int(value)
+
 @app.route('/api/cars/<int:car_id>', methods=['PUT'])
 @jwt_required()
 def update_car(car_id):
@@ -396,6 +1242,20 @@ def update_car(car_id):
         
         data = request.get_json()
         
+        # Se o cliente enviou a versão que editou, rejeitar se o carro mudou desde então
+        try:
+            expected_version = parse_version(data.get('version'))
+        except ValueError:
+            return jsonify({'error': 'Versão inválida'}), 400
+        if expected_version is not None and expected_version != car.version:
+            return jsonify({
+                'error': 'Carro foi alterado por outro administrador. Recarregue e tente novamente.',
+                'version': car.version
+            }), 409
+        
+        # Campos usados pelas buscas salvas, para saber se o carro precisa ser comparado de novo
+        search_fields = (car.brand, car.car_type, car.price, car.year, car.status)
+        
         # Atualizar campos
         car.brand = data.get('brand', car.brand)
         car.model = data.get('model', car.model)
@@ -409,6 +1269,10 @@ def update_car(car_id):
         car.status = data.get('status', car.status)
         car.images = data.get('images', car.images)
         
+        record_event('car.updated', car_id=car.id, status=car.status)
+        if (car.brand, car.car_type, car.price, car.year, car.status) != search_fields:
+            enqueue_job('saved_searches.match', dedupe_key=f'saved_searches.match:{car.id}', car_id=car.id)
+        bump_inventory_version()
         db.session.commit()
         
         car_data = {
@@ -424,7 +1288,8 @@ def update_car(car_id):
             'description': car.description,
             'status': car.status,
             'images': car.images,
-            'created_at': car.created_at.isoformat()
+            'created_at': car.created_at.isoformat(),
+            'version': car.version
         }
         
         return jsonify({
@@ -432,6 +1297,10 @@ def update_car(car_id):
             'car': car_data
         }), 200
         
+    except StaleDataError:
+        # Outra requisição gravou o carro entre a leitura e o UPDATE
+        db.session.rollback()
+        return jsonify({'error': 'Carro foi alterado por outro administrador. Recarregue e tente novamente.'}), 409
     except Exception as e:
         print(f"ERRO na criação do carro: {e}")
         db.session.rollback()
@@ -458,7 +1327,15 @@ def delete_car(car_id):
         
         print(f"✅ Carro encontrado: {car.brand} {car.model}. Deletando...")
         
+        db.session.execute(db.delete(SavedSearchMatch).where(SavedSearchMatch.car_id == car_id))
+        db.session.execute(db.delete(CarView).where(CarView.car_id == car_id))
         db.session.delete(car)
+        
+        # Registrar tombstone para a sincronização incremental; os expirados são descartados pelo worker
+        db.session.add(DeletedCar(car_id=car_id))
+        enqueue_job('tombstones.prune', dedupe_key='tombstones.prune')
+        record_event('car.deleted', car_id=car_id)
+        bump_inventory_version()
         db.session.commit()
         
         print(f"✅ Carro {car_id} excluído com sucesso!")
@@ -472,6 +1349,7 @@ def delete_car(car_id):
 
 # Rota para criar usuário administrador padrão
 @app.route('/api/setup/admin', methods=['POST'])
+@rate_limit('auth')
 def create_admin_user():
     try:
         # Verificar se já existe um admin
@@ -576,23 +1454,27 @@ def get_profile():
 def get_favorites():
     try:
         user_id = get_jwt_identity()
-        favorites = Favorite.query.filter_by(user_id=int(user_id)).all()
-        
-        favorites_data = []
-        for favorite in favorites:
-            car_data = {
-                'id': favorite.car.id,
-                'brand': favorite.car.brand,
-                'model': favorite.car.model,
-                'year': favorite.car.year,
-                'price': favorite.car.price,
-                'images': favorite.car.images,
-                'favorite_id': favorite.id,
-                'added_at': favorite.created_at.isoformat()
-            }
-            favorites_data.append(car_data)
-        
-        return jsonify({'favorites': favorites_data}), 200
+        # Uma consulta com as colunas do carro já no JOIN; as linhas viram JSON direto, sem objetos do ORM.
+        # Ordem pelo índice único (user_id, car_id), a mesma que a consulta sem ORDER BY devolvia.
+        rows = db.session.execute(
+            db.select(Favorite.id.label('favorite_id'), Favorite.created_at, Car.id, Car.brand, Car.model,
+                      Car.year, Car.price, Car.images)
+            .join(Car, Car.id == Favorite.car_id)
+            .where(Favorite.user_id == int(user_id))
+            .order_by(Favorite.car_id)
+        )
+        body = json_object(favorites=json_rows(rows, lambda row: {
+            'id': row.id,
+            'brand': row.brand,
+            'model': row.model,
+            'year': row.year,
+            'price': row.price,
+            'images': row.images,
+            'favorite_id': row.favorite_id,
+            'added_at': row.created_at.isoformat()
+        }))
+        
+        return Response(body, status=200, mimetype='application/json')
         
     except Exception as e:
         return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
@@ -650,34 +1532,171 @@ def remove_favorite(favorite_id):
         db.session.rollback()
         return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
 
+# Buscas salvas
+SAVED_SEARCH_LIMIT = 50  # por usuário
+SAVED_SEARCH_MATCHES_LIMIT = 100
+
+def saved_search_to_dict(search):
+    return {
+        'id': search.id,
+        'name': search.name,
+        'brand': search.brand,
+        'car_type': search.car_type,
+        'min_price': search.min_price,
+        'max_price': search.max_price,
+        'min_year': search.min_year,
+        'max_year': search.max_year,
+        'created_at': search.created_at.isoformat()
+    }
+
+@app.route('/api/saved-searches', methods=['GET'])
+@jwt_required()
+def get_saved_searches():
+    try:
+        user_id = get_jwt_identity()
+        searches = SavedSearch.query.filter_by(user_id=int(user_id)).order_by(SavedSearch.id).all()
+        
+        return jsonify({'saved_searches': [saved_search_to_dict(search) for search in searches]}), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+@app.route('/api/saved-searches', methods=['POST'])
+@jwt_required()
+def create_saved_search():
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        
+        brand = (data.get('brand') or '').strip() or None
+        car_type = (data.get('car_type') or '').strip() or None
+        try:
+            min_price = float(data['min_price']) if data.get('min_price') not in (None, '') else None
+            max_price = float(data['max_price']) if data.get('max_price') not in (None, '') else None
+            min_year = int(data['min_year']) if data.get('min_year') not in (None, '') else None
+            max_year = int(data['max_year']) if data.get('max_year') not in (None, '') else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Preço e ano devem ser numéricos'}), 400
+        
+        if all(value is None for value in (brand, car_type, min_price, max_price, min_year, max_year)):
+            return jsonify({'error': 'Informe ao menos um filtro'}), 400
+        if min_price is not None and max_price is not None and min_price > max_price:
+            return jsonify({'error': 'Preço mínimo maior que o máximo'}), 400
+        if min_year is not None and max_year is not None and min_year > max_year:
+            return jsonify({'error': 'Ano mínimo maior que o máximo'}), 400
+        
+        if SavedSearch.query.filter_by(user_id=int(user_id)).count() >= SAVED_SEARCH_LIMIT:
+            return jsonify({'error': f'Limite de {SAVED_SEARCH_LIMIT} buscas salvas atingido'}), 400
+        
+        search = SavedSearch(
+            user_id=int(user_id),
+            name=(data.get('name') or '').strip()[:100] or None,
+            brand=brand,
+            car_type=car_type,
+            min_price=min_price,
+            max_price=max_price,
+            min_year=min_year,
+            max_year=max_year
+        )
+        db.session.add(search)
+        db.session.commit()
+        
+        return jsonify(saved_search_to_dict(search)), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+@app.route('/api/saved-searches/<int:search_id>', methods=['DELETE'])
+@jwt_required()
+def delete_saved_search(search_id):
+    try:
+        user_id = get_jwt_identity()
+        search = SavedSearch.query.filter_by(id=search_id, user_id=int(user_id)).first()
+        
+        if not search:
+            return jsonify({'error': 'Busca salva não encontrada'}), 404
+        
+        db.session.execute(db.delete(SavedSearchMatch).where(SavedSearchMatch.saved_search_id == search.id))
+        db.session.delete(search)
+        db.session.commit()
+        
+        return jsonify({'message': 'Busca salva removida'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+@app.route('/api/saved-searches/matches', methods=['GET'])
+@jwt_required()
+def get_saved_search_matches():
+    try:
+        user_id = get_jwt_identity()
+        limit = min(request.args.get('limit', SAVED_SEARCH_MATCHES_LIMIT, type=int), SAVED_SEARCH_MATCHES_LIMIT)
+        # Mais recentes primeiro, pelo índice (user_id, created_at)
+        rows = db.session.execute(
+            db.select(SavedSearchMatch.id, SavedSearchMatch.saved_search_id, SavedSearchMatch.created_at,
+                      SavedSearch.name, Car.id.label('car_id'), Car.brand, Car.model, Car.year, Car.price,
+                      Car.images, Car.status)
+            .join(SavedSearch, SavedSearch.id == SavedSearchMatch.saved_search_id)
+            .join(Car, Car.id == SavedSearchMatch.car_id)
+            .where(SavedSearchMatch.user_id == int(user_id))
+            .order_by(SavedSearchMatch.created_at.desc(), SavedSearchMatch.id.desc())
+            .limit(max(limit, 1))
+        )
+        body = json_object(matches=json_rows(rows, lambda row: {
+            'id': row.id,
+            'saved_search_id': row.saved_search_id,
+            'saved_search_name': row.name,
+            'car': {
+                'id': row.car_id,
+                'brand': row.brand,
+                'model': row.model,
+                'year': row.year,
+                'price': row.price,
+                'images': row.images,
+                'status': row.status,
+            },
+            'matched_at': row.created_at.isoformat()
+        }))
+        
+        return Response(body, status=200, mimetype='application/json')
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
 # Endpoints para Reservas
 @app.route('/api/reservations', methods=['GET'])
 @jwt_required()
 def get_reservations():
     try:
         user_id = get_jwt_identity()
-        reservations = Reservation.query.filter_by(user_id=int(user_id)).all()
-        
-        reservations_data = []
-        for reservation in reservations:
-            car_data = {
-                'id': reservation.id,
-                'car': {
-                    'id': reservation.car.id,
-                    'brand': reservation.car.brand,
-                    'model': reservation.car.model,
-                    'year': reservation.car.year,
-                    'price': reservation.car.price,
-                    'images': reservation.car.images,
-                },
-                'message': reservation.message,
-                'status': reservation.status,
-                'created_at': reservation.created_at.isoformat(),
-                'updated_at': reservation.updated_at.isoformat()
-            }
-            reservations_data.append(car_data)
-        
-        return jsonify({'reservations': reservations_data}), 200
+        # Mesma ordem do índice (user_id, created_at) usado pela consulta sem ORDER BY
+        rows = db.session.execute(
+            db.select(Reservation.id, Reservation.message, Reservation.status, Reservation.created_at,
+                      Reservation.updated_at, Car.id.label('car_id'), Car.brand, Car.model, Car.year, Car.price,
+                      Car.images)
+            .join(Car, Car.id == Reservation.car_id)
+            .where(Reservation.user_id == int(user_id))
+            .order_by(Reservation.created_at, Reservation.id)
+        )
+        body = json_object(reservations=json_rows(rows, lambda row: {
+            'id': row.id,
+            'car': {
+                'id': row.car_id,
+                'brand': row.brand,
+                'model': row.model,
+                'year': row.year,
+                'price': row.price,
+                'images': row.images,
+            },
+            'message': row.message,
+            'status': row.status,
+            'created_at': row.created_at.isoformat(),
+            'updated_at': row.updated_at.isoformat()
+        }))
+        
+        return Response(body, status=200, mimetype='application/json')
         
     except Exception as e:
         return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
@@ -709,6 +1728,8 @@ def create_reservation():
             status='Pendente'
         )
         db.session.add(reservation)
+        db.session.flush()
+        record_event('reservation.created', reservation_id=reservation.id, car_id=car_id, user_id=int(user_id))
         db.session.commit()
         
         return jsonify({
@@ -731,41 +1752,84 @@ def get_admin_reservations():
         if not user or not user.is_admin:
             return jsonify({'error': 'Acesso negado'}), 403
         
-        # Buscar todas as reservas
-        reservations = Reservation.query.order_by(Reservation.created_at.desc()).all()
-        
-        reservations_data = []
-        for reservation in reservations:
-            car = Car.query.get(reservation.car_id)
-            user_data = User.query.get(reservation.user_id)
-            
-            reservations_data.append({
-                'id': reservation.id,
-                'car': {
-                    'id': car.id if car else None,
-                    'brand': car.brand if car else 'N/A',
-                    'model': car.model if car else 'N/A',
-                    'year': car.year if car else 'N/A',
-                    'price': car.price if car else 0,
-                    'images': car.images if car else '[]'
-                },
-                'user': {
-                    'id': user_data.id if user_data else None,
-                    'name': user_data.name if user_data else 'Usuário removido',
-                    'email': user_data.email if user_data else 'N/A',
-                    'phone': user_data.phone if user_data else 'N/A'
-                },
-                'message': reservation.message,
-                'status': reservation.status,
-                'created_at': reservation.created_at.isoformat(),
-                'updated_at': reservation.updated_at.isoformat()
-            })
-        
-        return jsonify({'reservations': reservations_data}), 200
+        # Todas as reservas com carro e cliente numa única consulta (LEFT JOIN: carro ou usuário podem ter sido removidos)
+        rows = db.session.execute(
+            db.select(Reservation.id, Reservation.message, Reservation.status, Reservation.version,
+                      Reservation.created_at, Reservation.updated_at,
+                      Car.id.label('car_id'), Car.brand, Car.model, Car.year, Car.price, Car.images,
+                      User.id.label('user_id'), User.name, User.email, User.phone)
+            .outerjoin(Car, Car.id == Reservation.car_id)
+            .outerjoin(User, User.id == Reservation.user_id)
+            .order_by(Reservation.created_at.desc())
+        )
+        body = json_object(reservations=json_rows(rows, lambda row: {
+            'id': row.id,
+            'car': {
+                'id': row.car_id,
+                'brand': row.brand if row.car_id else 'N/A',
+                'model': row.model if row.car_id else 'N/A',
+                'year': row.year if row.car_id else 'N/A',
+                'price': row.price if row.car_id else 0,
+                'images': row.images if row.car_id else '[]'
+            },
+            'user': {
+                'id': row.user_id,
+                'name': row.name if row.user_id else 'Usuário removido',
+                'email': row.email if row.user_id else 'N/A',
+                'phone': row.phone if row.user_id else 'N/A'
+            },
+            'message': row.message,
+            'status': row.status,
+            'version': row.version,
+            'created_at': row.created_at.isoformat(),
+            'updated_at': row.updated_at.isoformat()
+        }))
+        
+        return Response(body, status=200, mimetype='application/json')
         
     except Exception as e:
         return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
 
+def reservation_conflict(reservation_id):
+    """Resposta 404/409 quando um UPDATE condicional de reserva não afetou nenhuma linha"""
+    db.session.rollback()
+    current = db.session.execute(
+        db.select(Reservation.status, Reservation.version).where(Reservation.id == reservation_id)
+    ).first()
+    
+    if not current:
+        return jsonify({'error': 'Reserva não encontrada'}), 404
+    
+    return jsonify({
+        'error': f'Reserva já foi alterada (status atual: {current.status}). Recarregue e tente novamente.',
+        'status': current.status,
+        'version': current.version
+    }), 409
+
+def transition_reservation(reservation_id, new_status, expected_version=None):
+    """Muda o status de uma reserva pendente com um único UPDATE condicional.
+    
+    Retorna o car_id da reserva, ou None se ela não estava mais pendente
+    (ou na versão esperada) no momento do UPDATE.
+    """
+    car_id = db.session.execute(
+        db.select(Reservation.car_id).where(Reservation.id == reservation_id)
+    ).scalar()
+    if car_id is None:
+        return None
+    
+    conditions = [Reservation.id == reservation_id, Reservation.status == 'Pendente']
+    if expected_version is not None:
+        conditions.append(Reservation.version == expected_version)
+    
+    result = db.session.execute(
+        db.update(Reservation)
+        .where(*conditions)
+        .values(status=new_status, version=Reservation.version + 1),
+        execution_options={'synchronize_session': False}
+    )
+    return car_id if result.rowcount == 1 else None
+
 # Rota para confirmar venda (admin)
 @app.route('/api/admin/reservations/<int:reservation_id>/confirm', methods=['PUT'])
 @jwt_required()
@@ -777,21 +1841,49 @@ def confirm_sale(reservation_id):
         if not user or not user.is_admin:
             return jsonify({'error': 'Acesso negado'}), 403
         
-        reservation = Reservation.query.get(reservation_id)
-        if not reservation:
-            return jsonify({'error': 'Reserva não encontrada'}), 404
-        
-        # Atualizar status da reserva para "Vendido"
-        reservation.status = 'Vendido'
-        
-        # Atualizar status do carro para "Vendido"
-        car = Car.query.get(reservation.car_id)
-        if car:
-            car.status = 'Vendido'
+        data = request.get_json(silent=True) or {}
+        try:
+            expected_version = parse_version(data.get('version'))
+        except ValueError:
+            return jsonify({'error': 'Versão inválida'}), 400
+        
+        # Atualizar status da reserva para "Vendido" apenas se ainda estiver pendente
+        car_id = transition_reservation(reservation_id, 'Vendido', expected_version)
+        if car_id is None:
+            return reservation_conflict(reservation_id)
+        
+        # Atualizar status do carro para "Vendido" se ainda não foi vendido por outra reserva
+        car_result = db.session.execute(
+            db.update(Car)
+            .where(Car.id == car_id, Car.status != 'Vendido')
+            .values(status='Vendido', version=Car.version + 1),
+            execution_options={'synchronize_session': False}
+        )
+        if car_result.rowcount != 1:
+            db.session.rollback()
+            return jsonify({'error': 'Este carro já foi vendido em outra reserva'}), 409
+        
+        # Cancelar as demais reservas pendentes do mesmo carro numa única instrução
+        others = db.session.execute(
+            db.update(Reservation)
+            .where(
+                Reservation.car_id == car_id,
+                Reservation.id != reservation_id,
+                Reservation.status == 'Pendente'
+            )
+            .values(status='Cancelado', version=Reservation.version + 1),
+            execution_options={'synchronize_session': False}
+        )
         
+        record_event('reservation.confirmed', reservation_id=reservation_id, car_id=car_id,
+                     cancelled_reservations=others.rowcount)
+        bump_inventory_version()
         db.session.commit()
         
-        return jsonify({'message': 'Venda confirmada com sucesso'}), 200
+        return jsonify({
+            'message': 'Venda confirmada com sucesso',
+            'cancelled_reservations': others.rowcount
+        }), 200
         
     except Exception as e:
         db.session.rollback()
@@ -808,18 +1900,28 @@ def cancel_reservation(reservation_id):
         if not user or not user.is_admin:
             return jsonify({'error': 'Acesso negado'}), 403
         
-        reservation = Reservation.query.get(reservation_id)
-        if not reservation:
-            return jsonify({'error': 'Reserva não encontrada'}), 404
-        
-        # Atualizar status da reserva para "Cancelado"
-        reservation.status = 'Cancelado'
-        
-        # Atualizar status do carro para "Disponível"
-        car = Car.query.get(reservation.car_id)
-        if car:
-            car.status = 'Disponível'
+        data = request.get_json(silent=True) or {}
+        try:
+            expected_version = parse_version(data.get('version'))
+        except ValueError:
+            return jsonify({'error': 'Versão inválida'}), 400
+        
+        # Atualizar status da reserva para "Cancelado" apenas se ainda estiver pendente
+        car_id = transition_reservation(reservation_id, 'Cancelado', expected_version)
+        if car_id is None:
+            return reservation_conflict(reservation_id)
+        
+        # Atualizar status do carro para "Disponível", nunca desfazendo uma venda
+        car_result = db.session.execute(
+            db.update(Car)
+            .where(Car.id == car_id, Car.status.notin_(['Vendido', 'Disponível']))
+            .values(status='Disponível', version=Car.version + 1),
+            execution_options={'synchronize_session': False}
+        )
         
+        record_event('reservation.cancelled', reservation_id=reservation_id, car_id=car_id)
+        if car_result.rowcount:
+            bump_inventory_version()
         db.session.commit()
         
         return jsonify({'message': 'Reserva cancelada com sucesso'}), 200
@@ -828,33 +1930,241 @@ def cancel_reservation(reservation_id):
         db.session.rollback()
         return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
 
+# Eventos em tempo real para o painel administrativo (Server-Sent Events)
+# O token também pode vir em ?jwt=, pois EventSource não permite cabeçalhos em alguns clientes
+@app.route('/api/admin/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def admin_events():
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(int(user_id))
+        
+        if not user or not user.is_admin:
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+        
+        # Inscrever antes de repetir os eventos perdidos para não haver lacuna entre os dois
+        subscriber = event_broker.subscribe()
+        backlog = []
+        if last_event_id is not None:
+            backlog = [tuple(row) for row in db.session.execute(
+                db.select(EventOutbox.id, EventOutbox.event_type, EventOutbox.payload)
+                .where(EventOutbox.id > last_event_id)
+                .order_by(EventOutbox.id)
+                .limit(EVENT_REPLAY_LIMIT)
+            )]
+        db.session.remove()
+        
+        def generate():
+            sent_id = last_event_id or 0
+            try:
+                yield 'retry: 3000\n\n'
+                for event_id, event_type, payload in backlog:
+                    sent_id = event_id
+                    yield event_to_sse(event_id, event_type, payload)
+                
+                deadline = time.time() + EVENT_STREAM_MAX_DURATION
+                while time.time() < deadline:
+                    try:
+                        event_id, event_type, payload = subscriber.get(timeout=EVENT_HEARTBEAT_INTERVAL)
+                    except queue.Empty:
+                        yield ': heartbeat\n\n'
+                        continue
+                    if event_id <= sent_id:
+                        continue
+                    sent_id = event_id
+                    yield event_to_sse(event_id, event_type, payload)
+            finally:
+                event_broker.unsubscribe(subscriber)
+        
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+# Estatísticas do painel administrativo: agregações SQL com cache de curta duração
+ADMIN_STATS_TTL = 30  # segundos
+ADMIN_STATS_MAX_DAYS = 365
+admin_stats_cache = {}
+
+def build_admin_stats(days):
+    since = datetime.utcnow() - timedelta(days=days)
+    sold_since = db.and_(Reservation.status == 'Vendido', Reservation.updated_at >= since)
+    
+    cars_by_status = dict(db.session.execute(
+        db.select(Car.status, db.func.count()).group_by(Car.status)
+    ).all())
+    reservations_by_status = dict(db.session.execute(
+        db.select(Reservation.status, db.func.count()).group_by(Reservation.status)
+    ).all())
+    
+    sale_day = db.func.date(Reservation.updated_at)
+    sales_per_day = db.session.execute(
+        db.select(sale_day, db.func.count()).where(sold_since).group_by(sale_day).order_by(sale_day)
+    ).all()
+    sale_week = db.func.strftime('%Y-W%W', Reservation.updated_at)
+    sales_per_week = db.session.execute(
+        db.select(sale_week, db.func.count()).where(sold_since).group_by(sale_week).order_by(sale_week)
+    ).all()
+    
+    new_users = db.session.execute(
+        db.select(db.func.count()).select_from(User).where(User.created_at >= since)
+    ).scalar()
+    new_comments = db.session.execute(
+        db.select(db.func.count()).select_from(Comment).where(Comment.created_at >= since)
+    ).scalar()
+    
+    # Visualizações desde sempre (não há histórico por dia) e os carros em alta agora
+    scores = get_trending_scores()
+    snapshot = get_catalog_snapshot()
+    trending = []
+    for car_id, (score, views) in sorted(scores.items(), key=lambda item: -item[1][0]):
+        car = snapshot.get(car_id)
+        if car is None:
+            continue
+        trending.append({'car_id': car_id, 'brand': car['brand'], 'model': car['model'], 'year': car['year'],
+                         'status': car['status'], 'views': views, 'trending_score': round(score, 3)})
+        if len(trending) == TRENDING_TOP:
+            break
+    
+    return {
+        'window_days': days,
+        'since': since.isoformat(),
+        'cars_by_status': cars_by_status,
+        'reservations_by_status': reservations_by_status,
+        'sales_per_day': [{'date': day, 'count': count} for day, count in sales_per_day],
+        'sales_per_week': [{'week': week, 'count': count} for week, count in sales_per_week],
+        'new_users': new_users,
+        'new_comments': new_comments,
+        'total_views': sum(views for _, views in scores.values()),
+        'trending_cars': trending,
+        'generated_at': datetime.utcnow().isoformat()
+    }
+
+@app.route('/api/admin/stats', methods=['GET'])
+@jwt_required()
+def get_admin_stats():
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(int(user_id))
+        
+        if not user or not user.is_admin:
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        try:
+            days = int(request.args.get('days', 30))
+        except ValueError:
+            return jsonify({'error': 'Parâmetro days inválido'}), 400
+        days = max(1, min(days, ADMIN_STATS_MAX_DAYS))
+        
+        cached = admin_stats_cache.get(days)
+        if cached and cached[0] > time.time():
+            return jsonify(cached[1]), 200
+        
+        stats = build_admin_stats(days)
+        admin_stats_cache[days] = (time.time() + ADMIN_STATS_TTL, stats)
+        return jsonify(stats), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+# Análises de preço (admin): snapshot colunar em cache, invalidado pela versão do inventário
+analytics_cache = {'version': None, 'snapshot': None}
+analytics_lock = threading.Lock()
+
+def get_analytics_snapshot():
+    version = get_inventory_version()
+    if analytics_cache['version'] == version:
+        return analytics_cache['snapshot']
+    
+    with analytics_lock:
+        if analytics_cache['version'] != version:
+            car_rows = db.session.execute(
+                db.select(Car.id, Car.brand, Car.model, Car.year, Car.mileage, Car.price, Car.status)
+            ).all()
+            sale_rows = db.session.execute(
+                db.select(Car.brand, Reservation.created_at, Reservation.updated_at)
+                .select_from(Reservation)
+                .outerjoin(Car, Car.id == Reservation.car_id)
+                .where(Reservation.status == 'Vendido')
+            ).all()
+            analytics_cache['snapshot'] = pricing_analytics.build_snapshot(car_rows, sale_rows)
+            analytics_cache['version'] = version
+        return analytics_cache['snapshot']
+
+@app.route('/api/admin/analytics/prices', methods=['GET'])
+@jwt_required()
+def get_price_analytics():
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(int(user_id))
+        
+        if not user or not user.is_admin:
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        group_by = [column.strip() for column in request.args.get('group_by', 'brand').split(',') if column.strip()]
+        if not group_by or any(column not in pricing_analytics.GROUP_COLUMNS for column in group_by):
+            return jsonify({'error': 'group_by deve combinar brand, model e year'}), 400
+        
+        snapshot = get_analytics_snapshot()
+        return jsonify({
+            'group_by': group_by,
+            'groups': pricing_analytics.price_distribution(snapshot, group_by, request.args.get('status'))
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+@app.route('/api/admin/analytics/depreciation', methods=['GET'])
+@jwt_required()
+def get_depreciation_analytics():
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(int(user_id))
+        
+        if not user or not user.is_admin:
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        snapshot = get_analytics_snapshot()
+        return jsonify({
+            'brands': pricing_analytics.depreciation_curves(snapshot, request.args.get('brand'))
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+@app.route('/api/admin/analytics/time-to-sale', methods=['GET'])
+@jwt_required()
+def get_time_to_sale_analytics():
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(int(user_id))
+        
+        if not user or not user.is_admin:
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        snapshot = get_analytics_snapshot()
+        return jsonify(pricing_analytics.time_to_sale(snapshot)), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
 # Rota para buscar carros por tipo
 @app.route('/api/cars/type/<car_type>', methods=['GET'])
+@rate_limit('catalog')
 def get_cars_by_type(car_type):
     try:
-        cars = Car.query.filter_by(car_type=car_type, status='Disponível').all()
-        
-        cars_data = []
-        for car in cars:
-            cars_data.append({
-                'id': car.id,
-                'brand': car.brand,
-                'model': car.model,
-                'year': car.year,
-                'mileage': car.mileage,
-                'price': car.price,
-                'color': car.color,
-                'fuel_type': car.fuel_type,
-                'transmission': car.transmission,
-                'car_type': car.car_type,
-                'description': car.description,
-                'images': car.images,
-                'status': car.status,
-                'created_at': car.created_at.isoformat(),
-                'updated_at': car.updated_at.isoformat()
-            })
+        def build():
+            snapshot = get_catalog_snapshot()
+            rows = snapshot.available_rows_by_type.get(car_type, ())
+            return json_object(cars=car_fragments.render(snapshot, rows, shape='type'))
         
-        return jsonify({'cars': cars_data}), 200
+        return catalog_response(f'cars-type-{car_type}', build)
         
     except Exception as e:
         return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
@@ -878,6 +2188,168 @@ def get_admin_contact():
     except Exception as e:
         return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
 
+# Carros semelhantes: índice NumPy por worker, atualizado pela versão do inventário
+SIMILAR_CARS_MAX_K = 50
+SIMILAR_FEATURE_COLUMNS = [Car.price, Car.year, Car.mileage, Car.car_type, Car.fuel_type, Car.transmission]
+
+similar_cars_index = SimilarCarsIndex()
+similar_cars_state = {'version': None, 'synced_at': None}
+similar_cars_lock = threading.Lock()
+
+def refresh_similar_cars_index():
+    """Aplica ao índice só os carros alterados/excluídos desde a última sincronização"""
+    version = get_inventory_version()
+    if similar_cars_state['version'] == version:
+        return
+    
+    with similar_cars_lock:
+        if similar_cars_state['version'] == version:
+            return
+        now = datetime.utcnow()
+        synced_at = similar_cars_state['synced_at']
+        
+        if synced_at is None:
+            rows = db.session.execute(
+                db.select(Car.id, *SIMILAR_FEATURE_COLUMNS).where(Car.status == 'Disponível')
+            ).all()
+            similar_cars_index.load(tuple(row) for row in rows)
+        else:
+            window_start = synced_at - SYNC_OVERLAP
+            changed = db.session.execute(
+                db.select(Car.id, Car.status, *SIMILAR_FEATURE_COLUMNS).where(Car.updated_at > window_start)
+            ).all()
+            for car_id, status, *features in changed:
+                if status == 'Disponível':
+                    similar_cars_index.upsert(car_id, *features)
+                else:
+                    similar_cars_index.remove(car_id)
+            for car_id in db.session.execute(
+                db.select(DeletedCar.car_id).where(DeletedCar.deleted_at > window_start)
+            ).scalars():
+                if car_id not in {row.id for row in changed}:
+                    similar_cars_index.remove(car_id)
+        
+        similar_cars_state['version'] = version
+        similar_cars_state['synced_at'] = now
+
+@app.route('/api/cars/<int:car_id>/similar', methods=['GET'])
+def get_similar_cars(car_id):
+    try:
+        try:
+            k = int(request.args.get('k', 6))
+        except ValueError:
+            return jsonify({'error': 'Parâmetro k inválido'}), 400
+        k = max(1, min(k, SIMILAR_CARS_MAX_K))
+        
+        target = db.session.execute(
+            db.select(*SIMILAR_FEATURE_COLUMNS).where(Car.id == car_id)
+        ).first()
+        if not target:
+            return jsonify({'error': 'Carro não encontrado'}), 404
+        
+        refresh_similar_cars_index()
+        numeric, codes = similar_cars_index.encode(*target)
+        nearest = similar_cars_index.query(numeric, codes, k, exclude_id=car_id)
+        
+        distances = dict(nearest)
+        cars = Car.query.filter(Car.id.in_(distances)).all() if distances else []
+        cars.sort(key=lambda car: distances[car.id])
+        
+        return jsonify({
+            'car_id': car_id,
+            'similar': [dict(car_to_dict(car), distance=round(distances[car.id], 4)) for car in cars]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+# Requisição em lote: várias chamadas da API numa única ida e volta HTTP
+BATCH_MAX_REQUESTS = 20
+# Endpoints que não fazem sentido dentro de um lote (recursão e streams)
+BATCH_EXCLUDED_ENDPOINTS = {'batch', 'admin_events'}
+
+def dispatch_sub_request(method, path, body):
+    """Executa uma sub-requisição pelo mapa de URLs do Flask dentro do app context atual.
+    
+    O app context (e com ele a sessão do banco e o g) é o mesmo da requisição do lote.
+    O token não é repassado: a identidade que o lote já verificou vai no environ e é
+    usada por jwt_required e pelo limite de requisições.
+    """
+    path, _, query_string = path.partition('?')
+    
+    builder = EnvironBuilder(
+        path=path,
+        base_url=request.host_url,
+        method=method,
+        query_string=query_string,
+        environ_base={
+            'REMOTE_ADDR': request.remote_addr,  # limite de requisições por IP
+            BATCH_IDENTITY_ENVIRON_KEY: {'identity': get_jwt_identity()},
+        },
+        json=body if method in ('POST', 'PUT', 'PATCH') and body is not None else None
+    )
+    
+    with app.request_context(builder.get_environ()):
+        rule = request.url_rule
+        if rule is not None and rule.endpoint in BATCH_EXCLUDED_ENDPOINTS:
+            return 400, {'error': 'Endpoint não permitido em lote'}
+        try:
+            rv = app.dispatch_request()
+        except HTTPException as e:
+            # 404/405 do roteamento
+            return e.code, {'error': e.description}
+        except Exception as e:
+            # Erros de JWT passam pelos handlers registrados pelo JWTManager
+            rv = app.handle_user_exception(e)
+        response = app.make_response(rv)
+        
+        if response.direct_passthrough:
+            # Catálogo servido direto do arquivo (wrap_file): lê o corpo e fecha o arquivo
+            try:
+                body = b''.join(response.response)
+            finally:
+                response.close()
+            response.direct_passthrough = False
+            response.set_data(body)
+        
+        payload = response.get_json(silent=True)
+        if payload is None:
+            payload = response.get_data(as_text=True)
+        return response.status_code, payload
+
+@app.route('/api/batch', methods=['POST'])
+@jwt_required(optional=True)
+def batch():
+    try:
+        data = request.get_json(silent=True) or {}
+        sub_requests = data.get('requests')
+        
+        if not isinstance(sub_requests, list) or not sub_requests:
+            return jsonify({'error': 'Lista de requisições é obrigatória'}), 400
+        
+        if len(sub_requests) > BATCH_MAX_REQUESTS:
+            return jsonify({'error': f'Máximo de {BATCH_MAX_REQUESTS} requisições por lote'}), 413
+        
+        responses = []
+        for index, sub in enumerate(sub_requests):
+            sub_id = sub.get('id', index) if isinstance(sub, dict) else index
+            if not isinstance(sub, dict) or not isinstance(sub.get('path'), str) or not sub['path'].startswith('/api/'):
+                responses.append({'id': sub_id, 'status': 400, 'body': {'error': 'Caminho inválido'}})
+                continue
+            
+            method = str(sub.get('method', 'GET')).upper()
+            try:
+                status, body = dispatch_sub_request(method, sub['path'], sub.get('body'))
+            except Exception as e:
+                db.session.rollback()
+                status, body = 500, {'error': f'Erro interno do servidor: {str(e)}'}
+            responses.append({'id': sub_id, 'status': status, 'body': body})
+        
+        return jsonify({'responses': responses}), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
 # Rota raiz - mensagem de boas-vindas
 @app.route('/', methods=['GET'])
 def root():
@@ -896,27 +2368,147 @@ def root():
 def test():
     return jsonify({'message': 'API funcionando corretamente!'}), 200
 
+# Tamanho da primeira página de comentários no pacote da tela de detalhes
+# (e o máximo por página em GET /api/cars/<id>/comments?limit=)
+BUNDLE_COMMENTS_PAGE_SIZE = 10
+COMMENTS_PAGE_MAX = 50
+
+def comment_page(car_id, before=None, limit=None):
+    """Comentários do carro, mais recentes primeiro, com o nome do autor (JOIN).
+
+    before é o id do último comentário já exibido (cursor): a página continua
+    a partir dele pelo índice (car_id, created_at), sem OFFSET. Com limit,
+    busca uma linha a mais para saber se há outra página.
+    Retorna (comentários, has_more)."""
+    query = (
+        db.select(Comment.id, Comment.comment, Comment.rating, Comment.created_at, User.name)
+        .outerjoin(User, User.id == Comment.user_id)
+        .where(Comment.car_id == car_id)
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+    )
+    if before is not None:
+        query = query.where(db.or_(
+            Comment.created_at < before.created_at,
+            db.and_(Comment.created_at == before.created_at, Comment.id < before.id)
+        ))
+    if limit is not None:
+        query = query.limit(limit + 1)
+    rows = db.session.execute(query).all()
+    has_more = limit is not None and len(rows) > limit
+    return [{
+        'id': row.id,
+        'comment': row.comment,
+        'rating': row.rating,
+        'user_name': row.name or 'Usuário',
+        'created_at': row.created_at.isoformat()
+    } for row in (rows[:limit] if has_more else rows)], has_more
+
 # Comentários
+# Sem parâmetros devolve a lista completa; com ?limit= (e ?before=<id do último comentário>)
+# devolve uma página: {'comments': [...], 'has_more': bool}
 @app.route('/api/cars/<int:car_id>/comments', methods=['GET'])
 def get_comments(car_id):
     try:
-        comments = Comment.query.filter_by(car_id=car_id).order_by(Comment.created_at.desc()).all()
+        before_id = request.args.get('before')
+        limit = request.args.get('limit')
+        if before_id is None and limit is None:
+            comments_data, _ = comment_page(car_id)
+            return jsonify(comments_data), 200
+        
+        try:
+            limit = min(max(int(limit or BUNDLE_COMMENTS_PAGE_SIZE), 1), COMMENTS_PAGE_MAX)
+        except ValueError:
+            return jsonify({'error': 'limit inválido'}), 400
+        before = None
+        if before_id is not None:
+            if not before_id.isdigit():
+                return jsonify({'error': 'before inválido'}), 400
+            before = db.session.execute(
+                db.select(Comment.id, Comment.created_at)
+                .where(Comment.id == int(before_id), Comment.car_id == car_id)
+            ).first()
+            if not before:
+                return jsonify({'error': 'Comentário de referência (before) não encontrado'}), 400
+        
+        comments_data, has_more = comment_page(car_id, before, limit)
+        return jsonify({'comments': comments_data, 'has_more': has_more}), 200
         
-        comments_data = []
-        for comment in comments:
-            user = User.query.get(comment.user_id)
-            comments_data.append({
-                'id': comment.id,
-                'comment': comment.comment,
-                'rating': comment.rating,
-                'user_name': user.name if user else 'Usuário',
-                'created_at': comment.created_at.isoformat()
-            })
+    except Exception as e:
+        return jsonify({'error': f'Erro ao buscar comentários: {str(e)}'}), 500
+
+# Tudo que a tela de detalhes precisa numa única requisição e num número fixo de consultas
+@app.route('/api/cars/<int:car_id>/bundle', methods=['GET'])
+@jwt_required(optional=True)
+def get_car_bundle(car_id):
+    try:
+        car = db.session.get(Car, car_id)
+        if not car:
+            return jsonify({'error': 'Carro não encontrado'}), 404
         
-        return jsonify(comments_data), 200
+        # Resumo das avaliações: uma consulta agrupada por nota
+        distribution = {str(star): 0 for star in range(1, 6)}
+        total = 0
+        rating_sum = 0
+        for rating, count in db.session.execute(
+            db.select(Comment.rating, db.func.count())
+            .where(Comment.car_id == car_id)
+            .group_by(Comment.rating)
+        ):
+            distribution[str(rating)] = count
+            total += count
+            rating_sum += rating * count
+        
+        # Primeira página de comentários; as seguintes vêm de GET /api/cars/<id>/comments?before=
+        comments_data, comments_has_more = comment_page(car_id, limit=BUNDLE_COMMENTS_PAGE_SIZE)
+        
+        admin = db.session.execute(
+            db.select(User.name, User.email, User.phone).where(User.is_admin == True).limit(1)
+        ).first()
+        admin_contact = {
+            'phone': (admin.phone if admin else None) or '11999999999',
+            'name': (admin.name if admin else None) or 'Administrador',
+            'email': (admin.email if admin else None) or 'admin@buycarr.com'
+        }
+        
+        # Estado do usuário logado (favorito e reserva mais recente deste carro)
+        user_state = None
+        user_id = get_jwt_identity()
+        if user_id:
+            favorite_id = db.session.execute(
+                db.select(Favorite.id).where(Favorite.user_id == int(user_id), Favorite.car_id == car_id)
+            ).scalar()
+            reservation = db.session.execute(
+                db.select(Reservation.id, Reservation.status, Reservation.created_at)
+                .where(Reservation.user_id == int(user_id), Reservation.car_id == car_id)
+                .order_by(Reservation.created_at.desc())
+                .limit(1)
+            ).first()
+            user_state = {
+                'is_favorite': favorite_id is not None,
+                'favorite_id': favorite_id,
+                'reservation': {
+                    'id': reservation.id,
+                    'status': reservation.status,
+                    'created_at': reservation.created_at.isoformat()
+                } if reservation else None
+            }
+        
+        car_views.record(car_id)
+        return jsonify({
+            'car': car_to_dict(car),
+            'rating_summary': {
+                'count': total,
+                'average': round(rating_sum / total, 2) if total else None,
+                'distribution': distribution
+            },
+            'comments': comments_data,
+            'comments_has_more': comments_has_more,
+            'admin_contact': admin_contact,
+            'user_state': user_state
+        }), 200
         
     except Exception as e:
-        return jsonify({'error': f'Erro ao buscar comentários: {str(e)}'}), 500
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
 
 @app.route('/api/cars/<int:car_id>/comments', methods=['POST'])
 @jwt_required()
@@ -966,6 +2558,7 @@ def create_comment(car_id):
 
 # Buscar todos os comentários
 @app.route('/api/comments', methods=['GET'])
+@rate_limit('comments')
 def get_all_comments():
     try:
         comments = Comment.query.order_by(Comment.created_at.desc()).all()
@@ -990,6 +2583,303 @@ def get_all_comments():
     except Exception as e:
         return jsonify({'error': f'Erro ao buscar comentários: {str(e)}'}), 500
 
+# Imagens enviadas
+image_transcoder = ImageTranscoder(app.config['IMAGE_WORKERS'], app.config['IMAGE_MAX_DIMENSION'],
+                                   app.config['IMAGE_QUALITY'], app.config['IMAGE_FORMAT'])
+UPLOAD_MAX_AGE = 365 * 24 * 3600  # nomes são únicos (uuid), então o arquivo nunca muda
+UPLOAD_PENDING_WAIT = 2.0  # segundos que GET /uploads espera uma conversão em andamento antes de responder 202
+
+def transcode_done_callback(source_path):
+    def log_transcode_result(future):
+        try:
+            before, after = future.result()
+            print(f"Imagem convertida: {before} -> {after} bytes")
+        except Exception as e:
+            # O original nunca é servido: sem conversão não há imagem (o arquivo pode nem ser uma imagem)
+            print(f"Erro ao converter imagem, original removido: {str(e)}")
+            try:
+                os.remove(source_path)
+            except FileNotFoundError:
+                pass
+    return log_transcode_result
+
+def save_upload(file_storage):
+    """Grava a imagem enviada e agenda a conversão. Retorna a URL definitiva."""
+    extension = os.path.splitext(secure_filename(file_storage.filename or ''))[1].lower() or '.jpg'
+    return publish_upload(file_storage.save, extension)
+
+def save_base64_upload(data_uri):
+    """Decodifica uma data URI de imagem e grava em uploads. Retorna a URL."""
+    data, extension = decode_data_uri(data_uri)
+    if len(data) > UPLOAD_MAX_SIZE:
+        raise ValueError(f'Imagem maior que {UPLOAD_MAX_SIZE} bytes')
+    
+    def save(path):
+        with open(path, 'wb') as file:
+            file.write(data)
+    
+    # Nome derivado do conteúdo: regravar a mesma foto (migração retomada) não cria arquivo novo
+    return publish_upload(save, extension, stem=hashlib.sha256(data).hexdigest()[:32])
+
+def publish_upload(save, extension, stem=None):
+    """save(caminho) grava o arquivo em uploads; a conversão roda no pool de processos"""
+    if extension not in IMAGE_EXTENSIONS:
+        # A extensão decide o tipo com que o arquivo é servido: só tipos de imagem
+        raise ValueError('Tipo de imagem não suportado')
+    upload_folder = app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+    stem = stem or uuid.uuid4().hex
+    
+    if not image_transcoder.available:
+        filename = f'{stem}{extension}'
+        if not os.path.exists(os.path.join(upload_folder, filename)):
+            save(os.path.join(upload_folder, filename))
+        return f'/uploads/{filename}'
+    
+    filename = f"{stem}{output_extension(app.config['IMAGE_FORMAT'])}"
+    if (os.path.exists(os.path.join(upload_folder, filename))
+            or glob.glob(os.path.join(upload_folder, f'{glob.escape(stem)}{PENDING_MARKER}.*'))):
+        return f'/uploads/{filename}'
+    source_path = os.path.join(upload_folder, f'{stem}{PENDING_MARKER}{extension}')
+    save(source_path)
+    image_transcoder.submit(source_path, os.path.join(upload_folder, filename)).add_done_callback(
+        transcode_done_callback(source_path))
+    return f'/uploads/{filename}'
+
+@app.route('/uploads/<filename>', methods=['GET'])
+def serve_upload(filename):
+    upload_folder = app.config['UPLOAD_FOLDER']
+    stem, extension = os.path.splitext(filename)
+    path = os.path.join(upload_folder, filename)
+    
+    # Só imagens convertidas (ou gravadas sem conversão) com extensão de imagem; originais
+    # <nome>.orig.<ext> nunca saem daqui
+    if (filename != secure_filename(filename) or extension.lower() not in EXTENSION_MIMETYPES
+            or os.path.splitext(stem)[1] == PENDING_MARKER):
+        response = jsonify({'error': 'Imagem não encontrada'}), 404
+    elif os.path.exists(path):
+        response = send_file(path, mimetype=EXTENSION_MIMETYPES[extension.lower()], max_age=UPLOAD_MAX_AGE)
+    else:
+        # Conversão em andamento (em qualquer worker): espera um pouco por ela
+        pending_pattern = os.path.join(upload_folder, f'{glob.escape(stem)}{PENDING_MARKER}.*')
+        deadline = time.monotonic() + UPLOAD_PENDING_WAIT
+        while glob.glob(pending_pattern) and not os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if os.path.exists(path):
+            response = send_file(path, mimetype=EXTENSION_MIMETYPES[extension.lower()], max_age=UPLOAD_MAX_AGE)
+        elif glob.glob(pending_pattern):
+            response = jsonify({'error': 'Imagem ainda em processamento'}), 202, {'Retry-After': '1'}
+        else:
+            response = jsonify({'error': 'Imagem não encontrada'}), 404
+    
+    response = app.make_response(response)
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+# Uploads retomáveis em partes numeradas
+UPLOAD_DEFAULT_CHUNK_SIZE = 256 * 1024
+UPLOAD_MAX_CHUNK_SIZE = 4 * 1024 * 1024
+UPLOAD_MAX_SIZE = 25 * 1024 * 1024
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+UPLOAD_COPY_BLOCK = 64 * 1024  # a parte é copiada do socket para o disco em blocos, sem ficar inteira na memória
+
+def upload_part_path(upload_id):
+    return os.path.join(app.instance_path, 'upload_parts', f'{upload_id}.part')
+
+def upload_progress(upload):
+    return {
+        'upload_id': upload.id,
+        'size': upload.size,
+        'chunk_size': upload.chunk_size,
+        'offset': upload.received,
+        'next_chunk': upload.received // upload.chunk_size,
+        'status': upload.status,
+        'url': upload.url
+    }
+
+def get_user_upload(upload_id):
+    upload = db.session.get(UploadSession, upload_id)
+    if not upload or upload.user_id != int(get_jwt_identity()):
+        return None
+    return upload
+
+def expire_upload_sessions():
+    cutoff = datetime.utcnow() - UPLOAD_SESSION_TTL
+    expired = UploadSession.query.filter(UploadSession.status == 'Aberto', UploadSession.updated_at < cutoff).all()
+    for upload in expired:
+        try:
+            os.remove(upload_part_path(upload.id))
+        except FileNotFoundError:
+            pass
+        db.session.delete(upload)
+
+@app.route('/api/uploads', methods=['POST'])
+@jwt_required()
+def create_upload():
+    try:
+        data = request.get_json() or {}
+        filename = secure_filename(data.get('filename') or '')
+        size = int(data.get('size') or 0)
+        chunk_size = int(data.get('chunk_size') or UPLOAD_DEFAULT_CHUNK_SIZE)
+        sha256 = (data.get('sha256') or '').lower() or None
+        
+        if not filename or os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS:
+            return jsonify({'error': 'Nome de arquivo de imagem inválido'}), 400
+        if size <= 0 or size > UPLOAD_MAX_SIZE:
+            return jsonify({'error': f'Tamanho deve estar entre 1 e {UPLOAD_MAX_SIZE} bytes'}), 400
+        if chunk_size <= 0 or chunk_size > UPLOAD_MAX_CHUNK_SIZE:
+            return jsonify({'error': f'chunk_size deve estar entre 1 e {UPLOAD_MAX_CHUNK_SIZE} bytes'}), 400
+        if sha256 and (len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256)):
+            return jsonify({'error': 'sha256 deve ter 64 caracteres hexadecimais'}), 400
+        
+        enqueue_job('uploads.expire', dedupe_key='uploads.expire')
+        upload = UploadSession(id=uuid.uuid4().hex, user_id=int(get_jwt_identity()), filename=filename,
+                               size=size, chunk_size=chunk_size, sha256=sha256, received=0, status='Aberto')
+        db.session.add(upload)
+        db.session.commit()
+        
+        os.makedirs(os.path.dirname(upload_part_path(upload.id)), exist_ok=True)
+        open(upload_part_path(upload.id), 'wb').close()
+        return jsonify(upload_progress(upload)), 201
+        
+    except ValueError:
+        return jsonify({'error': 'size e chunk_size devem ser números inteiros'}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload(upload_id):
+    # Usado para retomar: o cliente continua a partir de next_chunk
+    upload = get_user_upload(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload não encontrado'}), 404
+    return jsonify(upload_progress(upload)), 200
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@jwt_required()
+def upload_chunk(upload_id, index):
+    try:
+        upload = get_user_upload(upload_id)
+        if not upload:
+            return jsonify({'error': 'Upload não encontrado'}), 404
+        if upload.status != 'Aberto':
+            return jsonify({'error': 'Upload já concluído', **upload_progress(upload)}), 409
+        
+        offset = index * upload.chunk_size
+        if offset >= upload.size:
+            return jsonify({'error': 'Número da parte fora do arquivo'}), 400
+        length = min(upload.chunk_size, upload.size - offset)
+        
+        # Reenvio de uma parte já confirmada (a resposta anterior se perdeu): só confirmar de novo
+        if offset + length <= upload.received:
+            return jsonify(upload_progress(upload)), 200
+        if offset != upload.received:
+            return jsonify({'error': 'Parte fora de ordem', **upload_progress(upload)}), 409
+        if request.content_length != length:
+            return jsonify({'error': f'A parte {index} deve ter {length} bytes'}), 400
+        
+        written = 0
+        with open(upload_part_path(upload.id), 'r+b') as part:
+            part.seek(offset)
+            while written < length:
+                block = request.stream.read(min(UPLOAD_COPY_BLOCK, length - written))
+                if not block:
+                    break
+                part.write(block)
+                written += len(block)
+        if written != length:
+            return jsonify({'error': 'Parte incompleta, envie novamente', **upload_progress(upload)}), 400
+        
+        # Só avança se ninguém avançou antes (mesma parte enviada duas vezes ao mesmo tempo)
+        db.session.execute(
+            db.update(UploadSession)
+            .where(UploadSession.id == upload.id, UploadSession.received == offset)
+            .values(received=offset + length, updated_at=datetime.utcnow()),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        db.session.refresh(upload)
+        return jsonify(upload_progress(upload)), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_upload(upload_id):
+    try:
+        upload = get_user_upload(upload_id)
+        if not upload:
+            return jsonify({'error': 'Upload não encontrado'}), 404
+        data = request.get_json(silent=True) or {}
+        car_id = data.get('car_id')
+        
+        car = None
+        if car_id is not None:
+            if isinstance(car_id, bool) or not isinstance(car_id, (int, str)) or not str(car_id).strip().isdigit():
+                return jsonify({'error': 'car_id inválido'}), 400
+            user = User.query.get(upload.user_id)
+            if not user or not user.is_admin:
+                return jsonify({'error': 'Acesso negado. Apenas administradores podem alterar fotos de carros.'}), 403
+            car = db.session.get(Car, int(car_id))
+            if not car:
+                return jsonify({'error': 'Carro não encontrado'}), 404
+        
+        if upload.status == 'Concluído':
+            return jsonify(upload_progress(upload)), 200
+        extension = os.path.splitext(upload.filename)[1].lower()
+        if extension not in IMAGE_EXTENSIONS:
+            return jsonify({'error': 'Nome de arquivo de imagem inválido'}), 400
+        if upload.received != upload.size:
+            return jsonify({'error': 'Upload incompleto', **upload_progress(upload)}), 409
+        
+        part_path = upload_part_path(upload.id)
+        digest = hashlib.sha256()
+        with open(part_path, 'rb') as part:
+            for block in iter(lambda: part.read(UPLOAD_COPY_BLOCK), b''):
+                digest.update(block)
+        expected = upload.sha256 or (data.get('sha256') or '').lower() or None
+        if expected and digest.hexdigest() != expected:
+            # Não há como saber qual parte veio corrompida: recomeçar do zero
+            open(part_path, 'wb').close()
+            upload.received = 0
+            db.session.commit()
+            return jsonify({'error': 'Hash do arquivo não confere, envie novamente', **upload_progress(upload)}), 422
+        
+        # Apenas uma conclusão move o arquivo
+        claimed = db.session.execute(
+            db.update(UploadSession)
+            .where(UploadSession.id == upload.id, UploadSession.status == 'Aberto')
+            .values(status='Concluído', updated_at=datetime.utcnow()),
+            execution_options={'synchronize_session': False}
+        )
+        if claimed.rowcount != 1:
+            db.session.rollback()
+            return jsonify({'error': 'Upload já está sendo concluído'}), 409
+        
+        upload.url = publish_upload(lambda path: os.replace(part_path, path), extension)
+        upload.status = 'Concluído'
+        
+        if car is not None:
+            images = json.loads(car.images) if car.images else []
+            images.append(upload.url)
+            car.images = json.dumps(images)
+            record_event('car.updated', car_id=car.id, status=car.status)
+            bump_inventory_version()
+        db.session.commit()
+        
+        response = upload_progress(upload)
+        if car is not None:
+            response['car'] = car_to_dict(car)
+        return jsonify(response), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
 @app.route('/api/comments', methods=['POST'])
 @jwt_required()
 def create_general_comment():
@@ -1009,18 +2899,19 @@ def create_general_comment():
             return jsonify({'error': 'Avaliação deve estar entre 1 e 5 estrelas'}), 400
         
         photo_url = None
-        # Se for base64 (web), usar diretamente
+        # Se for base64 (web), decodificar e gravar em uploads; o comentário guarda só a URL
         if photo_base64:
-            photo_url = photo_base64
-            print(f"Foto recebida em base64")
+            try:
+                photo_url = save_base64_upload(photo_base64)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            print(f"Foto recebida em base64 salva em: {photo_url}")
         elif photo_file:
             # Salvar a imagem no servidor (mobile/app real)
-            upload_folder = os.path.join(app.root_path, 'uploads')
-            os.makedirs(upload_folder, exist_ok=True)
-            filename = secure_filename(photo_file.filename)
-            filepath = os.path.join(upload_folder, filename)
-            photo_file.save(filepath)
-            photo_url = f'/uploads/{filename}'  # URL acessível pelo frontend
+            try:
+                photo_url = save_upload(photo_file)  # URL acessível pelo frontend
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             print(f"Foto salva em: {photo_url}")
         
         new_comment = Comment(
@@ -1054,24 +2945,285 @@ def create_general_comment():
         print(f"Erro completo ao criar comentario: {str(e)}")
         return jsonify({'error': f'Erro ao criar comentario: {str(e)}'}), 500
 
-# Inicializar banco de dados quando o app é carregado
-    with app.app_context():
-        db.create_all()
-        
-        # Criar usuário administrador padrão se não existir
-        admin = User.query.filter_by(is_admin=True).first()
-        if not admin:
-            admin = User(
-                name='Administrador',
-                email='admin@buycarr.com',
-                phone='11999999999',
-                password_hash=generate_password_hash('admin123'),
-                is_admin=True
+# Jobs em segundo plano (executados por worker.py)
+@job_handler('catalog.warm')
+def warm_catalog():
+    # Grava os corpos compartilhados da versão atual; se já existem, não faz nada
+    version = get_inventory_version()
+    load_catalog_entry('cars', version, build_cars_body)
+    load_catalog_entry('cars-categories', version, build_categories_body)
+
+@job_handler('tombstones.prune')
+def prune_tombstones():
+    db.session.execute(
+        db.delete(DeletedCar).where(DeletedCar.deleted_at < datetime.utcnow() - SYNC_TOMBSTONE_RETENTION)
+    )
+
+@job_handler('uploads.expire')
+def expire_uploads():
+    expire_upload_sessions()
+
+# Índice das buscas salvas, mantido em memória pelo processo que executa os jobs (worker.py)
+SAVED_SEARCH_INDEX_RELOAD = 600  # segundos; a recarga completa descarta as buscas apagadas
+SAVED_SEARCH_MATCH_CHUNK = 500
+saved_search_index = None
+saved_search_index_loaded_at = 0.0
+
+def load_saved_searches(index, after_id=0):
+    rows = db.session.execute(
+        db.select(SavedSearch.id, SavedSearch.brand, SavedSearch.car_type, SavedSearch.min_price,
+                  SavedSearch.max_price, SavedSearch.min_year, SavedSearch.max_year)
+        .where(SavedSearch.id > after_id)
+        .order_by(SavedSearch.id)
+    )
+    for row in rows:
+        index.add(row.id, row.brand, row.car_type, row.min_price, row.max_price, row.min_year, row.max_year)
+
+def sync_saved_search_index():
+    """Carga completa na primeira chamada ou depois de SAVED_SEARCH_INDEX_RELOAD; senão só as buscas novas"""
+    global saved_search_index, saved_search_index_loaded_at
+    if saved_search_index is None or time.time() - saved_search_index_loaded_at > SAVED_SEARCH_INDEX_RELOAD:
+        index = SavedSearchIndex()
+        load_saved_searches(index)
+        index.build()
+        saved_search_index, saved_search_index_loaded_at = index, time.time()
+    else:
+        load_saved_searches(saved_search_index, saved_search_index.last_id)
+    return saved_search_index
+
+@job_handler('saved_searches.match')
+def match_saved_searches(car_id):
+    car = Car.query.get(car_id)
+    if not car or car.status != 'Disponível':
+        return
+    search_ids = sync_saved_search_index().match(car.brand, car.car_type, car.price, car.year)
+    now = datetime.utcnow()
+    for start in range(0, len(search_ids), SAVED_SEARCH_MATCH_CHUNK):
+        chunk = search_ids[start:start + SAVED_SEARCH_MATCH_CHUNK]
+        # O SELECT em saved_search ignora buscas apagadas que o índice ainda não descartou;
+        # OR IGNORE mantém o job idempotente (unique_saved_search_car)
+        db.session.execute(
+            db.insert(SavedSearchMatch).prefix_with('OR IGNORE').from_select(
+                ['saved_search_id', 'user_id', 'car_id', 'created_at'],
+                db.select(SavedSearch.id, SavedSearch.user_id, db.literal(car.id), db.literal(now))
+                .where(SavedSearch.id.in_(chunk))
             )
-            db.session.add(admin)
+        )
+
+# Métricas da fila de jobs (admin)
+@app.route('/api/admin/jobs', methods=['GET'])
+@jwt_required()
+def get_job_metrics():
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(int(user_id))
+        
+        if not user or not user.is_admin:
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        counts = {status: 0 for status in ('Pendente', 'Executando', 'Concluído', 'Falhou')}
+        by_type = {}
+        for job_type, status, count in db.session.execute(
+            db.select(Job.job_type, Job.status, db.func.count()).group_by(Job.job_type, Job.status)
+        ):
+            counts[status] = counts.get(status, 0) + count
+            by_type.setdefault(job_type, {})[status] = count
+        
+        now = datetime.utcnow()
+        oldest_pending = db.session.execute(
+            db.select(db.func.min(Job.run_at)).where(Job.status == 'Pendente', Job.run_at <= now)
+        ).scalar()
+        failed = db.session.execute(
+            db.select(Job.id, Job.job_type, Job.attempts, Job.last_error, Job.finished_at)
+            .where(Job.status == 'Falhou')
+            .order_by(Job.finished_at.desc())
+            .limit(20)
+        ).all()
+        
+        return jsonify({
+            'depth': counts['Pendente'] + counts['Executando'],
+            'counts': counts,
+            'by_type': by_type,
+            # Atraso do job pronto mais antigo: cresce quando o worker está parado ou não dá conta
+            'oldest_ready_seconds': (now - oldest_pending).total_seconds() if oldest_pending else 0,
+            'recent_failures': [{
+                'id': row.id,
+                'job_type': row.job_type,
+                'attempts': row.attempts,
+                'error': row.last_error,
+                'failed_at': row.finished_at.isoformat() if row.finished_at else None
+            } for row in failed]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+# Perfis de requisições gravados com X-Profile (admin)
+@app.route('/api/admin/profiles', methods=['GET'])
+@jwt_required()
+def get_request_profiles():
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(int(user_id))
+        
+        if not user or not user.is_admin:
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        profile_dir = app.config['PROFILE_DIR']
+        profiles = list_profiles(profile_dir) if os.path.isdir(profile_dir) else []
+        return jsonify({'profiles': profiles}), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+@jwt_required()
+def get_request_profile(profile_id):
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(int(user_id))
+        
+        if not user or not user.is_admin:
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return jsonify({'error': 'Perfil não encontrado'}), 404
+        
+        return send_from_directory(app.config['PROFILE_DIR'], f'{profile_id}.json', mimetype='application/json')
+        
+    except HTTPException:
+        return jsonify({'error': 'Perfil não encontrado'}), 404
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+@app.route('/api/admin/profiles/<profile_id>/download', methods=['GET'])
+@jwt_required()
+def download_request_profile(profile_id):
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(int(user_id))
+        
+        if not user or not user.is_admin:
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return jsonify({'error': 'Perfil não encontrado'}), 404
+        
+        # Arquivo do cProfile: python -m pstats <arquivo> ou snakeviz <arquivo>
+        return send_from_directory(app.config['PROFILE_DIR'], f'{profile_id}.prof', as_attachment=True,
+                                   mimetype='application/octet-stream')
+        
+    except HTTPException:
+        return jsonify({'error': 'Perfil não encontrado'}), 404
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+# Colunas adicionadas depois da criação original das tabelas.
+# db.create_all() não altera tabelas existentes, então elas são aplicadas aqui.
+COLUMN_MIGRATIONS = [
+    ('car', 'version', 'INTEGER NOT NULL DEFAULT 1'),
+    ('reservation', 'version', 'INTEGER NOT NULL DEFAULT 1'),
+    ('car', 'category', 'VARCHAR(20)'),
+]
+
+# Índices declarados nos modelos depois que as tabelas já existiam
+INDEX_MIGRATIONS = [
+    'CREATE INDEX IF NOT EXISTS ix_car_updated_at ON car (updated_at)',
+    'CREATE INDEX IF NOT EXISTS ix_car_category ON car (category)',
+    'CREATE INDEX IF NOT EXISTS ix_car_status ON car (status)',
+    'CREATE INDEX IF NOT EXISTS ix_reservation_status_updated_at ON reservation (status, updated_at)',
+    'CREATE INDEX IF NOT EXISTS ix_user_created_at ON user (created_at)',
+    'CREATE INDEX IF NOT EXISTS ix_comment_created_at ON comment (created_at)',
+    'CREATE INDEX IF NOT EXISTS ix_user_is_admin ON user (is_admin)',
+    'CREATE INDEX IF NOT EXISTS ix_reservation_created_at ON reservation (created_at)',
+    'CREATE INDEX IF NOT EXISTS ix_reservation_user_id_created_at ON reservation (user_id, created_at)',
+    'CREATE INDEX IF NOT EXISTS ix_comment_car_id_created_at ON comment (car_id, created_at)',
+]
+
+def apply_schema_migrations():
+    with db.engine.begin() as conn:
+        for table, column, ddl in COLUMN_MIGRATIONS:
+            existing = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table}")')}
+            if column in existing:
+                continue
+            try:
+                conn.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}')
+                print(f"Migração aplicada: {table}.{column}")
+            except OperationalError as e:
+                # Outro worker do gunicorn pode ter aplicado a mesma migração ao mesmo tempo
+                if 'duplicate column' not in str(e):
+                    raise
+        for ddl in INDEX_MIGRATIONS:
+            conn.exec_driver_sql(ddl)
+
+def backfill_car_categories():
+    """Preenche car.category em linhas antigas e reclassifica se o limite premium mudou"""
+    rows = db.session.execute(db.select(Car.id, Car.car_type, Car.price, Car.category)).all()
+    changes = [
+        {'car_id': row.id, 'category': category}
+        for row in rows
+        for category in [classify_car(row.car_type, row.price)]
+        if category != row.category
+    ]
+    if not changes:
+        return
+    
+    # UPDATE direto na tabela: não altera a versão de cada carro. A categoria faz parte do carro
+    # devolvido pela API, então updated_at avança nos carros reclassificados: a sincronização
+    # incremental e o cache de fragmentos (id, updated_at) passam a ver a categoria nova
+    car_table = Car.__table__
+    db.session.execute(
+        car_table.update()
+        .where(car_table.c.id == db.bindparam('car_id'))
+        .values(category=db.bindparam('category'), updated_at=datetime.utcnow()),
+        changes
+    )
+    bump_inventory_version()
+    db.session.commit()
+    print(f"Categorias recalculadas para {len(changes)} carros")
+
+# Inicializar banco de dados quando o app é carregado
+with app.app_context():
+    # Só vale para um banco novo (antes da primeira tabela); bancos existentes são convertidos
+    # uma vez com db_maintenance.py --enable-incremental-vacuum
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+    db.create_all()
+    apply_schema_migrations()
+    
+    if not db.session.get(InventoryState, 1):
+        db.session.add(InventoryState(id=1, version=0))
+        try:
             db.session.commit()
-            print("Usuário administrador criado: admin@buycarr.com / admin123")
+        except IntegrityError:
+            db.session.rollback()
+    
+    backfill_car_categories()
     
+    # Arquivos de uma execução anterior podem ter a mesma versão com outro conteúdo
+    # (banco recriado, edição manual), então o cache compartilhado começa vazio
+    os.makedirs(app.config['CATALOG_CACHE_DIR'], exist_ok=True)
+    clear_catalog_cache()
+    os.makedirs(os.path.dirname(app.config['RATE_LIMIT_DB']), exist_ok=True)
+    
+    # Criar usuário administrador padrão se não existir
+    admin = User.query.filter_by(is_admin=True).first()
+    if not admin:
+        admin = User(
+            name='Administrador',
+            email='admin@buycarr.com',
+            phone='11999999999',
+            password_hash=generate_password_hash('admin123'),
+            is_admin=True
+        )
+        db.session.add(admin)
+        try:
+            db.session.commit()
+            print("Usuário administrador criado: admin@buycarr.com / admin123")
+        except IntegrityError:
+            # Outro worker criou o administrador primeiro
+            db.session.rollback()
+
 # Executar apenas se for chamado diretamente (desenvolvimento local)
 if __name__ == '__main__':
     # Porta configurável para deploy (Render, Heroku, etc)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos fragmentos JSON por carro (CarFragments em catalog_snapshot.py)
+
+Mede o tempo de montar o corpo de GET /api/cars após uma alteração em um único
+carro, comparando:
+  - json.dumps do catálogo inteiro (caminho anterior)
+  - fragmentos frios: todos os carros serializados uma vez
+  - fragmentos quentes: só o carro alterado é serializado, o resto é concatenado
+
+Usa um banco SQLite temporário, sem tocar no buycarr.db.
+
+Uso: python benchmark_car_fragments.py [numero_de_carros]
+"""
+
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_catalog_snapshot import seed
+from app import app, db, Car, CarFragments, json_object, get_catalog_snapshot, bump_inventory_version
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    with app.app_context():
+        seed(count)
+        fragments = CarFragments(app.json.dumps)
+        snapshot = get_catalog_snapshot()
+        rows = range(len(snapshot))
+        _, cold_ms = timed(lambda: json_object(cars=fragments.render(snapshot, rows)), 1)
+
+        # Alterar um carro e montar o snapshot da nova versão
+        car = db.session.get(Car, count // 2)
+        car.price += 1000
+        bump_inventory_version()
+        db.session.commit()
+        snapshot = get_catalog_snapshot()
+        rows = range(len(snapshot))
+
+        full_body, full_ms = timed(lambda: app.json.dumps({'cars': snapshot.all_cars()}).encode('utf-8'), 3)
+        warm_body, warm_ms = timed(lambda: json_object(cars=fragments.render(snapshot, rows)), 1)
+        assert warm_body == full_body
+
+    print(f"Carros: {count} | corpo: {len(full_body)} bytes")
+    print(f"{'json.dumps completo (ms)':<34}{full_ms:>10.1f}")
+    print(f"{'fragmentos frios (ms)':<34}{cold_ms:>10.1f}")
+    print(f"{'fragmentos, 1 carro alterado (ms)':<34}{warm_ms:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark do snapshot colunar do catálogo (catalog_snapshot.py) contra o ORM
+
+Mede a memória retida por N carros e a latência de montar a listagem completa
+e de buscar um carro por id, nos dois caminhos. Usa um banco SQLite temporário,
+sem tocar no buycarr.db.
+
+Uso: python benchmark_catalog_snapshot.py [numero_de_carros]
+"""
+
+import sys
+import os
+import gc
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+tmp_dir = tempfile.mkdtemp(prefix='buycarr-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+
+from app import (app, db, Car, CatalogSnapshot, CATALOG_SNAPSHOT_COLUMNS, car_to_dict, classify_car,
+                 bump_inventory_version)
+
+BRANDS = ['Toyota', 'Honda', 'Nissan', 'Mazda', 'Ford', 'Hyundai', 'Mitsubishi', 'Isuzu']
+TYPES = ['Sedan', 'SUV', 'Camioneta', 'Hatchback', 'Caminhão']
+
+def seed(count):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    rows = []
+    for i in range(count):
+        brand = rng.choice(BRANDS)
+        car_type = rng.choice(TYPES)
+        price = float(rng.randint(300, 5000) * 1000)
+        rows.append({
+            'brand': brand, 'model': f'Modelo {rng.randint(1, 40)}', 'year': rng.randint(2005, 2024),
+            'mileage': rng.randint(0, 250000), 'price': price, 'color': rng.choice(['Branco', 'Preto', 'Prata']),
+            'fuel_type': rng.choice(['Gasolina', 'Diesel']), 'transmission': rng.choice(['Manual', 'Automático']),
+            'car_type': car_type, 'description': f'{brand} em bom estado, revisões em dia. Ref {i}.',
+            'status': rng.choice(['Disponível', 'Disponível', 'Vendido']),
+            'images': f'["/uploads/{i:08d}-a.jpg"]', 'created_at': now, 'updated_at': now,
+            'version': 1, 'category': classify_car(car_type, price)
+        })
+    db.session.execute(Car.__table__.insert(), rows)
+    bump_inventory_version()
+    db.session.commit()
+
+def retained_memory(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    with app.app_context():
+        seed(count)
+
+        def load_orm():
+            cars = Car.query.all()
+            return cars
+        cars, orm_bytes = retained_memory(load_orm)
+        del cars
+        db.session.expunge_all()
+
+        def load_snapshot():
+            rows = db.session.execute(db.select(*CATALOG_SNAPSHOT_COLUMNS).order_by(Car.id)).all()
+            return CatalogSnapshot(rows)
+        snapshot, snapshot_bytes = retained_memory(load_snapshot)
+
+        def list_orm():
+            db.session.expunge_all()
+            return [car_to_dict(car) for car in Car.query.all()]
+        orm_list_ms = timed(list_orm, 3)
+        snapshot_list_ms = timed(snapshot.all_cars, 3)
+
+        rng = random.Random(7)
+        ids = [rng.randint(1, count) for _ in range(1000)]
+        def get_orm():
+            for car_id in ids:
+                car_to_dict(db.session.get(Car, car_id))
+            db.session.expunge_all()
+        def get_snapshot():
+            for car_id in ids:
+                snapshot.get(car_id)
+        orm_get_us = timed(get_orm, 1)
+        snapshot_get_us = timed(get_snapshot, 1)
+
+    print(f"Carros: {count}")
+    print(f"{'':<28}{'ORM':>14}{'snapshot':>14}")
+    print(f"{'memória retida (MB)':<28}{orm_bytes / 1e6:>14.1f}{snapshot_bytes / 1e6:>14.1f}")
+    print(f"{'listagem completa (ms)':<28}{orm_list_ms:>14.1f}{snapshot_list_ms:>14.1f}")
+    print(f"{'carro por id (µs)':<28}{orm_get_us:>14.1f}{snapshot_get_us:>14.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark da compressão das respostas do catálogo
+
+Mede bytes transferidos e tempo de CPU por requisição de GET /api/cars para
+cada codificação (identity, gzip, br), comparando:
+  - sem cache: corpo reconstruído e comprimido a cada requisição
+  - com cache: corpo pré-comprimido (arquivo compartilhado entre workers) reutilizado
+    enquanto a versão do inventário não muda
+
+Usa um banco SQLite temporário, sem tocar no buycarr.db.
+
+Uso: python benchmark_compression.py [numero_de_carros] [requisicoes]
+"""
+
+import sys
+import os
+import random
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+tmp_dir = tempfile.mkdtemp(prefix='buycarr-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+os.environ['RATE_LIMIT_ENABLED'] = 'false'  # o benchmark repete a mesma rota milhares de vezes
+
+from app import app, db, Car, brotli, clear_catalog_cache, bump_inventory_version
+
+BRANDS = ['Toyota', 'Honda', 'Nissan', 'Mazda', 'Ford', 'Hyundai', 'Mitsubishi', 'Isuzu']
+TYPES = ['Sedan', 'SUV', 'Camioneta', 'Hatchback', 'Caminhão']
+
+def seed(count):
+    rng = random.Random(42)
+    cars = []
+    for i in range(count):
+        brand = rng.choice(BRANDS)
+        cars.append(Car(
+            brand=brand,
+            model=f'Modelo {rng.randint(1, 40)}',
+            year=rng.randint(2005, 2024),
+            mileage=rng.randint(0, 250000),
+            price=float(rng.randint(300, 5000) * 1000),
+            color=rng.choice(['Branco', 'Preto', 'Prata', 'Azul']),
+            fuel_type=rng.choice(['Gasolina', 'Diesel']),
+            transmission=rng.choice(['Manual', 'Automático']),
+            car_type=rng.choice(TYPES),
+            description=f'{brand} em bom estado, revisões em dia, documentação completa. Ref {i}.',
+            images=f'["/uploads/{i:08d}-a.jpg", "/uploads/{i:08d}-b.jpg"]'
+        ))
+    db.session.add_all(cars)
+    bump_inventory_version()
+    db.session.commit()
+
+def measure(client, encoding, requests, clear_cache):
+    headers = {} if encoding == 'identity' else {'Accept-Encoding': encoding}
+    size = 0
+    start = time.process_time()
+    for _ in range(requests):
+        if clear_cache:
+            clear_catalog_cache()
+        response = client.get('/api/cars', headers=headers)
+        size = len(response.data)
+    cpu_ms = (time.process_time() - start) * 1000 / requests
+    return size, cpu_ms
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with app.app_context():
+        seed(count)
+
+    client = app.test_client()
+    encodings = ['identity', 'gzip'] + (['br'] if brotli else [])
+
+    print(f"Carros: {count} | Requisições por medição: {requests}")
+    print(f"{'codificação':<12}{'bytes':>12}{'CPU sem cache (ms)':>22}{'CPU com cache (ms)':>22}")
+    for encoding in encodings:
+        size, cold_ms = measure(client, encoding, requests, clear_cache=True)
+        client.get('/api/cars', headers={'Accept-Encoding': encoding})  # aquecer o cache
+        _, warm_ms = measure(client, encoding, requests, clear_cache=False)
+        print(f"{encoding:<12}{size:>12}{cold_ms:>22.2f}{warm_ms:>22.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark da comparação de carros com as buscas salvas
+
+Gera `buscas` buscas salvas aleatórias (marca, tipo, faixa de preço e de ano,
+cada filtro presente ou não) e compara, para `carros` carros aleatórios:
+  - laço simples: testa cada busca salva contra o carro;
+  - SavedSearchIndex: baldes (marca, tipo) + árvore de intervalos de preço.
+Confere que os dois devolvem as mesmas buscas. Depois grava as buscas num banco
+SQLite temporário e mede o job saved_searches.match completo (carga do índice,
+comparação e INSERT das correspondências).
+
+Uso: python benchmark_saved_searches.py [buscas] [carros]
+"""
+
+import sys
+import os
+import io
+import random
+import statistics
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+tmp_dir = tempfile.mkdtemp(prefix='buycarr-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+os.environ['CATALOG_CACHE_DIR'] = os.path.join(tmp_dir, 'catalog_cache')
+os.environ['RATE_LIMIT_DB'] = os.path.join(tmp_dir, 'rate_limits.db')
+
+from saved_search_index import SavedSearchIndex, normalize
+
+BRANDS = ['Toyota', 'Honda', 'Nissan', 'Hyundai', 'Kia', 'Ford', 'Chevrolet', 'Volkswagen', 'BMW', 'Mercedes-Benz']
+TYPES = ['Sedan', 'SUV', 'Camioneta', 'Hatchback', 'Coupé']
+
+def random_search(rng):
+    min_price = rng.randint(10, 400) * 10000 if rng.random() < 0.7 else None
+    max_price = (min_price or 0) + rng.randint(5, 150) * 10000 if rng.random() < 0.7 else None
+    min_year = rng.randint(2000, 2020) if rng.random() < 0.6 else None
+    max_year = (min_year or 2000) + rng.randint(0, 10) if rng.random() < 0.4 else None
+    return {
+        'brand': rng.choice(BRANDS) if rng.random() < 0.8 else None,
+        'car_type': rng.choice(TYPES) if rng.random() < 0.5 else None,
+        'min_price': min_price, 'max_price': max_price, 'min_year': min_year, 'max_year': max_year
+    }
+
+def random_car(rng):
+    return {'brand': rng.choice(BRANDS), 'car_type': rng.choice(TYPES),
+            'price': float(rng.randint(10, 500) * 10000), 'year': rng.randint(2000, 2025)}
+
+def naive_match(searches, car):
+    brand, car_type = normalize(car['brand']), normalize(car['car_type'])
+    return [search_id for search_id, search in searches.items()
+            if (search['brand'] is None or normalize(search['brand']) == brand)
+            and (search['car_type'] is None or normalize(search['car_type']) == car_type)
+            and (search['min_price'] is None or search['min_price'] <= car['price'])
+            and (search['max_price'] is None or car['price'] <= search['max_price'])
+            and (search['min_year'] is None or search['min_year'] <= car['year'])
+            and (search['max_year'] is None or car['year'] <= search['max_year'])]
+
+def timed(function, cars):
+    samples, results = [], []
+    for car in cars:
+        start = time.perf_counter()
+        results.append(function(car))
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, results
+
+def report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<28}{statistics.mean(samples):>10.3f}{samples[len(samples) // 2]:>10.3f}{p99:>10.3f}")
+
+def benchmark_job(searches, cars):
+    from app import app, db, Car, SavedSearch, SavedSearchMatch, User, match_saved_searches
+    from werkzeug.security import generate_password_hash
+
+    with app.app_context(), redirect_stdout(io.StringIO()):
+        user = User(name='Cliente', email='cliente@teste.com', phone='11988887777',
+                    password_hash=generate_password_hash('123456'))
+        db.session.add(user)
+        db.session.flush()
+        db.session.execute(db.insert(SavedSearch), [dict(search, id=search_id, user_id=user.id)
+                                                    for search_id, search in searches.items()])
+        car_rows = [Car(model='Modelo', mileage=0, color='Branco', fuel_type='Gasolina', transmission='Manual',
+                        images='[]', **car) for car in cars]
+        db.session.add_all(car_rows)
+        db.session.commit()
+        car_ids = [car.id for car in car_rows]
+
+    with app.app_context():
+        # Primeira execução carrega o índice inteiro do banco (o worker faz isso uma vez por processo)
+        start = time.perf_counter()
+        match_saved_searches(car_ids[0])
+        db.session.commit()
+        load = time.perf_counter() - start
+        print(f"\njob saved_searches.match (SQLite, {len(searches)} buscas no banco)")
+        print(f"primeira execução com carga do índice: {load * 1000:.0f} ms")
+
+        samples = []
+        for car_id in car_ids[1:]:
+            start = time.perf_counter()
+            match_saved_searches(car_id)
+            db.session.commit()
+            samples.append((time.perf_counter() - start) * 1000)
+        total = db.session.execute(db.select(db.func.count()).select_from(SavedSearchMatch)).scalar()
+    print(f"{'':<28}{'média ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    report('job por carro (com INSERT)', samples)
+    print(f"correspondências gravadas: {total} ({total / len(car_ids):.0f} por carro)")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    car_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(42)
+    searches = {search_id: random_search(rng) for search_id in range(1, count + 1)}
+    cars = [random_car(rng) for _ in range(car_count)]
+
+    start = time.perf_counter()
+    index = SavedSearchIndex()
+    for search_id, search in searches.items():
+        index.add(search_id, **search)
+    index.build()
+    print(f"{count} buscas salvas, {car_count} carros; índice montado em {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"{'':<28}{'média ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    naive_samples, expected = timed(lambda car: naive_match(searches, car), cars)
+    report('laço sobre todas as buscas', naive_samples)
+    index_samples, matched = timed(lambda car: index.match(**car), cars)
+    report('SavedSearchIndex', index_samples)
+
+    assert all(sorted(a) == sorted(b) for a, b in zip(expected, matched)), 'resultados diferentes'
+    print(f"resultados idênticos; {statistics.mean(len(ids) for ids in matched):.0f} buscas por carro em média; "
+          f"{statistics.mean(naive_samples) / statistics.mean(index_samples):.0f}x mais rápido")
+
+    benchmark_job(searches, cars)
+
+if __name__ == '__main__':
+    main()
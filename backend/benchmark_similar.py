@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark do índice de carros semelhantes (similar_cars.py)
+
+Mede o tempo de carga completa, de uma atualização incremental e de uma
+consulta k-NN com dados sintéticos, sem banco de dados.
+
+Uso: python benchmark_similar.py [numero_de_carros] [consultas]
+"""
+
+import sys
+import os
+import random
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from similar_cars import SimilarCarsIndex
+
+TYPES = ['Sedan', 'SUV', 'Camioneta', 'Hatchback', 'Caminhão', 'Mini Ônibus']
+
+def synthetic_rows(count):
+    rng = random.Random(42)
+    for car_id in range(1, count + 1):
+        yield (
+            car_id,
+            float(rng.randint(300, 5000) * 1000),
+            rng.randint(2000, 2024),
+            rng.randint(0, 300000),
+            rng.choice(TYPES),
+            rng.choice(['Gasolina', 'Diesel', 'Híbrido']),
+            rng.choice(['Manual', 'Automático'])
+        )
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    rows = list(synthetic_rows(count))
+    index = SimilarCarsIndex()
+
+    start = time.perf_counter()
+    index.load(rows)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for car_id, *features in rows[:1000]:
+        index.upsert(car_id, *features)
+    upsert_us = (time.perf_counter() - start) * 1e6 / 1000
+
+    rng = random.Random(7)
+    start = time.perf_counter()
+    for _ in range(queries):
+        car_id, *features = rows[rng.randrange(count)]
+        numeric, codes = index.encode(*features)
+        index.query(numeric, codes, 10, exclude_id=car_id)
+    query_ms = (time.perf_counter() - start) * 1000 / queries
+
+    print(f"Carros: {count}")
+    print(f"Carga completa: {load_ms:.1f} ms")
+    print(f"Atualização incremental: {upsert_us:.1f} µs por carro")
+    print(f"Consulta k=10: {query_ms:.2f} ms (média de {queries})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark das listas do usuário: GET /api/favorites, GET /api/reservations e
+GET /api/admin/reservations
+
+Popula um banco SQLite temporário com um usuário que tem `linhas` favoritos e
+`linhas` reservas e mede, por rota, o tempo por requisição, o número de
+consultas SQL e o pico de memória alocada durante a requisição (tracemalloc),
+normalizados por 1000 linhas. Também grava o corpo de cada resposta em
+/tmp/buycarr-user-lists-<rota>.json para comparar o contrato entre versões.
+
+Uso: python benchmark_user_lists.py [linhas] [requisicoes]
+"""
+
+import sys
+import os
+import io
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+tmp_dir = tempfile.mkdtemp(prefix='buycarr-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+os.environ['CATALOG_CACHE_DIR'] = os.path.join(tmp_dir, 'catalog_cache')
+os.environ['RATE_LIMIT_DB'] = os.path.join(tmp_dir, 'rate_limits.db')
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from app import app, db, Car, Favorite, Reservation, User, bump_inventory_version
+
+ROUTES = ['/api/favorites', '/api/reservations', '/api/admin/reservations']
+
+def seed(count):
+    rng = random.Random(42)
+    user = User(name='Cliente', email='cliente@teste.com', phone='11988887777',
+                password_hash=generate_password_hash('123456'))
+    cars = [Car(brand=rng.choice(['Toyota', 'Honda', 'Nissan']), model=f'Modelo {i}', year=rng.randint(2005, 2024),
+                mileage=rng.randint(0, 250000), price=float(rng.randint(300, 5000) * 1000), color='Branco',
+                fuel_type='Gasolina', transmission='Manual', car_type='Sedan',
+                images=f'["/uploads/{i:08d}-a.webp"]') for i in range(count)]
+    db.session.add_all([user] + cars)
+    db.session.flush()
+    statuses = ['Pendente', 'Vendido', 'Cancelado']
+    db.session.add_all([Favorite(user_id=user.id, car_id=car.id) for car in rng.sample(cars, count)])
+    db.session.add_all([Reservation(user_id=user.id, car_id=rng.choice(cars).id, message='Tenho interesse',
+                                    status=rng.choice(statuses)) for _ in range(count)])
+    bump_inventory_version()
+    db.session.commit()
+    admin = User.query.filter_by(is_admin=True).first()
+    return create_access_token(identity=str(user.id)), create_access_token(identity=str(admin.id))
+
+def measure(client, engine, path, headers, requests, rows):
+    queries = []
+    counter = lambda *args: queries.append(1)
+    event.listen(engine, 'before_cursor_execute', counter)
+    response = client.get(path, headers=headers)
+    event.remove(engine, 'before_cursor_execute', counter)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    with open(f"/tmp/buycarr-user-lists-{path.strip('/').replace('/', '-')}.json", 'w') as file:
+        json.dump(response.get_json(), file, sort_keys=True, ensure_ascii=False)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(path, headers=headers)
+    elapsed = (time.perf_counter() - start) / requests
+
+    tracemalloc.start()
+    client.get(path, headers=headers)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    scale = 1000 / rows
+    print(f"{path:<26}{elapsed * 1000 * scale:>12.1f}{len(queries):>10}{peak / 1024 * scale:>14.0f}"
+          f"{len(response.data) / 1024:>11.0f}")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with app.app_context():
+        user_token, admin_token = seed(rows)
+        engine = db.engine
+    print(f"{rows} favoritos e {rows} reservas para um usuário; {requests} requisições por rota")
+    print(f"{'rota':<26}{'ms/1k':>12}{'consultas':>10}{'pico KB/1k':>14}{'corpo KB':>11}")
+    client = app.test_client()
+    for path in ROUTES:
+        token = admin_token if path.startswith('/api/admin') else user_token
+        with redirect_stdout(io.StringIO()):
+            measure(client, engine, path, {'Authorization': f'Bearer {token}'}, 1, rows)  # aquecimento
+        measure(client, engine, path, {'Authorization': f'Bearer {token}'}, requests, rows)
+
+if __name__ == '__main__':
+    main()
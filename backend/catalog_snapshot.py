@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Snapshot imutável do catálogo em colunas compactas
+
+Substitui os objetos Car do ORM nas rotas de leitura do catálogo. Cada coluna
+numérica é um array.array e cada coluna de texto com poucos valores distintos
+(marca, tipo, status...) é guardada como códigos inteiros mais uma tupla de
+rótulos. Um snapshot nunca é alterado: quando o inventário muda, um novo é
+montado e a referência é trocada de uma vez.
+
+CarFragments guarda o JSON já serializado de cada carro, por (id, updated_at),
+para que as listagens sejam montadas concatenando bytes em vez de refazer o
+json.dumps do catálogo inteiro a cada versão.
+"""
+
+from array import array
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+# Ordem das colunas esperada em cada linha passada ao construtor
+COLUMNS = ('id', 'brand', 'model', 'year', 'mileage', 'price', 'color', 'fuel_type', 'transmission',
+           'car_type', 'description', 'status', 'images', 'created_at', 'updated_at', 'version', 'category')
+# Colunas de texto codificadas por dicionário
+CODED_COLUMNS = ('brand', 'model', 'color', 'fuel_type', 'transmission', 'car_type', 'status', 'category')
+
+
+def _to_micros(value):
+    return (value - EPOCH) // ONE_MICROSECOND
+
+
+def _isoformat(micros):
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+class CatalogSnapshot:
+    """Catálogo completo em colunas, com índices por id, categoria e tipo"""
+
+    __slots__ = ('ids', 'years', 'mileages', 'prices', 'versions', 'created_at', 'updated_at',
+                 'descriptions', 'images', 'codes', 'labels', 'rows_by_id',
+                 'rows_by_category', 'available_rows_by_type')
+
+    def __init__(self, rows):
+        self.ids = array('q')
+        self.years = array('l')
+        self.mileages = array('q')
+        self.prices = array('d')
+        self.versions = array('l')
+        self.created_at = array('q')
+        self.updated_at = array('q')
+        self.descriptions = []
+        self.images = []
+        self.codes = {column: array('I') for column in CODED_COLUMNS}
+        lookups = {column: {} for column in CODED_COLUMNS}
+        self.rows_by_id = {}
+        rows_by_category = {}
+        available_rows_by_type = {}
+
+        positions = {column: COLUMNS.index(column) for column in CODED_COLUMNS}
+        for row_number, row in enumerate(rows):
+            (car_id, _, _, year, mileage, price, _, _, _, car_type, description, status,
+             images, created_at, updated_at, version, category) = row
+            self.ids.append(car_id)
+            self.years.append(year)
+            self.mileages.append(mileage)
+            self.prices.append(price)
+            self.versions.append(version or 1)
+            self.created_at.append(_to_micros(created_at))
+            self.updated_at.append(_to_micros(updated_at or created_at))
+            self.descriptions.append(description)
+            self.images.append(images)
+            for column in CODED_COLUMNS:
+                value = row[positions[column]]
+                lookup = lookups[column]
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(lookup)
+                self.codes[column].append(code)
+
+            self.rows_by_id[car_id] = row_number
+            rows_by_category.setdefault(category, array('l')).append(row_number)
+            if status == 'Disponível':
+                available_rows_by_type.setdefault(car_type, array('l')).append(row_number)
+
+        self.descriptions = tuple(self.descriptions)
+        self.images = tuple(self.images)
+        self.labels = {column: tuple(lookups[column]) for column in CODED_COLUMNS}
+        self.rows_by_category = rows_by_category
+        self.available_rows_by_type = available_rows_by_type
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _text(self, column, row):
+        return self.labels[column][self.codes[column][row]]
+
+    def car_dict(self, row):
+        """Mesmo formato de car_to_dict em app.py"""
+        return {
+            'id': self.ids[row],
+            'brand': self._text('brand', row),
+            'model': self._text('model', row),
+            'year': self.years[row],
+            'mileage': self.mileages[row],
+            'price': self.prices[row],
+            'color': self._text('color', row),
+            'fuel_type': self._text('fuel_type', row),
+            'transmission': self._text('transmission', row),
+            'car_type': self._text('car_type', row),
+            'description': self.descriptions[row],
+            'status': self._text('status', row),
+            'images': self.images[row],
+            'created_at': _isoformat(self.created_at[row]),
+            'version': self.versions[row],
+            'category': self._text('category', row)
+        }
+
+    def type_dict(self, row):
+        """Formato da listagem por tipo (GET /api/cars/type/<tipo>)"""
+        return {
+            'id': self.ids[row],
+            'brand': self._text('brand', row),
+            'model': self._text('model', row),
+            'year': self.years[row],
+            'mileage': self.mileages[row],
+            'price': self.prices[row],
+            'color': self._text('color', row),
+            'fuel_type': self._text('fuel_type', row),
+            'transmission': self._text('transmission', row),
+            'car_type': self._text('car_type', row),
+            'description': self.descriptions[row],
+            'images': self.images[row],
+            'status': self._text('status', row),
+            'created_at': _isoformat(self.created_at[row]),
+            'updated_at': _isoformat(self.updated_at[row])
+        }
+
+    def get(self, car_id):
+        row = self.rows_by_id.get(car_id)
+        return None if row is None else self.car_dict(row)
+
+    def all_cars(self):
+        return [self.car_dict(row) for row in range(len(self.ids))]
+
+    def cars_in_category(self, category):
+        return [self.car_dict(row) for row in self.rows_by_category.get(category, ())]
+
+    def available_cars_of_type(self, car_type):
+        return [self.type_dict(row) for row in self.available_rows_by_type.get(car_type, ())]
+
+
+def json_object(**members):
+    """Objeto JSON a partir de valores já serializados (bytes), na ordem das chaves"""
+    return b'{' + b', '.join(b'"%s": %s' % (key.encode('utf-8'), members[key]) for key in sorted(members)) + b'}'
+
+
+class CarFragments:
+    """JSON de cada carro por formato, reaproveitado enquanto updated_at não mudar"""
+
+    def __init__(self, dumps):
+        self._dumps = dumps
+        self._fragments = {'car': {}, 'type': {}}  # formato -> {id: (updated_at, bytes)}
+
+    def __len__(self):
+        return sum(len(fragments) for fragments in self._fragments.values())
+
+    def render(self, snapshot, rows, shape='car'):
+        """Lista JSON dos carros nas linhas dadas do snapshot"""
+        fragments = self._fragments[shape]
+        to_dict = snapshot.car_dict if shape == 'car' else snapshot.type_dict
+        ids, updated_at = snapshot.ids, snapshot.updated_at
+        parts = []
+        for row in rows:
+            car_id = ids[row]
+            cached = fragments.get(car_id)
+            if cached is None or cached[0] != updated_at[row]:
+                cached = (updated_at[row], self._dumps(to_dict(row)).encode('utf-8'))
+                fragments[car_id] = cached
+            parts.append(cached[1])
+        return b'[' + b', '.join(parts) + b']'
+
+    def retain(self, snapshot):
+        """Descarta fragmentos de carros que não existem mais no snapshot"""
+        for fragments in self._fragments.values():
+            for car_id in [car_id for car_id in fragments if car_id not in snapshot.rows_by_id]:
+                del fragments[car_id]
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Verificação dos planos de consulta (EXPLAIN QUERY PLAN) das rotas da API
+
+Chama as rotas com o test client do Flask sobre um banco SQLite temporário,
+registra cada SELECT/UPDATE/DELETE executado e roda EXPLAIN QUERY PLAN com os
+mesmos parâmetros. Falha (código de saída 1) quando alguma consulta varre uma
+tabela inteira fora das rotas que, por contrato, leem a tabela toda.
+
+Uso: python check_query_plans.py [-v]
+  -v  imprime o plano de todas as consultas, não só as que falharam
+"""
+
+import sys
+import os
+import io
+import re
+import tempfile
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+tmp_dir = tempfile.mkdtemp(prefix='buycarr-plans-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'plans.db')}"
+os.environ['CATALOG_CACHE_DIR'] = os.path.join(tmp_dir, 'catalog_cache')
+os.environ['RATE_LIMIT_DB'] = os.path.join(tmp_dir, 'rate_limits.db')
+os.environ['PROFILE_DIR'] = os.path.join(tmp_dir, 'profiles')
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+from app import app, db, car_views, match_saved_searches
+
+# Rotas que devolvem (ou agregam) a tabela inteira; a varredura completa é esperada
+FULL_SCAN_ALLOWED = {
+    'get_cars': {'car', 'car_view'},          # snapshot colunar do catálogo; ranking "em alta"
+    'get_car_changes': {'car'},               # sincronização sem token = catálogo completo
+    'get_all_comments': {'comment'},          # feed geral de comentários
+    'get_admin_reservations': {'reservation'},
+    'get_admin_stats': {'car', 'reservation', 'car_view'},  # contagens por status; carros em alta
+    # Snapshot das análises de preço (compartilhado entre as três rotas)
+    'get_price_analytics': {'car', 'reservation'},
+    'get_depreciation_analytics': {'car', 'reservation'},
+    'get_time_to_sale_analytics': {'car', 'reservation'},
+    'get_job_metrics': {'job'},  # contagens por tipo/status; concluídos são apagados pelo worker
+}
+
+SCAN_PATTERN = re.compile(r'^SCAN (\w+)')
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+
+def exercise_routes(client):
+    """Chama as rotas principais com dados suficientes para todas as consultas rodarem"""
+    admin = login(client, 'admin@buycarr.com', 'admin123')
+    client.post('/api/auth/register', json={'name': 'Cliente', 'email': 'cliente@teste.com', 'phone': '11988887777',
+                                            'password': '123456', 'confirmPassword': '123456'})
+    user = login(client, 'cliente@teste.com', '123456')
+
+    car_ids = []
+    for index, car_type in enumerate(['Sedan', 'SUV', 'Camioneta']):
+        response = client.post('/api/cars', headers=admin, json={
+            'brand': 'Toyota', 'model': f'Modelo {index}', 'year': 2020, 'mileage': 10000 * index,
+            'price': 500000.0 + index, 'color': 'Branco', 'fuel_type': 'Gasolina', 'transmission': 'Manual',
+            'car_type': car_type, 'images': '[]'})
+        car_ids.append(response.get_json()['car']['id'])
+    car_id = car_ids[0]
+
+    client.get('/api/cars')
+    client.get('/api/cars?category=premium')
+    client.get('/api/cars/categories')
+    client.get('/api/cars/type/Sedan')
+    client.get(f'/api/cars/{car_id}')
+    car_views.flush()  # o que a thread do buffer faria depois de VIEW_FLUSH_INTERVAL
+    client.get('/api/cars?sort=trending')
+    client.get('/api/cars/changes')
+    since = client.get('/api/cars/changes').get_json()['token']
+    client.put(f'/api/cars/{car_ids[1]}', headers=admin, json={'price': 600000.0})
+    client.get(f'/api/cars/changes?since={since}')
+    client.get(f'/api/cars/{car_id}/similar')
+
+    client.get('/api/auth/me', headers=user)
+    client.get('/api/profile', headers=user)
+    client.put('/api/profile', headers=user, json={'name': 'Cliente Teste'})
+
+    favorite = client.post('/api/favorites', headers=user, json={'car_id': car_id}).get_json()
+    client.get('/api/favorites', headers=user)
+    client.post('/api/favorites', headers=user, json={'car_id': car_ids[1]})
+    client.delete(f"/api/favorites/{favorite['favorite_id']}", headers=user)
+
+    reservation_ids = []
+    for reserved_car in car_ids[:2]:
+        response = client.post('/api/reservations', headers=user, json={'car_id': reserved_car})
+        reservation_ids.append(response.get_json()['reservation_id'])
+    client.get('/api/reservations', headers=user)
+    client.get('/api/admin/reservations', headers=admin)
+    client.put(f'/api/admin/reservations/{reservation_ids[0]}/confirm', headers=admin, json={})
+    client.put(f'/api/admin/reservations/{reservation_ids[1]}/cancel', headers=admin, json={})
+
+    comment = client.post(f'/api/cars/{car_id}/comments', headers=user, json={'comment': 'Ótimo carro', 'rating': 5})
+    client.post('/api/comments', headers=user, data={'comment': 'Ótimo atendimento', 'rating': '5'})
+    client.get(f'/api/cars/{car_id}/comments')
+    client.get(f"/api/cars/{car_id}/comments?limit=10&before={comment.get_json()['id']}")
+    client.get('/api/comments')
+    client.get(f'/api/cars/{car_id}/bundle')
+    client.get(f'/api/cars/{car_id}/bundle', headers=user)
+    client.get('/api/admin/contact')
+
+    upload = client.post('/api/uploads', headers=user, json={'filename': 'foto.jpg', 'size': 4}).get_json()
+    client.get(f"/api/uploads/{upload['upload_id']}", headers=user)
+    client.put(f"/api/uploads/{upload['upload_id']}/chunks/0", headers=user, data=b'abcd')
+
+    client.get('/api/admin/stats', headers=admin)
+    client.get('/api/admin/analytics/prices', headers=admin)
+    client.get('/api/admin/analytics/depreciation', headers=admin)
+    client.get('/api/admin/analytics/time-to-sale', headers=admin)
+    client.get('/api/admin/jobs', headers=admin)
+    search = client.post('/api/saved-searches', headers=user, json={
+        'brand': 'Toyota', 'min_price': 400000, 'max_price': 700000}).get_json()
+    client.get('/api/saved-searches', headers=user)
+    match_saved_searches(car_ids[1])  # o job que o worker executaria
+    client.get('/api/saved-searches/matches', headers=user)
+    client.delete(f"/api/saved-searches/{search['id']}", headers=user)
+    client.post('/api/batch', headers=user, json={'requests': [
+        {'id': 'me', 'path': '/api/auth/me'}, {'id': 'favorites', 'path': '/api/favorites'}]})
+
+
+def main():
+    verbose = '-v' in sys.argv[1:]
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            return
+        endpoint = request.endpoint if has_request_context() else None
+        statements.append((endpoint, statement, parameters))
+
+    with app.app_context():
+        tables = set(db.metadata.tables)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            with redirect_stdout(io.StringIO()):  # as rotas imprimem logs de depuração
+                exercise_routes(app.test_client())
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        failures = 0
+        checked = set()
+        with db.engine.connect() as conn:
+            for endpoint, statement, parameters in statements:
+                if (endpoint, statement) in checked:
+                    continue
+                checked.add((endpoint, statement))
+
+                plan = [row[3] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+                scanned = {match.group(1) for match in map(SCAN_PATTERN.match, plan) if match} & tables
+                unexpected = scanned - FULL_SCAN_ALLOWED.get(endpoint, set())
+                if unexpected:
+                    failures += 1
+                if unexpected or verbose:
+                    status = '❌' if unexpected else '✅'
+                    print(f"{status} [{endpoint or 'inicialização'}] {' '.join(statement.split())[:160]}")
+                    for line in plan:
+                        print(f"     {line}")
+
+    print(f"\nConsultas verificadas: {len(checked)} | varreduras completas inesperadas: {failures}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,77 +1,44 @@
-import requests
-import json
+#!/usr/bin/env python3
+"""
+Script para criar um carro de teste no banco de dados
+A categoria (normal, premium, pickup, bus) é calculada pelo app ao gravar o carro
+"""
 
-API_BASE_URL = 'http://localhost:5000/api'
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-def login_admin():
-    """Login como admin"""
-    print("=== Login como Admin ===")
-    
-    login_data = {
-        'email': 'admin@buycarr.com',
-        'password': 'admin123'
-    }
-    
-    try:
-        response = requests.post(f'{API_BASE_URL}/auth/admin/login', json=login_data)
-        print(f'Status: {response.status_code}')
-        
-        if response.status_code == 200:
-            data = response.json()
-            token = data.get("access_token")
-            if token:
-                print('Login admin bem-sucedido!')
-                return token
-            else:
-                print('Token não encontrado')
-                return None
-        else:
-            print(f'Erro no login admin: {response.text}')
-            return None
-            
-    except Exception as e:
-        print(f'Erro de conexão: {e}')
-        return None
+from app import app, db, Car, record_event, bump_inventory_version
 
-def create_test_car(token):
+def create_test_car():
     """Criar carro de teste"""
-    print("\n=== Criando Carro de Teste ===")
-    
-    car_data = {
-        'brand': 'Toyota',
-        'model': 'Corolla',
-        'year': 2020,
-        'mileage': 50000,
-        'price': 250000,
-        'color': 'Branco',
-        'fuel_type': 'Gasolina',
-        'transmission': 'Automático',
-        'description': 'Carro de teste para demonstração',
-        'images': '["https://example.com/car1.jpg"]'
-    }
-    
-    headers = {'Authorization': f'Bearer {token}'}
-    
-    try:
-        response = requests.post(f'{API_BASE_URL}/cars', json=car_data, headers=headers)
-        print(f'Status: {response.status_code}')
-        
-        if response.status_code == 201:
-            data = response.json()
-            print('Carro criado com sucesso!')
-            print(f'ID do carro: {data.get("car_id")}')
-            return data.get("car_id")
-        else:
-            print(f'Erro: {response.text}')
-            return None
-            
-    except Exception as e:
-        print(f'Erro de conexão: {e}')
-        return None
+    print("=== Criando Carro de Teste ===")
+
+    with app.app_context():
+        car = Car(
+            brand='Toyota',
+            model='Corolla',
+            year=2020,
+            mileage=50000,
+            price=250000,
+            color='Branco',
+            fuel_type='Gasolina',
+            transmission='Automático',
+            car_type='Sedan',
+            description='Carro de teste para demonstração',
+            status='Disponível',
+            images='["https://example.com/car1.jpg"]'
+        )
+        db.session.add(car)
+        db.session.flush()  # set_car_category preenche car.category antes do INSERT
+        record_event('car.created', car_id=car.id, status=car.status)
+        # Catálogo em cache (e o aquecimento pelo worker) passa a incluir o carro novo
+        bump_inventory_version()
+        db.session.commit()
+
+        print('Carro criado com sucesso!')
+        print(f'ID do carro: {car.id} | categoria: {car.category}')
+        return car.id
 
 if __name__ == '__main__':
-    token = login_admin()
-    if token:
-        create_test_car(token)
-    else:
-        print("Não foi possível fazer login como admin")
+    create_test_car()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Manutenção do banco SQLite com a API no ar
+
+Tarefas (na ordem em que rodam):
+  - backup   cópia consistente com a API de backup do SQLite, em passos de
+             BACKUP_STEP_PAGES páginas: entre um passo e outro o banco fica livre
+             para as gravações das rotas. Se o banco mudar no meio, o SQLite
+             recomeça a cópia; depois de BACKUP_MAX_RESTARTS recomeços a cópia é
+             feita num passo só. Mantém os --keep backups mais recentes.
+  - check    integrity_check completo sobre o backup recém-criado (mesmo
+             conteúdo, sem segurar o banco em uso); sem backup, quick_check no
+             banco em uso (--full-check para integrity_check)
+  - vacuum   devolve as páginas livres (carros excluídos, jobs e eventos antigos)
+             com PRAGMA incremental_vacuum, VACUUM_STEP_PAGES por transação
+  - analyze  ANALYZE (amostrado com analysis_limit) e PRAGMA optimize, para o
+             planejador continuar escolhendo os índices certos
+
+Não importa o app (evita a inicialização dele: create_all, limpeza do cache do
+catálogo...); abre o mesmo arquivo que ele, a partir de DATABASE_URL. Cada
+tarefa usa transações curtas e espera até BUSY_TIMEOUT pelo lock das rotas.
+Duas execuções simultâneas são evitadas com uma trava de arquivo.
+
+O incremental_vacuum só funciona com auto_vacuum=INCREMENTAL. Bancos novos já
+são criados assim pelo app; um banco antigo precisa de uma conversão única
+(VACUUM completo, que bloqueia o banco enquanto roda), feita com
+--enable-incremental-vacuum, de preferência fora do horário de uso.
+
+Uso: python db_maintenance.py [backup] [check] [vacuum] [analyze]
+                              [--backup-dir instance/backups] [--keep 7]
+                              [--full-check] [--enable-incremental-vacuum]
+  Sem tarefas, roda todas. Termina com código 1 se alguma falhar.
+  Exemplo no cron: 30 4 * * * cd /app/backend && python db_maintenance.py
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing, contextmanager
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Mesma pasta que app.instance_path; o Flask-SQLAlchemy resolve caminhos relativos do SQLite nela
+INSTANCE_DIR = os.path.join(BACKEND_DIR, 'instance')
+TASKS = ['backup', 'check', 'vacuum', 'analyze']
+
+BUSY_TIMEOUT = 30  # segundos esperando o lock de escrita das rotas
+BACKUP_STEP_PAGES = 1024
+BACKUP_STEP_SLEEP = 0.01  # segundos entre passos, para as rotas gravarem
+BACKUP_MAX_RESTARTS = 5
+VACUUM_STEP_PAGES = 1000
+VACUUM_STEP_SLEEP = 0.05
+ANALYSIS_LIMIT = 1000  # linhas amostradas por índice no ANALYZE
+
+
+def log(message):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {message}", flush=True)
+
+
+def database_path():
+    url = make_url(os.getenv('DATABASE_URL', 'sqlite:///buycarr.db'))
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        raise SystemExit(f'DATABASE_URL não aponta para um arquivo SQLite: {url}')
+    return url.database if os.path.isabs(url.database) else os.path.join(INSTANCE_DIR, url.database)
+
+
+def connect(path):
+    # isolation_level=None: cada instrução é sua própria transação, nenhum lock fica preso entre elas
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT * 1000}')
+    return conn
+
+
+def pragma(conn, name):
+    return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+
+def megabytes(pages, page_size):
+    return pages * page_size / (1024 * 1024)
+
+
+class RestartLimit(Exception):
+    pass
+
+
+@contextmanager
+def maintenance_lock(path):
+    with open(path, 'a') as file:
+        if fcntl:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise SystemExit('Outra manutenção já está rodando neste banco')
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def backup(conn, backup_dir, keep):
+    os.makedirs(backup_dir, exist_ok=True)
+    name = f"buycarr-{datetime.now():%Y%m%dT%H%M%S}.db"
+    target_path = os.path.join(backup_dir, name)
+    tmp_path = f'{target_path}.tmp'
+
+    restarts = 0
+    progress_state = {'remaining': None}
+
+    def progress(status, remaining, total):
+        nonlocal restarts
+        if progress_state['remaining'] is not None and remaining >= progress_state['remaining']:
+            restarts += 1  # o banco mudou entre dois passos e a cópia recomeçou do início
+            if restarts >= BACKUP_MAX_RESTARTS:
+                raise RestartLimit()
+        progress_state['remaining'] = remaining
+
+    with closing(sqlite3.connect(tmp_path)) as target:
+        try:
+            conn.backup(target, pages=BACKUP_STEP_PAGES, progress=progress, sleep=BACKUP_STEP_SLEEP)
+        except RestartLimit:
+            # Gravações frequentes demais para a cópia em passos: copia tudo num passo só
+            # (as rotas esperam pelo lock só durante a cópia, até BUSY_TIMEOUT)
+            conn.backup(target, pages=-1)
+    os.replace(tmp_path, target_path)
+
+    backups = sorted(entry for entry in os.listdir(backup_dir)
+                     if entry.startswith('buycarr-') and entry.endswith('.db'))
+    for old in backups[:-keep] if keep else []:
+        os.remove(os.path.join(backup_dir, old))
+
+    size = os.path.getsize(target_path) / (1024 * 1024)
+    return target_path, f'{target_path} ({size:.1f} MB, {restarts} recomeços)'
+
+
+def check(conn, backup_path, full):
+    if backup_path:
+        # O backup é uma cópia fiel das páginas: checá-lo valida o banco sem segurar o lock de leitura
+        with closing(sqlite3.connect(backup_path)) as copy:
+            result = [row[0] for row in copy.execute('PRAGMA integrity_check')]
+        target = 'integrity_check no backup'
+    else:
+        check_pragma = 'integrity_check' if full else 'quick_check'
+        result = [row[0] for row in conn.execute(f'PRAGMA {check_pragma}')]
+        target = f'{check_pragma} no banco em uso'
+    if result != ['ok']:
+        raise RuntimeError(f"{target}: {'; '.join(result[:20])}")
+    return f'{target}: ok'
+
+
+def vacuum(conn):
+    page_size = pragma(conn, 'page_size')
+    mode = pragma(conn, 'auto_vacuum')
+    free = pragma(conn, 'freelist_count')
+    if mode != 2:  # 0 = NONE, 1 = FULL, 2 = INCREMENTAL
+        return (f'auto_vacuum não é INCREMENTAL; {free} páginas livres ({megabytes(free, page_size):.1f} MB) '
+                f'ficam no arquivo. Rode uma vez com --enable-incremental-vacuum')
+
+    freed = 0
+    while free > 0:
+        # Cada passo é uma transação de escrita curta; as rotas gravam entre um passo e outro.
+        # executescript roda a instrução até o fim: com execute() o pysqlite para na primeira
+        # página devolvida
+        conn.executescript(f'PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})')
+        remaining = pragma(conn, 'freelist_count')
+        if remaining >= free:
+            break
+        freed += free - remaining
+        free = remaining
+        time.sleep(VACUUM_STEP_SLEEP)
+    return f'{freed} páginas devolvidas ({megabytes(freed, page_size):.1f} MB), {free} livres restantes'
+
+
+def enable_incremental_vacuum(conn):
+    if pragma(conn, 'auto_vacuum') == 2:
+        return 'auto_vacuum já é INCREMENTAL'
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')  # reescreve o arquivo inteiro; bloqueia leituras e gravações enquanto roda
+    return f'auto_vacuum = {pragma(conn, "auto_vacuum")} (2 = INCREMENTAL)'
+
+
+def analyze(conn):
+    conn.execute(f'PRAGMA analysis_limit = {ANALYSIS_LIMIT}')
+    conn.execute('ANALYZE')
+    conn.execute('PRAGMA optimize')
+    tables = conn.execute('SELECT count(DISTINCT tbl) FROM sqlite_stat1').fetchone()[0]
+    return f'estatísticas de {tables} tabelas atualizadas'
+
+
+def run_task(name, function, *args):
+    started = time.perf_counter()
+    try:
+        result = function(*args)
+    except Exception as e:
+        log(f"❌ {name} falhou em {(time.perf_counter() - started) * 1000:.1f} ms: {e}")
+        return False, None
+    detail = result[1] if isinstance(result, tuple) else result
+    log(f"✅ {name} em {(time.perf_counter() - started) * 1000:.1f} ms: {detail}")
+    return True, result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Manutenção do banco SQLite do BuyCarr (pode rodar com a API no ar)')
+    parser.add_argument('tasks', nargs='*', metavar='tarefa', help=f"{', '.join(TASKS)} (padrão: todas)")
+    parser.add_argument('--backup-dir', default=os.getenv('BACKUP_DIR', os.path.join(INSTANCE_DIR, 'backups')))
+    parser.add_argument('--keep', type=int, default=7, help='backups mantidos (0 = todos)')
+    parser.add_argument('--full-check', action='store_true',
+                        help='integrity_check em vez de quick_check quando não há backup nesta execução')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='converte o banco para auto_vacuum=INCREMENTAL (VACUUM completo, bloqueia o banco)')
+    args = parser.parse_args()
+    unknown = set(args.tasks) - set(TASKS)
+    if unknown:
+        parser.error(f"tarefas desconhecidas: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main():
+    load_dotenv()
+    args = parse_args()
+    tasks = args.tasks or TASKS
+    path = database_path()
+    if not os.path.exists(path):
+        raise SystemExit(f'Banco não encontrado: {path}')
+
+    with maintenance_lock(f'{path}.maintenance.lock'), closing(connect(path)) as conn:
+        page_size = pragma(conn, 'page_size')
+        log(f"Banco {path}: {megabytes(pragma(conn, 'page_count'), page_size):.1f} MB, "
+            f"{pragma(conn, 'freelist_count')} páginas livres; tarefas: {', '.join(tasks)}")
+
+        ok = True
+        backup_path = None
+        if args.enable_incremental_vacuum:
+            ok &= run_task('enable-incremental-vacuum', enable_incremental_vacuum, conn)[0]
+        if 'backup' in tasks:
+            success, result = run_task('backup', backup, conn, args.backup_dir, args.keep)
+            ok &= success
+            backup_path = result[0] if success else None
+        if 'check' in tasks:
+            ok &= run_task('check', check, conn, backup_path, args.full_check)[0]
+        if 'vacuum' in tasks:
+            ok &= run_task('vacuum', vacuum, conn)[0]
+        if 'analyze' in tasks:
+            ok &= run_task('analyze', analyze, conn)[0]
+
+        log(f"Banco {path}: {megabytes(pragma(conn, 'page_count'), page_size):.1f} MB, "
+            f"{pragma(conn, 'freelist_count')} páginas livres")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,7 @@ import os
 # Adicionar o diretório atual ao path para importar os módulos
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app import app, db, Car
+from app import app, db, Car, DeletedCar, CarView, SavedSearchMatch, record_event, bump_inventory_version
 
 def delete_all_cars():
     """Elimina todos os carros do banco de dados"""
@@ -29,8 +29,17 @@ def delete_all_cars():
                 print("Operação cancelada")
                 return
             
-            # Excluir todos os carros
+            # Registrar tombstones para que os apps removam os carros na próxima sincronização
+            car_ids = [car_id for (car_id,) in db.session.query(Car.id)]
+            db.session.add_all([DeletedCar(car_id=car_id) for car_id in car_ids])
+            for car_id in car_ids:
+                record_event('car.deleted', car_id=car_id)
+            
+            # Excluir todos os carros (e as visualizações e os avisos de buscas salvas que apontam para eles)
+            SavedSearchMatch.query.delete()
+            CarView.query.delete()
             Car.query.delete()
+            bump_inventory_version()
             db.session.commit()
             
             print(f"✅ {car_count} carros excluídos com sucesso!")
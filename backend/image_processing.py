@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Normalização das imagens enviadas para backend/uploads
+
+Cada imagem é girada conforme a orientação EXIF, reduzida para caber em
+max_dimension e regravada em WebP (ou JPEG) sem metadados. O trabalho roda em
+um pool de processos, fora do caminho da requisição; este módulo não importa
+o app para que os processos do pool iniciem rápido.
+"""
+
+import base64
+import binascii
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow é opcional; sem ele as imagens são guardadas como chegaram
+    Image = None
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.heic', '.bmp', '.gif')
+FORMAT_EXTENSIONS = {'webp': '.webp', 'jpeg': '.jpg'}
+MIME_EXTENSIONS = {'image/jpeg': '.jpg', 'image/jpg': '.jpg', 'image/png': '.png', 'image/webp': '.webp',
+                   'image/gif': '.gif', 'image/bmp': '.bmp', 'image/heic': '.heic'}
+# Tipo servido em /uploads para cada extensão aceita (nunca adivinhado pelo nome do arquivo)
+EXTENSION_MIMETYPES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png', '.webp': 'image/webp',
+                       '.heic': 'image/heic', '.bmp': 'image/bmp', '.gif': 'image/gif'}
+# Originais aguardando conversão: <nome>.orig.<ext>
+PENDING_MARKER = '.orig'
+
+
+def output_extension(image_format):
+    return FORMAT_EXTENSIONS[image_format]
+
+
+def sniff_image_extension(data):
+    """Extensão pelo conteúdo (assinatura do formato), ou None se não for uma imagem aceita"""
+    if data.startswith(b'\xff\xd8\xff'):
+        return '.jpg'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return '.png'
+    if data.startswith((b'GIF87a', b'GIF89a')):
+        return '.gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return '.webp'
+    if data.startswith(b'BM'):
+        return '.bmp'
+    if data[4:8] == b'ftyp' and data[8:12] in (b'heic', b'heix', b'heim', b'heis', b'mif1', b'msf1'):
+        return '.heic'
+    return None
+
+
+def decode_data_uri(value):
+    """Retorna (bytes, extensão) de uma data URI de imagem em base64 (data:image/png;base64,...)
+
+    A extensão vem dos bytes, não do tipo declarado na URI: o que não for uma
+    imagem de verdade é recusado antes de chegar a uploads."""
+    header, separator, payload = value.partition(',')
+    if not separator or not header.startswith('data:') or not header.endswith(';base64'):
+        raise ValueError('Foto em base64 inválida')
+    if header[len('data:'):-len(';base64')].lower() not in MIME_EXTENSIONS:
+        raise ValueError('Tipo de imagem não suportado')
+    try:
+        # Quebras de linha são permitidas; qualquer outro caractere fora do alfabeto é erro
+        data = base64.b64decode(''.join(payload.split()), validate=True)
+    except binascii.Error:
+        raise ValueError('Foto em base64 inválida')
+    extension = sniff_image_extension(data)
+    if extension is None:
+        raise ValueError('Arquivo não é uma imagem válida')
+    if Image is not None and extension != '.heic':  # HEIC só com plugin; fica na assinatura
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image.verify()
+        except Exception:
+            raise ValueError('Arquivo não é uma imagem válida')
+    return data, extension
+
+
+def encode_image(data, max_dimension, quality, image_format):
+    """Retorna os bytes da imagem normalizada"""
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        if image_format == 'jpeg' or image.mode not in ('RGB', 'RGBA'):
+            has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+            if image_format == 'jpeg' and has_alpha:
+                # JPEG não tem transparência: compõe sobre fundo branco
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image.convert('RGBA'), mask=image.convert('RGBA'))
+                image = background
+            else:
+                image = image.convert('RGBA' if has_alpha else 'RGB')
+        output = io.BytesIO()
+        # Sem exif=/icc_profile=, o Pillow não copia metadados para o arquivo novo
+        options = {'method': 4} if image_format == 'webp' else {'optimize': True, 'progressive': True}
+        image.save(output, format=image_format.upper(), quality=quality, **options)
+        return output.getvalue()
+
+
+def transcode_file(source_path, target_path, max_dimension, quality, image_format):
+    """Converte source_path em target_path e remove o original.
+
+    Roda dentro do pool de processos. Retorna (bytes_antes, bytes_depois).
+    """
+    with open(source_path, 'rb') as file:
+        data = file.read()
+    encoded = encode_image(data, max_dimension, quality, image_format)
+    tmp_path = f'{target_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(encoded)
+    os.replace(tmp_path, target_path)
+    if os.path.abspath(source_path) != os.path.abspath(target_path):
+        os.remove(source_path)
+    return len(data), len(encoded)
+
+
+def measure_file(source_path, max_dimension, quality, image_format):
+    """Como transcode_file, mas sem gravar nada (usado no --dry-run)"""
+    with open(source_path, 'rb') as file:
+        data = file.read()
+    return len(data), len(encode_image(data, max_dimension, quality, image_format))
+
+
+class ImageTranscoder:
+    """Pool de processos criado sob demanda para converter uploads"""
+
+    def __init__(self, max_workers, max_dimension, quality, image_format):
+        self.max_workers = max_workers
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.image_format = image_format
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return Image is not None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: os workers do gunicorn têm threads, e fork com threads não é seguro
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def submit(self, source_path, target_path):
+        return self._get_pool().submit(transcode_file, source_path, target_path,
+                                       self.max_dimension, self.quality, self.image_format)
+
+    def shutdown(self):
+        """Espera as conversões pendentes (scripts chamam antes de sair)"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def submit_measure(self, source_path):
+        return self._get_pool().submit(measure_file, source_path,
+                                       self.max_dimension, self.quality, self.image_format)
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Teste de carga com o app rodando no gunicorn, como em produção
+
+Cria um banco SQLite temporário com carros, usuários e comentários, sobe o
+gunicorn (gthread) e o worker.py sobre ele e dispara usuários virtuais
+(asyncio, conexões HTTP/1.1 keep-alive) que repetem uma mistura de ações
+modelada nas telas do app:
+  - catalog      GET /api/cars/categories (tela inicial), GET /api/cars ou GET /api/cars?sort=trending
+  - detail       GET /api/cars/<id>/bundle (tela do carro)
+  - favorite     POST /api/favorites ou DELETE /api/favorites/<id> (coração)
+  - reservation  POST /api/reservations e GET /api/reservations
+  - comment      POST /api/cars/<id>/comments
+  - admin        GET /api/admin/stats e GET /api/admin/reservations (painel)
+
+A concorrência sobe em estágios (--stages). Para cada estágio são impressos a
+vazão, a taxa de erros e p50/p95/p99 por rota; o estágio a partir do qual a
+vazão para de crescer indica a saturação daquela configuração de workers.
+
+Uso: python load_test.py [--workers 2] [--threads 8] [--stages 1,5,10,20,40]
+                         [--duration 15] [--cars 300] [--users 100]
+                         [--mix catalog=40,detail=25,favorite=15,reservation=8,comment=7,admin=5]
+                         [--rate-limit] [--no-worker]
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ['catalog', 'detail', 'favorite', 'reservation', 'comment', 'admin']
+DEFAULT_MIX = 'catalog=40,detail=25,favorite=15,reservation=8,comment=7,admin=5'
+BRANDS = ['Toyota', 'Honda', 'Nissan', 'Mazda', 'Ford', 'Hyundai', 'Mitsubishi', 'Isuzu']
+TYPES = ['Sedan', 'SUV', 'Camioneta', 'Hatchback', 'Caminhão']
+# Abaixo disso um estágio não conta como ganho de vazão em relação ao anterior
+SATURATION_GAIN = 1.05
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Teste de carga do BuyCarr no gunicorn')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--stages', default='1,5,10,20,40', help='usuários virtuais simultâneos por estágio')
+    parser.add_argument('--duration', type=float, default=15, help='segundos por estágio')
+    parser.add_argument('--cars', type=int, default=300)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='peso de cada ação (tela)')
+    parser.add_argument('--rate-limit', action='store_true',
+                        help='mantém o limite de requisições (desligado por padrão: todo o tráfego vem de 127.0.0.1)')
+    parser.add_argument('--no-worker', action='store_true', help='não inicia o worker.py da fila de jobs')
+    args = parser.parse_args()
+    args.stages = [int(value) for value in args.stages.split(',')]
+    args.mix = {name: float(weight) for name, weight in (item.split('=') for item in args.mix.split(','))}
+    unknown = set(args.mix) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"ações desconhecidas em --mix: {', '.join(sorted(unknown))}")
+    return args
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed(env, car_count, user_count):
+    """Popula o banco temporário e devolve (ids dos carros, tokens dos usuários, token do admin).
+
+    Roda num subprocesso com o mesmo ambiente do gunicorn, para que este processo
+    não importe o app (pool de imagens, caches) e fique só com o cliente HTTP.
+    """
+    script = '''
+import json, random, sys
+from app import app, db, Car, Comment, User, bump_inventory_version
+from flask_jwt_extended import create_access_token
+from werkzeug.security import generate_password_hash
+
+car_count, user_count = int(sys.argv[1]), int(sys.argv[2])
+brands, types = json.loads(sys.argv[3]), json.loads(sys.argv[4])
+rng = random.Random(42)
+with app.app_context():
+    cars = []
+    for i in range(car_count):
+        brand = rng.choice(brands)
+        cars.append(Car(
+            brand=brand, model=f'Modelo {rng.randint(1, 40)}', year=rng.randint(2005, 2024),
+            mileage=rng.randint(0, 250000), price=float(rng.randint(300, 5000) * 1000),
+            color=rng.choice(['Branco', 'Preto', 'Prata']), fuel_type=rng.choice(['Gasolina', 'Diesel']),
+            transmission=rng.choice(['Manual', 'Automático']), car_type=rng.choice(types),
+            description=f'{brand} em bom estado, revisões em dia. Ref {i}.',
+            images=f'["/uploads/{i:08d}-a.webp", "/uploads/{i:08d}-b.webp"]'))
+    # Mesmo hash para todos: gerar um por usuário levaria minutos
+    password_hash = generate_password_hash('123456')
+    users = [User(name=f'Usuário {i}', email=f'carga{i}@teste.com', phone='11900000000',
+                  password_hash=password_hash) for i in range(user_count)]
+    db.session.add_all(cars + users)
+    bump_inventory_version()
+    db.session.flush()
+    for car in cars:
+        for _ in range(rng.randint(0, 5)):
+            db.session.add(Comment(user_id=rng.choice(users).id, car_id=car.id,
+                                   comment='Ótimo carro', rating=rng.randint(1, 5)))
+    db.session.commit()
+    admin = User.query.filter_by(is_admin=True).first()
+    print(json.dumps({
+        'car_ids': [car.id for car in cars],
+        'tokens': [create_access_token(identity=str(user.id)) for user in users],
+        'admin_token': create_access_token(identity=str(admin.id))
+    }))
+'''
+    result = subprocess.run(
+        [sys.executable, '-c', script, str(car_count), str(user_count), json.dumps(BRANDS), json.dumps(TYPES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return data['car_ids'], data['tokens'], data['admin_token']
+
+
+class HttpConnection:
+    """Cliente HTTP/1.1 mínimo com keep-alive sobre asyncio streams"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.reader = self.writer = None
+
+    async def request(self, method, path, token=None, body=None):
+        """Retorna (status, corpo em bytes)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Accept-Encoding: gzip',
+                 f'Content-Length: {len(payload)}']
+        if body is not None:
+            lines.append('Content-Type: application/json')
+        if token:
+            lines.append(f'Authorization: Bearer {token}')
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('conexão fechada pelo servidor')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            data = b''.join(chunks)
+        else:
+            data = await self.reader.readexactly(int(headers.get('content-length', 0)))
+
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        if headers.get('content-encoding') == 'gzip':
+            data = gzip.decompress(data)
+        return status, data
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {}  # rota -> [segundos]
+        self.errors = {}  # rota -> quantidade
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, route, elapsed, ok):
+        self.latencies.setdefault(route, []).append(elapsed)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    @property
+    def total(self):
+        return sum(len(values) for values in self.latencies.values())
+
+    @property
+    def throughput(self):
+        return self.total / ((self.finished or time.perf_counter()) - self.started)
+
+
+class VirtualUser:
+    def __init__(self, host, port, token, admin_token, car_ids, stats, rng):
+        self.connection = HttpConnection(host, port)
+        self.token = token
+        self.admin_token = admin_token
+        self.car_ids = car_ids
+        self.stats = stats
+        self.rng = rng
+        self.favorites = {}  # car_id -> favorite_id
+
+    async def call(self, route, method, path, token=None, body=None, expected=(200, 201)):
+        started = time.perf_counter()
+        try:
+            status, data = await self.connection.request(method, path, token, body)
+            ok = status in expected
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            await self.connection.close()
+            status, data, ok = None, b'', False
+        self.stats.record(route, time.perf_counter() - started, ok)
+        return status, data
+
+    async def catalog(self):
+        draw = self.rng.random()
+        if draw < 0.7:
+            await self.call('GET /api/cars/categories', 'GET', '/api/cars/categories')
+        elif draw < 0.9:
+            await self.call('GET /api/cars', 'GET', '/api/cars')
+        else:
+            await self.call('GET /api/cars?sort=trending', 'GET', '/api/cars?sort=trending')
+
+    async def detail(self):
+        car_id = self.rng.choice(self.car_ids)
+        await self.call('GET /api/cars/<id>/bundle', 'GET', f'/api/cars/{car_id}/bundle', self.token)
+
+    async def favorite(self):
+        car_id = self.rng.choice(self.car_ids)
+        favorite_id = self.favorites.pop(car_id, None)
+        if favorite_id is not None:
+            await self.call('DELETE /api/favorites/<id>', 'DELETE', f'/api/favorites/{favorite_id}', self.token)
+            return
+        status, data = await self.call('POST /api/favorites', 'POST', '/api/favorites', self.token,
+                                       {'car_id': car_id}, expected=(201, 400))
+        if status == 201:
+            self.favorites[car_id] = json.loads(data)['favorite_id']
+
+    async def reservation(self):
+        car_id = self.rng.choice(self.car_ids)
+        await self.call('POST /api/reservations', 'POST', '/api/reservations', self.token,
+                        {'car_id': car_id, 'message': 'Tenho interesse'})
+        await self.call('GET /api/reservations', 'GET', '/api/reservations', self.token)
+
+    async def comment(self):
+        car_id = self.rng.choice(self.car_ids)
+        await self.call('POST /api/cars/<id>/comments', 'POST', f'/api/cars/{car_id}/comments', self.token,
+                        {'comment': 'Carro muito bom', 'rating': self.rng.randint(1, 5)})
+
+    async def admin(self):
+        await self.call('GET /api/admin/stats', 'GET', '/api/admin/stats', self.admin_token)
+        await self.call('GET /api/admin/reservations', 'GET', '/api/admin/reservations', self.admin_token)
+
+    async def run(self, mix, deadline):
+        names, weights = list(mix), list(mix.values())
+        try:
+            while time.perf_counter() < deadline:
+                await getattr(self, self.rng.choices(names, weights)[0])()
+        finally:
+            await self.connection.close()
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def print_stage(concurrency, stats):
+    errors = sum(stats.errors.values())
+    print(f"\n=== {concurrency} usuários simultâneos: {stats.total} requisições, "
+          f"{stats.throughput:.1f} req/s, erros {errors / max(stats.total, 1):.2%} ===")
+    print(f"{'rota':<34}{'req':>7}{'erros':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route in sorted(stats.latencies):
+        values = sorted(stats.latencies[route])
+        print(f"{route:<34}{len(values):>7}{stats.errors.get(route, 0):>7}"
+              f"{percentile(values, 0.50) * 1000:>9.1f}{percentile(values, 0.95) * 1000:>9.1f}"
+              f"{percentile(values, 0.99) * 1000:>9.1f}")
+
+
+async def run_stage(port, concurrency, duration, mix, car_ids, tokens, admin_token, seed_base):
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+    users = [
+        VirtualUser('127.0.0.1', port, tokens[index % len(tokens)], admin_token, car_ids, stats,
+                    random.Random(seed_base + index))
+        for index in range(concurrency)
+    ]
+    await asyncio.gather(*(user.run(mix, deadline) for user in users))
+    stats.finished = time.perf_counter()
+    return stats
+
+
+async def wait_until_ready(port, process, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('o gunicorn encerrou durante a inicialização')
+        connection = HttpConnection('127.0.0.1', port)
+        try:
+            status, _ = await connection.request('GET', '/api/test')
+            if status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            await connection.close()
+        await asyncio.sleep(0.2)
+    raise RuntimeError('o gunicorn não respondeu a tempo')
+
+
+def stop_process(process):
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    args = parse_args()
+    tmp_dir = tempfile.mkdtemp(prefix='buycarr-load-')
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'load.db')}",
+               CATALOG_CACHE_DIR=os.path.join(tmp_dir, 'catalog_cache'),
+               RATE_LIMIT_DB=os.path.join(tmp_dir, 'rate_limits.db'),
+               PROFILE_DIR=os.path.join(tmp_dir, 'profiles'),
+               JWT_SECRET_KEY=uuid.uuid4().hex,
+               RATE_LIMIT_ENABLED='true' if args.rate_limit else 'false')
+    print(f"Banco temporário em {tmp_dir}")
+    print(f"Populando: {args.cars} carros, {args.users} usuários...")
+    car_ids, tokens, admin_token = seed(env, args.cars, args.users)
+
+    port = free_port()
+    log = open(os.path.join(tmp_dir, 'gunicorn.log'), 'w')
+    processes = [subprocess.Popen(
+        ['gunicorn', '--bind', f'127.0.0.1:{port}', '--worker-class', 'gthread',
+         '--workers', str(args.workers), '--threads', str(args.threads), 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )]
+    if not args.no_worker:
+        processes.append(subprocess.Popen([sys.executable, 'worker.py'], cwd=BACKEND_DIR, env=env,
+                                          stdout=log, stderr=subprocess.STDOUT))
+    print(f"gunicorn: {args.workers} workers x {args.threads} threads na porta {port} (log em {log.name})")
+
+    mix_total = sum(args.mix.values())
+    print('Mistura: ' + ', '.join(f'{name} {weight / mix_total:.0%}' for name, weight in args.mix.items()))
+
+    results = []
+    try:
+        asyncio.run(wait_until_ready(port, processes[0]))
+        for stage, concurrency in enumerate(args.stages):
+            stats = asyncio.run(run_stage(port, concurrency, args.duration, args.mix, car_ids, tokens,
+                                          admin_token, seed_base=stage * 10000))
+            print_stage(concurrency, stats)
+            results.append((concurrency, stats))
+    except KeyboardInterrupt:
+        print("\nInterrompido")
+    finally:
+        for process in processes:
+            stop_process(process)
+        log.close()
+
+    if not results:
+        return
+    print(f"\n{'usuários':>9}{'req/s':>10}{'erros':>9}{'p95 ms (todas)':>16}")
+    best = None
+    for concurrency, stats in results:
+        values = sorted(value for route_values in stats.latencies.values() for value in route_values)
+        errors = sum(stats.errors.values()) / max(stats.total, 1)
+        p95 = percentile(values, 0.95) * 1000 if values else 0
+        print(f"{concurrency:>9}{stats.throughput:>10.1f}{errors:>9.2%}{p95:>16.1f}")
+        if best is None or stats.throughput > best[1].throughput * SATURATION_GAIN:
+            best = (concurrency, stats)
+    print(f"\nVazão deixa de crescer a partir de {best[0]} usuários simultâneos "
+          f"(~{best[1].throughput:.0f} req/s com {args.workers} workers x {args.threads} threads)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Script para mover as fotos em base64 dos comentários para a pasta uploads
+
+Comentários antigos guardam a data URI inteira em Comment.photo. Este script
+decodifica cada uma, grava o arquivo em uploads (com a mesma conversão dos
+uploads novos) e troca a coluna pela URL. Processa em lotes, com commit a cada
+lote: se for interrompido, basta rodar de novo, pois só as linhas que ainda
+começam com "data:" são lidas e o nome do arquivo vem do conteúdo.
+
+Uso: python migrate_comment_photos.py [tamanho_do_lote]
+"""
+
+import sys
+import os
+
+# Adicionar o diretório atual ao path para importar os módulos
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, Comment, image_transcoder, save_base64_upload
+
+def photo_column_bytes():
+    return db.session.query(db.func.coalesce(db.func.sum(db.func.length(Comment.photo)), 0)).scalar()
+
+def migrate_comment_photos(batch_size=100):
+    with app.app_context():
+        pending = Comment.query.filter(Comment.photo.like('data:%')).count()
+        print(f"Encontrados {pending} comentários com foto em base64")
+        if pending == 0:
+            return
+
+        before = photo_column_bytes()
+        migrated = failed = 0
+        last_id = 0
+        while True:
+            batch = (Comment.query
+                     .filter(Comment.photo.like('data:%'), Comment.id > last_id)
+                     .order_by(Comment.id)
+                     .limit(batch_size)
+                     .all())
+            if not batch:
+                break
+
+            for comment in batch:
+                try:
+                    comment.photo = save_base64_upload(comment.photo)
+                    migrated += 1
+                except ValueError as e:
+                    # Foto ilegível: mantida como está, para não perder o dado
+                    print(f"❌ Comentário {comment.id}: {e}")
+                    failed += 1
+            last_id = batch[-1].id
+            db.session.commit()
+            print(f"Lote até o comentário {last_id}: {migrated} migrados, {failed} com erro")
+
+        after = photo_column_bytes()
+        print(f"Coluna photo: {before} -> {after} bytes")
+        print("Aguardando a conversão das imagens...")
+        image_transcoder.shutdown()
+        print(f"✅ {migrated} fotos movidas para uploads")
+
+if __name__ == "__main__":
+    migrate_comment_photos(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
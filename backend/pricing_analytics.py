@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Estatísticas de preço para o painel administrativo, calculadas com NumPy
+
+Os dados chegam como um snapshot colunar (um array por coluna) montado uma vez
+por versão do inventário; todas as agregações por grupo são vetorizadas, sem
+iterar linha a linha.
+"""
+
+import numpy as np
+
+# Faixas de quilometragem das curvas de depreciação
+DEFAULT_MILEAGE_BINS = [0, 25000, 50000, 100000, 150000, 200000]
+GROUP_COLUMNS = ('brand', 'model', 'year')
+SECONDS_PER_DAY = 86400.0
+
+
+def build_snapshot(car_rows, sale_rows):
+    """Monta o snapshot colunar.
+
+    car_rows: tuplas (id, brand, model, year, mileage, price, status)
+    sale_rows: tuplas (brand, reservado_em, vendido_em) das reservas vendidas
+    """
+    car_columns = list(zip(*car_rows)) if car_rows else [()] * 7
+    sale_columns = list(zip(*sale_rows)) if sale_rows else [()] * 3
+
+    def text(values):
+        return np.array([(value or '').strip() for value in values], dtype=object)
+
+    reserved = np.array([value.timestamp() for value in sale_columns[1]], dtype=np.float64)
+    sold = np.array([value.timestamp() for value in sale_columns[2]], dtype=np.float64)
+
+    snapshot = {
+        'id': np.asarray(car_columns[0], dtype=np.int64),
+        'mileage': np.asarray(car_columns[4], dtype=np.float64),
+        'price': np.asarray(car_columns[5], dtype=np.float64),
+        'status': text(car_columns[6]),
+        'sale_days': (sold - reserved) / SECONDS_PER_DAY,
+    }
+    # Colunas de agrupamento viram códigos inteiros uma única vez por snapshot,
+    # para que os agrupamentos só ordenem inteiros
+    for column, values in (('brand', text(car_columns[1])),
+                           ('model', text(car_columns[2])),
+                           ('year', np.asarray(car_columns[3], dtype=np.int64)),
+                           ('sale_brand', text(sale_columns[0]))):
+        labels, codes = np.unique(values, return_inverse=True)
+        snapshot[f'{column}_labels'] = labels
+        snapshot[f'{column}_codes'] = codes.astype(np.int64)
+    return snapshot
+
+
+def grouped_quantiles(codes, values, quantiles):
+    """Quantis (interpolação linear) de values para cada código de grupo.
+
+    Retorna (códigos únicos, contagens, matriz len(códigos) x len(quantiles)).
+    """
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+    groups, starts, counts = np.unique(codes, return_index=True, return_counts=True)
+
+    results = np.empty((len(groups), len(quantiles)))
+    for column, quantile in enumerate(quantiles):
+        position = starts + quantile * (counts - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        fraction = position - low
+        results[:, column] = values[low] + (values[high] - values[low]) * fraction
+    return groups, counts, results
+
+
+def _encode_groups(snapshot, columns, mask):
+    """Combina uma ou mais colunas num único código inteiro por linha"""
+    codes = np.zeros(int(mask.sum()), dtype=np.int64)
+    labels = []
+    for column in columns:
+        present, inverse = np.unique(snapshot[f'{column}_codes'][mask], return_inverse=True)
+        codes = codes * len(present) + inverse
+        labels.append(snapshot[f'{column}_labels'][present])
+    return codes, labels
+
+
+def _decode_group(code, labels):
+    parts = []
+    for uniques in reversed(labels):
+        code, index = divmod(int(code), len(uniques))
+        value = uniques[index]
+        parts.append(int(value) if isinstance(value, np.integer) else value)
+    return list(reversed(parts))
+
+
+def price_distribution(snapshot, group_by, status=None):
+    """Mediana, quartis e contagem de preços por combinação de brand/model/year"""
+    mask = np.ones(len(snapshot['price']), dtype=bool)
+    if status:
+        mask &= snapshot['status'] == status
+    if not mask.any():
+        return []
+
+    codes, labels = _encode_groups(snapshot, group_by, mask)
+    groups, counts, stats = grouped_quantiles(codes, snapshot['price'][mask], [0.0, 0.25, 0.5, 0.75, 1.0])
+
+    results = []
+    for code, count, (minimum, q1, median, q3, maximum) in zip(groups, counts, stats):
+        entry = dict(zip(group_by, _decode_group(code, labels)))
+        entry.update({
+            'count': int(count),
+            'min': float(minimum),
+            'q1': float(q1),
+            'median': float(median),
+            'q3': float(q3),
+            'max': float(maximum),
+        })
+        results.append(entry)
+    results.sort(key=lambda entry: -entry['count'])
+    return results
+
+
+def depreciation_curves(snapshot, brand=None, bins=DEFAULT_MILEAGE_BINS):
+    """Preço mediano por faixa de quilometragem e inclinação (preço por km) por marca"""
+    mask = snapshot['mileage'] >= 0
+    if brand:
+        wanted = [code for code, label in enumerate(snapshot['brand_labels'])
+                  if label.lower() == brand.strip().lower()]
+        mask &= np.isin(snapshot['brand_codes'], wanted)
+    if not mask.any():
+        return []
+
+    mileage = snapshot['mileage'][mask]
+    price = snapshot['price'][mask]
+    brand_codes, labels = _encode_groups(snapshot, ('brand',), mask)
+    brands = labels[0]
+    edges = np.asarray(bins, dtype=np.float64)
+    bin_index = np.clip(np.searchsorted(edges, mileage, side='right') - 1, 0, len(edges) - 1)
+
+    # Regressão linear preço ~ km por marca, com somas agregadas por bincount
+    size = len(brands)
+    n = np.bincount(brand_codes, minlength=size).astype(np.float64)
+    sum_x = np.bincount(brand_codes, mileage, minlength=size)
+    sum_y = np.bincount(brand_codes, price, minlength=size)
+    sum_xy = np.bincount(brand_codes, mileage * price, minlength=size)
+    sum_xx = np.bincount(brand_codes, mileage * mileage, minlength=size)
+    variance = n * sum_xx - sum_x ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(variance > 0, (n * sum_xy - sum_x * sum_y) / variance, np.nan)
+
+    groups, counts, medians = grouped_quantiles(brand_codes * len(edges) + bin_index, price, [0.5])
+
+    curves = {index: [] for index in range(size)}
+    for code, count, (median,) in zip(groups, counts, medians):
+        brand_code, edge = divmod(int(code), len(edges))
+        curves[brand_code].append({
+            'mileage_from': int(edges[edge]),
+            'mileage_to': int(edges[edge + 1]) if edge + 1 < len(edges) else None,
+            'count': int(count),
+            'median_price': float(median),
+        })
+
+    results = []
+    for index in range(size):
+        results.append({
+            'brand': brands[index],
+            'count': int(n[index]),
+            'price_per_km': None if np.isnan(slope[index]) else float(slope[index]),
+            'curve': curves[index],
+        })
+    results.sort(key=lambda entry: -entry['count'])
+    return results
+
+
+def time_to_sale(snapshot):
+    """Dias entre a criação da reserva e a venda, no geral e por marca"""
+    days = snapshot['sale_days']
+    if len(days) == 0:
+        return {'overall': None, 'by_brand': []}
+
+    def summary(count, q1, median, q3):
+        return {'count': int(count), 'q1_days': float(q1), 'median_days': float(median), 'q3_days': float(q3)}
+
+    overall = summary(len(days), *np.quantile(days, [0.25, 0.5, 0.75]))
+    overall['mean_days'] = float(days.mean())
+
+    brands = snapshot['sale_brand_labels']
+    groups, counts, stats = grouped_quantiles(snapshot['sale_brand_codes'], days, [0.25, 0.5, 0.75])
+    by_brand = [
+        dict(brand=brands[code] or None, **summary(count, *row))
+        for code, count, row in zip(groups, counts, stats)
+    ]
+    by_brand.sort(key=lambda entry: -entry['count'])
+    return {'overall': overall, 'by_brand': by_brand}
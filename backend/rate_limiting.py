@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Limite de requisições (token bucket) compartilhado entre os workers do gunicorn
+
+Cada chave (política + IP ou usuário) tem um balde com até `capacity` fichas,
+reabastecido a `rate` fichas por segundo. O estado fica num arquivo SQLite
+próprio, separado do banco principal para que estas gravações não disputem o
+lock de escrita com as rotas. Cada verificação é um único UPSERT pela chave
+primária: o balde só é debitado se tiver ao menos uma ficha, e nesse caso o
+RETURNING devolve a linha; sem linha, a requisição foi recusada.
+"""
+
+import math
+import sqlite3
+import threading
+import time
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rate_bucket (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID
+'''
+
+TAKE_TOKEN = '''
+INSERT INTO rate_bucket (key, tokens, updated_at) VALUES (:key, :capacity - 1, :now)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = min(:capacity, tokens + (:now - updated_at) * :rate) - 1,
+    updated_at = :now
+WHERE min(:capacity, tokens + (:now - updated_at) * :rate) >= 1
+RETURNING tokens
+'''
+
+# Baldes cheios equivalem a baldes inexistentes; são apagados de tempos em tempos
+PRUNE_INTERVAL = 60  # segundos
+PRUNE_IDLE = 3600  # segundos sem uso depois dos quais o balde com certeza está cheio
+
+
+class RateLimiter:
+    """Token buckets num arquivo SQLite, com uma conexão por thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._last_prune = time.time()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # autocommit: cada UPSERT é sua própria transação, o lock dura só a instrução
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Perder os últimos débitos numa queda de energia só devolve algumas fichas
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, capacity, rate):
+        """Consome uma ficha do balde. Retorna (permitido, fichas_restantes, segundos_para_tentar_de_novo)"""
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(TAKE_TOKEN, {'key': key, 'capacity': capacity, 'rate': rate, 'now': now}).fetchone()
+        if now - self._last_prune > PRUNE_INTERVAL:
+            self._last_prune = now
+            conn.execute('DELETE FROM rate_bucket WHERE updated_at < ?', (now - PRUNE_IDLE,))
+        if row is not None:
+            return True, int(row[0]), 0
+
+        # Recusado: calcula quando a próxima ficha fica disponível
+        row = conn.execute('SELECT tokens, updated_at FROM rate_bucket WHERE key = ?', (key,)).fetchone()
+        available = min(capacity, row[0] + (now - row[1]) * rate) if row else capacity
+        return False, 0, max(1, math.ceil((1 - available) / rate))
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Perfil de uma única requisição, ativado sob demanda por um admin
+
+A requisição roda sob o cProfile (determinístico, só a thread da requisição) e
+cada instrução SQL executada nela é registrada com seu tempo. Ao final são
+gravados dois arquivos em PROFILE_DIR:
+  - <id>.prof: estatísticas do cProfile (pstats, snakeviz, gprof2dot...)
+  - <id>.json: rota, status, duração, as consultas SQL e as funções mais caras
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+from datetime import datetime
+
+PROFILE_ID_PATTERN = re.compile(r'^\d{8}T\d{12}-[0-9a-f]{8}$')
+TOP_FUNCTIONS = 30
+MAX_PARAMETERS_LENGTH = 500
+
+
+class RequestProfile:
+    def __init__(self, method, path, endpoint, user_id):
+        self.id = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.endpoint = endpoint
+        self.user_id = user_id
+        self.sql = []
+        self._sql_started = []
+        self._profiler = cProfile.Profile()
+        self._started = None
+        self.duration = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._profiler.enable()
+
+    def stop(self):
+        self._profiler.disable()
+        self.duration = time.perf_counter() - self._started
+
+    def sql_started(self):
+        self._sql_started.append(time.perf_counter())
+
+    def sql_finished(self, statement, parameters):
+        if not self._sql_started:
+            return
+        elapsed = time.perf_counter() - self._sql_started.pop()
+        self.sql.append({
+            'statement': ' '.join(statement.split()),
+            'parameters': repr(parameters)[:MAX_PARAMETERS_LENGTH],
+            'duration_ms': round(elapsed * 1000, 3)
+        })
+
+    def top_functions(self):
+        stats = pstats.Stats(self._profiler).stats
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+        return [{
+            'function': f'{name} ({os.path.basename(filename)}:{line})',
+            'calls': calls,
+            'total_ms': round(total * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3)
+        } for (filename, line, name), (_, calls, total, cumulative, _) in rows]
+
+    def save(self, profile_dir, status):
+        """Grava o .prof e o .json; retorna o resumo usado na listagem"""
+        self._profiler.dump_stats(os.path.join(profile_dir, f'{self.id}.prof'))
+        summary = {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'endpoint': self.endpoint,
+            'status': status,
+            'user_id': self.user_id,
+            'duration_ms': round(self.duration * 1000, 3),
+            'sql_count': len(self.sql),
+            'sql_ms': round(sum(query['duration_ms'] for query in self.sql), 3),
+            'created_at': datetime.utcnow().isoformat()
+        }
+        details = dict(summary, sql=self.sql, top_functions=self.top_functions())
+        tmp_path = os.path.join(profile_dir, f'{self.id}.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(details, file, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(profile_dir, f'{self.id}.json'))
+        return summary
+
+
+def list_profiles(profile_dir):
+    """Resumos dos perfis gravados, do mais recente para o mais antigo"""
+    profiles = []
+    for filename in sorted(os.listdir(profile_dir), reverse=True):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(profile_dir, filename), encoding='utf-8') as file:
+                details = json.load(file)
+        except (OSError, ValueError):
+            continue  # removido por outro worker durante a listagem
+        details.pop('sql', None)
+        details.pop('top_functions', None)
+        profiles.append(details)
+    return profiles
+
+
+def prune_profiles(profile_dir, keep):
+    """Mantém apenas os `keep` perfis mais recentes (o id começa pela data)"""
+    ids = sorted(filename[:-len('.json')] for filename in os.listdir(profile_dir) if filename.endswith('.json'))
+    for profile_id in ids[:-keep] if keep else ids:
+        for extension in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(profile_dir, profile_id + extension))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de predicados das buscas salvas
+
+Cada busca salva é um predicado do tipo
+    marca = X (opcional) E tipo = Y (opcional) E preço em [a, b] E ano em [c, d]
+(limites ausentes são abertos). Para um carro novo, em vez de testar todas as
+buscas, o índice:
+  1. olha só os baldes (marca, tipo) que podem casar: exato, só marca, só tipo
+     e nenhum dos dois;
+  2. em cada balde, consulta uma árvore de intervalos de preço, que devolve só
+     as buscas cujo intervalo contém o preço do carro;
+  3. confere o intervalo de ano de cada candidata.
+
+A árvore de cada balde é estática (reconstruída quando necessário); buscas
+adicionadas depois ficam numa lista pequena, varrida a cada consulta, até o
+balde ser reconstruído.
+"""
+
+import math
+import threading
+
+# Reconstrói o balde quando as buscas fora da árvore passam desta fração do total
+PENDING_FRACTION = 0.05
+PENDING_MIN = 64
+
+
+def normalize(value):
+    return value.strip().lower() if isinstance(value, str) and value.strip() else None
+
+
+class IntervalTree:
+    """Árvore de intervalos centrada (estática) sobre intervalos fechados [low, high]"""
+
+    __slots__ = ('center', 'by_low', 'by_high', 'left', 'right')
+
+    def __init__(self, intervals):
+        # intervals: lista de (low, high, item), não vazia
+        endpoints = sorted(point for low, high, _ in intervals for point in (low, high) if math.isfinite(point))
+        self.center = endpoints[len(endpoints) // 2] if endpoints else 0.0
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        self.by_low = sorted(here, key=lambda interval: interval[0])
+        self.by_high = sorted(here, key=lambda interval: interval[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def stab(self, point, out):
+        """Acrescenta a `out` os itens cujos intervalos contêm `point`"""
+        node = self
+        while node is not None:
+            if point < node.center:
+                for low, _, item in node.by_low:
+                    if low > point:
+                        break
+                    out.append(item)
+                node = node.left
+            elif point > node.center:
+                for _, high, item in node.by_high:
+                    if high < point:
+                        break
+                    out.append(item)
+                node = node.right
+            else:
+                out.extend(item for _, _, item in node.by_low)
+                return out
+        return out
+
+
+class Bucket:
+    def __init__(self):
+        self.searches = {}  # id -> (min_price, max_price, min_year, max_year)
+        self.tree = None
+        self.pending = []  # ids adicionados depois da última reconstrução
+        self.stale = 0  # ids removidos que a árvore ainda contém
+
+    def rebuild(self):
+        intervals = [(low, high, search_id) for search_id, (low, high, _, _) in self.searches.items()]
+        self.tree = IntervalTree(intervals) if intervals else None
+        self.pending = []
+        self.stale = 0
+
+    def needs_rebuild(self):
+        return len(self.pending) + self.stale > max(PENDING_MIN, PENDING_FRACTION * len(self.searches))
+
+    def match(self, price, year):
+        candidates = self.tree.stab(price, []) if self.tree is not None else []
+        candidates.extend(self.pending)
+        matched = set()
+        for search_id in candidates:
+            # Os limites vêm de searches: ids removidos ou readicionados depois da reconstrução
+            # podem estar na árvore com dados antigos
+            bounds = self.searches.get(search_id)
+            if bounds is not None and bounds[0] <= price <= bounds[1] and bounds[2] <= year <= bounds[3]:
+                matched.add(search_id)
+        return matched
+
+
+class SavedSearchIndex:
+    """Buscas salvas agrupadas por (marca, tipo), cada balde com sua árvore de preço"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # (marca ou None, tipo ou None) -> Bucket
+        self._keys = {}  # id -> chave do balde
+        self.last_id = 0  # maior id já carregado (carga incremental)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, search_id, brand=None, car_type=None, min_price=None, max_price=None,
+            min_year=None, max_year=None):
+        key = (normalize(brand), normalize(car_type))
+        bounds = (
+            -math.inf if min_price is None else float(min_price),
+            math.inf if max_price is None else float(max_price),
+            -math.inf if min_year is None else int(min_year),
+            math.inf if max_year is None else int(max_year),
+        )
+        with self._lock:
+            self._remove(search_id)
+            bucket = self._buckets.setdefault(key, Bucket())
+            bucket.searches[search_id] = bounds
+            bucket.pending.append(search_id)
+            self._keys[search_id] = key
+            self.last_id = max(self.last_id, search_id)
+
+    def remove(self, search_id):
+        with self._lock:
+            self._remove(search_id)
+
+    def _remove(self, search_id):
+        key = self._keys.pop(search_id, None)
+        if key is not None:
+            # A árvore ainda pode citar o id até a próxima reconstrução; match() confere em searches
+            bucket = self._buckets[key]
+            del bucket.searches[search_id]
+            bucket.stale += 1
+
+    def build(self):
+        """Reconstrói todas as árvores (depois da carga inicial)"""
+        with self._lock:
+            for bucket in self._buckets.values():
+                bucket.rebuild()
+
+    def match(self, brand, car_type, price, year):
+        """Ids das buscas salvas que o carro satisfaz"""
+        brand, car_type = normalize(brand), normalize(car_type)
+        price, year = float(price), int(year)
+        matched = []
+        with self._lock:
+            for key in {(brand, car_type), (brand, None), (None, car_type), (None, None)}:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    continue
+                if bucket.needs_rebuild():
+                    bucket.rebuild()
+                matched.extend(bucket.match(price, year))
+        return matched
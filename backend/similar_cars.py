@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Índice vetorizado (NumPy) para a recomendação de carros semelhantes
+
+Cada carro disponível ocupa uma linha de duas matrizes:
+  - numéricas: log(preço), ano, log(quilometragem)
+  - categóricas: códigos inteiros de car_type, fuel_type e transmission
+
+A distância é a soma ponderada das diferenças numéricas padronizadas (ao quadrado)
+mais um peso fixo por atributo categórico diferente, calculada para todas as linhas
+de uma vez.
+"""
+
+import threading
+
+import numpy as np
+
+# Pesos de preço, ano e quilometragem
+NUMERIC_WEIGHTS = np.array([2.0, 1.0, 1.0])
+# Pesos de car_type, fuel_type e transmission quando diferem
+CATEGORICAL_WEIGHTS = np.array([1.5, 0.5, 0.5])
+
+
+class SimilarCarsIndex:
+    """Matriz de atributos dos carros disponíveis, atualizada linha a linha"""
+
+    def __init__(self, capacity=1024):
+        self._lock = threading.RLock()
+        self._vocab = [{}, {}, {}]
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._numeric = np.zeros((capacity, 3), dtype=np.float64)
+        self._codes = np.zeros((capacity, 3), dtype=np.int32)
+        self._rows = {}  # car_id -> índice da linha
+        self._size = 0
+        self._scale = None
+
+    def _grow(self):
+        capacity = len(self._ids) * 2
+        self._ids = np.resize(self._ids, capacity)
+        self._numeric = np.resize(self._numeric, (capacity, 3))
+        self._codes = np.resize(self._codes, (capacity, 3))
+
+    def _code(self, column, value):
+        key = (value or '').strip().lower()
+        vocab = self._vocab[column]
+        if key not in vocab:
+            vocab[key] = len(vocab)
+        return vocab[key]
+
+    def encode(self, price, year, mileage, car_type, fuel_type, transmission):
+        numeric = (np.log1p(max(price or 0, 0)), year or 0, np.log1p(max(mileage or 0, 0)))
+        with self._lock:
+            codes = (self._code(0, car_type), self._code(1, fuel_type), self._code(2, transmission))
+        return numeric, codes
+
+    def __len__(self):
+        return self._size
+
+    def load(self, rows):
+        """Reconstrói o índice a partir de tuplas (id, preço, ano, km, car_type, fuel_type, transmission)"""
+        rows = list(rows)
+        with self._lock:
+            self._allocate(max(1024, len(rows) * 2))
+            if not rows:
+                return
+            count = len(rows)
+            columns = list(zip(*rows))
+            self._ids[:count] = np.asarray(columns[0], dtype=np.int64)
+            self._numeric[:count, 0] = np.log1p(np.clip(np.asarray(columns[1], dtype=np.float64), 0, None))
+            self._numeric[:count, 1] = np.asarray(columns[2], dtype=np.float64)
+            self._numeric[:count, 2] = np.log1p(np.clip(np.asarray(columns[3], dtype=np.float64), 0, None))
+            for column in range(3):
+                self._codes[:count, column] = [self._code(column, value) for value in columns[4 + column]]
+            self._rows = {int(car_id): row for row, car_id in enumerate(self._ids[:count])}
+            self._size = count
+
+    def upsert(self, car_id, price, year, mileage, car_type, fuel_type, transmission):
+        numeric, codes = self.encode(price, year, mileage, car_type, fuel_type, transmission)
+        with self._lock:
+            row = self._rows.get(car_id)
+            if row is None:
+                if self._size == len(self._ids):
+                    self._grow()
+                row = self._size
+                self._size += 1
+                self._rows[car_id] = row
+                self._ids[row] = car_id
+            self._numeric[row] = numeric
+            self._codes[row] = codes
+            self._scale = None
+
+    def remove(self, car_id):
+        with self._lock:
+            row = self._rows.pop(car_id, None)
+            if row is None:
+                return
+            # Move a última linha para o lugar da removida
+            last = self._size - 1
+            if row != last:
+                moved_id = int(self._ids[last])
+                self._ids[row] = moved_id
+                self._numeric[row] = self._numeric[last]
+                self._codes[row] = self._codes[last]
+                self._rows[moved_id] = row
+            self._size = last
+            self._scale = None
+
+    def query(self, numeric, codes, k, exclude_id=None):
+        """Retorna [(car_id, distância)] dos k carros mais próximos"""
+        with self._lock:
+            size = self._size
+            if size == 0:
+                return []
+            values = self._numeric[:size]
+            if self._scale is None:
+                std = values.std(axis=0)
+                self._scale = NUMERIC_WEIGHTS / np.where(std > 0, std, 1.0) ** 2
+            distances = ((values - np.asarray(numeric)) ** 2) @ self._scale
+            distances += (self._codes[:size] != np.asarray(codes)) @ CATEGORICAL_WEIGHTS
+            ids = self._ids[:size]
+
+            if exclude_id is not None and exclude_id in self._rows:
+                distances[self._rows[exclude_id]] = np.inf
+
+            k = min(k, size)
+            nearest = np.argpartition(distances, k - 1)[:k]
+            nearest = nearest[np.argsort(distances[nearest])]
+            return [(int(ids[row]), float(distances[row])) for row in nearest if np.isfinite(distances[row])]
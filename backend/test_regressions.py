@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Testes de regressão da API
+
+Chama as rotas com o test client do Flask sobre um banco SQLite temporário
+(nada do banco nem da pasta uploads de verdade é tocado). Cada teste cobre um
+defeito já corrigido; rode depois de mexer nas rotas envolvidas.
+
+Uso: python test_regressions.py [nome_do_teste ...]
+  Termina com código 1 se algum teste falhar. Também roda com pytest.
+"""
+
+import sys
+import os
+import io
+import base64
+import tempfile
+import threading
+import traceback
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+tmp_dir = tempfile.mkdtemp(prefix='buycarr-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'tests.db')}"
+os.environ['CATALOG_CACHE_DIR'] = os.path.join(tmp_dir, 'catalog_cache')
+os.environ['RATE_LIMIT_DB'] = os.path.join(tmp_dir, 'rate_limits.db')
+os.environ['PROFILE_DIR'] = os.path.join(tmp_dir, 'profiles')
+os.environ['RATE_LIMIT_ENABLED'] = 'false'  # os testes fazem mais logins do que o limite por minuto
+
+with redirect_stdout(io.StringIO()):
+    import app as app_module
+    from app import app, db, image_transcoder, enqueue_job, event_broker, EventOutbox, Job, JOB_HANDLERS, EVENT_RETENTION
+    import worker
+
+from rate_limiting import RateLimiter
+
+import flask_jwt_extended.view_decorators as jwt_view_decorators
+
+app.instance_path = tmp_dir  # partes dos uploads retomáveis
+app.config['UPLOAD_FOLDER'] = os.path.join(tmp_dir, 'uploads')
+os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+client = app.test_client()
+
+# PNG de 1x1 pixel
+PNG_BYTES = base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+HTML_BYTES = b'<html><script>alert(document.cookie)</script></html>'
+
+_tokens = {}
+
+
+def login(email='admin@buycarr.com', password='admin123'):
+    if email not in _tokens:
+        response = client.post('/api/auth/login', json={'email': email, 'password': password})
+        _tokens[email] = response.get_json()['access_token']
+    return {'Authorization': f'Bearer {_tokens[email]}'}
+
+
+def create_user(email):
+    client.post('/api/auth/register', json={'name': 'Cliente', 'email': email, 'phone': '11988887777',
+                                            'password': '123456', 'confirmPassword': '123456'})
+    return login(email, '123456')
+
+
+def create_car(**fields):
+    car = {'brand': 'Toyota', 'model': 'Corolla', 'year': 2020, 'mileage': 10000, 'price': 500000.0,
+           'color': 'Branco', 'fuel_type': 'Gasolina', 'transmission': 'Manual', 'car_type': 'Sedan', 'images': '[]'}
+    car.update(fields)
+    response = client.post('/api/cars', headers=login(), json=car)
+    assert response.status_code == 201, response.get_data(as_text=True)
+    return response.get_json()['car']
+
+
+def upload_files():
+    return set(os.listdir(app.config['UPLOAD_FOLDER']))
+
+
+# Uploads (user-039): nada além de imagens é gravado ou servido
+
+def test_comment_photo_rejects_non_image_extension():
+    user = create_user('foto-html@teste.com')
+    before = upload_files()
+    response = client.post('/api/comments', headers=user, content_type='multipart/form-data', data={
+        'comment': 'Ótimo', 'rating': '5', 'photo': (io.BytesIO(HTML_BYTES), 'x.html')})
+    assert response.status_code == 400, response.status_code
+    assert upload_files() == before
+
+
+def test_chunked_upload_rejects_non_image_extension():
+    user = create_user('upload-html@teste.com')
+    response = client.post('/api/uploads', headers=user, json={'filename': 'x.html', 'size': len(HTML_BYTES)})
+    assert response.status_code == 400, response.status_code
+
+
+def test_uploads_never_serve_pending_original():
+    folder = app.config['UPLOAD_FOLDER']
+    with open(os.path.join(folder, 'pendente.orig.png'), 'wb') as file:
+        file.write(HTML_BYTES)
+    with open(os.path.join(folder, 'pagina.html'), 'wb') as file:
+        file.write(HTML_BYTES)
+    wait, app_module.UPLOAD_PENDING_WAIT = app_module.UPLOAD_PENDING_WAIT, 0
+    try:
+        pending = client.get('/uploads/pendente.webp')
+        assert pending.status_code == 202, pending.status_code
+        assert b'<script>' not in pending.data
+        for url in ('/uploads/pendente.orig.png', '/uploads/pagina.html', '/uploads/inexistente.webp'):
+            response = client.get(url)
+            assert response.status_code == 404, (url, response.status_code)
+            assert response.headers.get('X-Content-Type-Options') == 'nosniff', url
+    finally:
+        app_module.UPLOAD_PENDING_WAIT = wait
+        os.remove(os.path.join(folder, 'pendente.orig.png'))
+        os.remove(os.path.join(folder, 'pagina.html'))
+
+
+def test_failed_transcode_removes_original():
+    user = create_user('foto-falsa@teste.com')
+    response = client.post('/api/comments', headers=user, content_type='multipart/form-data', data={
+        'comment': 'Ótimo', 'rating': '5', 'photo': (io.BytesIO(HTML_BYTES), 'foto.png')})
+    assert response.status_code == 201, response.status_code
+    image_transcoder.shutdown()  # espera a conversão (que falha: não é uma imagem)
+    photo = client.get(response.get_json()['photo'])
+    assert photo.status_code == 404, photo.status_code
+    assert b'<script>' not in photo.data
+    assert not [name for name in upload_files() if '.orig.' in name]
+
+
+def test_uploaded_image_is_served_as_image_with_nosniff():
+    user = create_user('foto-real@teste.com')
+    response = client.post('/api/comments', headers=user, content_type='multipart/form-data', data={
+        'comment': 'Ótimo', 'rating': '5', 'photo': (io.BytesIO(PNG_BYTES), 'foto.png')})
+    assert response.status_code == 201, response.status_code
+    image_transcoder.shutdown()
+    photo = client.get(response.get_json()['photo'])
+    assert photo.status_code == 200, photo.status_code
+    assert photo.mimetype.startswith('image/'), photo.mimetype
+    assert photo.headers.get('X-Content-Type-Options') == 'nosniff'
+
+
+
+# Categorias (user-032): reclassificação chega à sincronização e ao catálogo
+
+def test_category_backfill_reaches_sync_and_catalog():
+    car = create_car(model='Limite premium', car_type='Sedan', price=900000.0)
+    assert car['category'] == 'normal', car['category']
+    client.get('/api/cars')  # catálogo e fragmentos em cache com a categoria antiga
+    since = client.get('/api/cars/changes').get_json()['token']
+    threshold = app.config['PREMIUM_PRICE_THRESHOLD']
+    app.config['PREMIUM_PRICE_THRESHOLD'] = 800000.0
+    try:
+        with app.app_context():
+            app_module.backfill_car_categories()
+        changes = client.get(f'/api/cars/changes?since={since}').get_json()
+        changed = [item for item in changes['cars'] if item['id'] == car['id']]
+        assert changed and changed[0]['category'] == 'premium', changes
+        listed = [item for item in client.get('/api/cars').get_json()['cars'] if item['id'] == car['id']]
+        assert listed and listed[0]['category'] == 'premium', listed
+    finally:
+        app.config['PREMIUM_PRICE_THRESHOLD'] = threshold
+        with app.app_context():
+            app_module.backfill_car_categories()
+
+
+
+# Uploads em partes (user-040): retomada e validação da conclusão
+
+def upload_in_chunks(headers, data, chunk_size):
+    upload = client.post('/api/uploads', headers=headers, json={
+        'filename': 'foto.png', 'size': len(data), 'chunk_size': chunk_size}).get_json()
+    for index in range(0, (len(data) + chunk_size - 1) // chunk_size):
+        chunk = data[index * chunk_size:(index + 1) * chunk_size]
+        response = client.put(f"/api/uploads/{upload['upload_id']}/chunks/{index}", headers=headers, data=chunk,
+                              content_type='application/octet-stream')
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return upload['upload_id']
+
+
+def test_complete_upload_rejects_invalid_car_id():
+    upload_id = upload_in_chunks(login(), PNG_BYTES, 32)
+    for car_id in ('abc', '', [1], True, 1.5):
+        response = client.post(f'/api/uploads/{upload_id}/complete', headers=login(), json={'car_id': car_id})
+        assert response.status_code == 400, (car_id, response.status_code)
+        assert response.get_json()['error'] == 'car_id inválido'
+    response = client.post(f'/api/uploads/{upload_id}/complete', headers=login(), json={'car_id': 999999})
+    assert response.status_code == 404, response.status_code
+
+
+def test_chunked_upload_resumes_and_resyncs():
+    user = create_user('upload-partes@teste.com')
+    chunk_size = 16
+    upload = client.post('/api/uploads', headers=user, json={
+        'filename': 'foto.png', 'size': len(PNG_BYTES), 'chunk_size': chunk_size}).get_json()
+    url = f"/api/uploads/{upload['upload_id']}"
+    put = lambda index: client.put(f'{url}/chunks/{index}', headers=user, content_type='application/octet-stream',
+                                   data=PNG_BYTES[index * chunk_size:(index + 1) * chunk_size])
+    assert put(0).status_code == 200
+    # Parte repetida (resposta perdida) só é confirmada de novo; parte adiantada devolve 409 com o progresso
+    assert put(0).get_json()['offset'] == chunk_size
+    skipped = put(2)
+    assert skipped.status_code == 409 and skipped.get_json()['next_chunk'] == 1, skipped.get_json()
+    # Retomada: o progresso diz de onde continuar
+    progress = client.get(url, headers=user).get_json()
+    for index in range(progress['next_chunk'], (len(PNG_BYTES) + chunk_size - 1) // chunk_size):
+        assert put(index).status_code == 200
+    done = client.post(f'{url}/complete', headers=user)
+    assert done.status_code == 200, done.get_data(as_text=True)
+    assert done.get_json()['status'] == 'Concluído' and done.get_json()['url'].startswith('/uploads/')
+    incomplete = client.post('/api/uploads', headers=user, json={
+        'filename': 'foto.png', 'size': len(PNG_BYTES), 'chunk_size': chunk_size}).get_json()
+    assert client.post(f"/api/uploads/{incomplete['upload_id']}/complete", headers=user).status_code == 409
+
+
+
+# Fotos em base64 (user-041): só imagens de verdade, base64 estrito
+
+def test_base64_photo_must_be_a_real_image():
+    user = create_user('foto-base64@teste.com')
+    png = base64.b64encode(PNG_BYTES).decode()
+    cases = {
+        'data:image/png;base64,' + base64.b64encode(HTML_BYTES).decode(): 400,  # tipo declarado, bytes de HTML
+        'data:image/png;base64,' + png[:20] + '*<>' + png[20:]: 400,           # caracteres fora do base64
+        'data:text/html;base64,' + png: 400,
+        'data:image/jpeg;base64,' + png: 201,  # tipo declarado errado: a extensão vem dos bytes
+    }
+    for photo, status in cases.items():
+        before = upload_files()
+        response = client.post('/api/comments', headers=user, data={
+            'comment': 'Ótimo', 'rating': '5', 'photo_base64': photo})
+        assert response.status_code == status, (photo[:40], response.status_code, response.get_json())
+        if status == 400:
+            assert upload_files() == before, photo[:40]
+    image_transcoder.shutdown()
+    assert client.get(response.get_json()['photo']).status_code == 200
+
+
+
+# Lote (user-031): o token é verificado uma vez por lote, não por sub-requisição
+
+def test_batch_verifies_token_once():
+    user = create_user('lote@teste.com')
+    car = create_car(model='Lote')
+    requests = [{'id': 'me', 'path': '/api/auth/me'}, {'id': 'favoritos', 'path': '/api/favorites'},
+                {'id': 'reservas', 'path': '/api/reservations'}, {'id': 'bundle', 'path': f"/api/cars/{car['id']}/bundle"},
+                {'id': 'favoritar', 'method': 'POST', 'path': '/api/favorites', 'body': {'car_id': car['id']}}]
+    with mock.patch.object(jwt_view_decorators, 'decode_token', wraps=jwt_view_decorators.decode_token) as decode:
+        response = client.post('/api/batch', headers=user, json={'requests': requests})
+    assert response.status_code == 200, response.status_code
+    results = {item['id']: item for item in response.get_json()['responses']}
+    assert decode.call_count == 1, decode.call_count
+    assert all(item['status'] in (200, 201) for item in results.values()), results
+    assert results['me']['body']['user']['email'] == 'lote@teste.com', results['me']
+    assert results['bundle']['body']['user_state'] is not None
+
+
+def test_batch_without_token_keeps_routes_protected():
+    response = client.post('/api/batch', json={'requests': [
+        {'id': 'favoritos', 'path': '/api/favorites'}, {'id': 'catalogo', 'path': '/api/cars'}]})
+    results = {item['id']: item for item in response.get_json()['responses']}
+    assert results['favoritos']['status'] == 401, results['favoritos']
+    assert results['catalogo']['status'] == 200, results['catalogo']['status']
+    invalid = client.post('/api/batch', headers={'Authorization': 'Bearer invalido'},
+                          json={'requests': [{'path': '/api/favorites'}]})
+    assert invalid.status_code in (401, 422), invalid.status_code
+
+
+
+# Reservas e carros (user-026): transições condicionais e versão otimista
+
+def test_reservation_transitions_are_conditional():
+    admin = login()
+    first, second = create_user('reserva-1@teste.com'), create_user('reserva-2@teste.com')
+    car = create_car(model='Reserva')
+    reservation_ids = [client.post('/api/reservations', headers=user, json={'car_id': car['id']}).get_json()['reservation_id']
+                       for user in (first, second)]
+    confirmed = client.put(f'/api/admin/reservations/{reservation_ids[0]}/confirm', headers=admin, json={'version': 1})
+    assert confirmed.status_code == 200, confirmed.get_json()
+    assert confirmed.get_json()['cancelled_reservations'] == 1
+    # A outra reserva foi cancelada junto com a venda: confirmar ou cancelar de novo é conflito
+    for action in ('confirm', 'cancel'):
+        conflict = client.put(f'/api/admin/reservations/{reservation_ids[1]}/{action}', headers=admin, json={})
+        assert conflict.status_code == 409, (action, conflict.status_code)
+        assert conflict.get_json()['status'] == 'Cancelado', conflict.get_json()
+    again = client.put(f'/api/admin/reservations/{reservation_ids[0]}/confirm', headers=admin, json={})
+    assert again.status_code == 409 and again.get_json()['status'] == 'Vendido', again.get_json()
+
+
+
+def test_concurrent_confirmations_sell_the_car_once():
+    admin = login()
+    car = create_car(model='Reserva concorrente')
+    users = [create_user(f'concorrente-{index}@teste.com') for index in range(4)]
+    reservation_ids = [client.post('/api/reservations', headers=user, json={'car_id': car['id']}).get_json()['reservation_id']
+                       for user in users]
+    statuses = []
+    start = threading.Barrier(len(reservation_ids))
+
+    def confirm(reservation_id):
+        with app.test_client() as own_client:
+            start.wait()
+            response = own_client.put(f'/api/admin/reservations/{reservation_id}/confirm', headers=admin, json={})
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=confirm, args=(reservation_id,)) for reservation_id in reservation_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(statuses) == [200] + [409] * (len(reservation_ids) - 1), statuses
+    reservations = client.get('/api/admin/reservations', headers=admin).get_json()['reservations']
+    sold = [item for item in reservations if item['id'] in reservation_ids and item['status'] == 'Vendido']
+    assert len(sold) == 1, sold
+
+
+def test_reservation_stale_or_invalid_version_is_rejected():
+    admin, user = login(), create_user('reserva-versao@teste.com')
+    car = create_car(model='Reserva versão')
+    reservation_id = client.post('/api/reservations', headers=user, json={'car_id': car['id']}).get_json()['reservation_id']
+    url = f'/api/admin/reservations/{reservation_id}'
+    invalid = client.put(f'{url}/cancel', headers=admin, json={'version': 'abc'})
+    assert invalid.status_code == 400 and invalid.get_json()['error'] == 'Versão inválida', invalid.get_json()
+    stale = client.put(f'{url}/confirm', headers=admin, json={'version': 7})
+    assert stale.status_code == 409, stale.status_code
+    assert stale.get_json()['status'] == 'Pendente' and stale.get_json()['version'] == 1, stale.get_json()
+    assert client.put(f'{url}/cancel', headers=admin, json={'version': 1}).status_code == 200
+
+
+def test_car_update_checks_version():
+    admin = login()
+    car = create_car(model='Versão')
+    url = f"/api/cars/{car['id']}"
+    assert client.put(url, headers=admin, json={'version': 'abc'}).status_code == 400
+    updated = client.put(url, headers=admin, json={'version': car['version'], 'color': 'Preto'})
+    assert updated.status_code == 200, updated.get_json()
+    stale = client.put(url, headers=admin, json={'version': car['version'], 'color': 'Azul'})
+    assert stale.status_code == 409, stale.status_code
+    assert stale.get_json()['version'] == car['version'] + 1, stale.get_json()
+
+
+
+# Outbox de eventos (user-028): ids nunca reutilizados depois da limpeza
+
+def test_event_outbox_ids_survive_prune():
+    create_car(model='Evento 1')
+    create_car(model='Evento 2')
+    with app.app_context():
+        last_id = db.session.execute(db.select(db.func.max(EventOutbox.id))).scalar()
+        db.session.execute(db.update(EventOutbox).values(created_at=datetime.utcnow() - EVENT_RETENTION * 2))
+        db.session.commit()
+        event_broker._last_prune = 0
+        event_broker._prune()
+        # A limpeza mantém o evento mais recente (bancos antigos, sem AUTOINCREMENT)
+        remaining = db.session.execute(db.select(EventOutbox.id)).scalars().all()
+        assert remaining == [last_id], remaining
+        # Mesmo com a tabela vazia, o próximo id continua depois do último (AUTOINCREMENT)
+        db.session.execute(db.delete(EventOutbox))
+        db.session.commit()
+        app_module.record_event('car.updated', car_id=0, status='Disponível')
+        db.session.commit()
+        new_id = db.session.execute(db.select(db.func.max(EventOutbox.id))).scalar()
+        assert new_id > last_id, (new_id, last_id)
+
+
+
+# Fila de jobs (user-043): no máximo um job pendente por dedupe_key
+
+def jobs_with_key(dedupe_key):
+    return db.session.execute(
+        db.select(Job.status).where(Job.dedupe_key == dedupe_key).order_by(Job.id)
+    ).scalars().all()
+
+
+def test_job_dedupe_keeps_one_pending_job():
+    with app.app_context():
+        enqueue_job('tests.noop', dedupe_key='tests:dedupe')
+        enqueue_job('tests.noop', dedupe_key='tests:dedupe')
+        db.session.commit()
+        assert jobs_with_key('tests:dedupe') == ['Pendente']
+        # Em execução não conta: um commit novo agenda outra rodada
+        db.session.execute(db.update(Job).where(Job.dedupe_key == 'tests:dedupe').values(status='Executando'))
+        enqueue_job('tests.noop', dedupe_key='tests:dedupe')
+        db.session.commit()
+        assert jobs_with_key('tests:dedupe') == ['Executando', 'Pendente']
+
+
+def test_stale_job_with_pending_duplicate_is_not_requeued():
+    stale_at = datetime.utcnow() - worker.JOB_LOCK_TIMEOUT - timedelta(minutes=1)
+    with app.app_context():
+        for dedupe_key in ('tests:stale-twin', 'tests:stale-twin'):
+            enqueue_job('tests.noop', dedupe_key=dedupe_key)
+            db.session.execute(db.update(Job).where(Job.dedupe_key == dedupe_key, Job.status == 'Pendente')
+                               .values(status='Executando', locked_at=stale_at))
+        enqueue_job('tests.noop', dedupe_key='tests:stale-twin')
+        db.session.commit()
+        with redirect_stdout(io.StringIO()):
+            worker.maintenance()  # antes: IntegrityError no índice único de pendentes
+        assert jobs_with_key('tests:stale-twin') == ['Concluído', 'Concluído', 'Pendente']
+        
+        # Dois presos sem pendente: um volta para a fila, o outro fica concluído
+        for _ in range(2):
+            enqueue_job('tests.noop', dedupe_key='tests:stale-pair')
+            db.session.execute(db.update(Job).where(Job.dedupe_key == 'tests:stale-pair', Job.status == 'Pendente')
+                               .values(status='Executando', locked_at=stale_at))
+        db.session.commit()
+        with redirect_stdout(io.StringIO()):
+            worker.maintenance()
+        assert jobs_with_key('tests:stale-pair') == ['Pendente', 'Concluído']
+
+
+def test_failed_job_retry_yields_to_pending_duplicate():
+    def fail():
+        raise RuntimeError('falha de teste')
+    JOB_HANDLERS['tests.fail'] = fail
+    try:
+        with app.app_context():
+            enqueue_job('tests.fail', dedupe_key='tests:retry')
+            db.session.execute(db.update(Job).where(Job.dedupe_key == 'tests:retry')
+                               .values(status='Executando', locked_at=datetime.utcnow(), attempts=1))
+            enqueue_job('tests.fail', dedupe_key='tests:retry')
+            db.session.commit()
+            running = db.session.execute(
+                db.select(Job).where(Job.dedupe_key == 'tests:retry', Job.status == 'Executando')
+            ).scalar_one()
+            with redirect_stdout(io.StringIO()):
+                worker.run_job(running)
+            assert jobs_with_key('tests:retry') == ['Concluído', 'Pendente']
+    finally:
+        del JOB_HANDLERS['tests.fail']
+
+
+
+# Limite de requisições (user-044): baldes compartilhados entre workers
+
+def test_rate_limiter_is_shared_and_exact_under_concurrency():
+    path = os.path.join(tmp_dir, 'limiter-test.db')
+    workers = [RateLimiter(path), RateLimiter(path)]  # dois processos do gunicorn, mesmo arquivo
+    results = []
+    start = threading.Barrier(8)
+
+    def hit(limiter):
+        start.wait()
+        for _ in range(5):
+            results.append(limiter.hit('teste:concorrente', 10, 0.001)[0])
+
+    threads = [threading.Thread(target=hit, args=(workers[index % 2],)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 10, results.count(True)
+    allowed, remaining, retry_after = workers[0].hit('teste:concorrente', 10, 0.001)
+    assert not allowed and remaining == 0 and retry_after >= 1, (allowed, remaining, retry_after)
+    assert workers[1].hit('teste:outra-chave', 10, 0.001)[0]
+
+
+def test_rate_limit_counts_batch_sub_requests():
+    user = create_user('limite@teste.com')
+    capacity = app_module.RATE_LIMITS['comments'][0]
+    # Relógio parado: o balde não é reabastecido enquanto o teste roda
+    with mock.patch.dict(app.config, {'RATE_LIMIT_ENABLED': True}), \
+            mock.patch('rate_limiting.time.time', return_value=datetime.utcnow().timestamp()):
+        statuses = []
+        for _ in range(0, capacity + 1, app_module.BATCH_MAX_REQUESTS):
+            batch = client.post('/api/batch', headers=user,
+                                json={'requests': [{'path': '/api/comments'}] * app_module.BATCH_MAX_REQUESTS})
+            statuses += [item['status'] for item in batch.get_json()['responses']]
+        assert statuses[:capacity] == [200] * capacity and set(statuses[capacity:]) == {429}, statuses
+        # O balde é por usuário: fora do lote continua esgotado; sem token, o IP tem o próprio balde
+        direct = client.get('/api/comments', headers=user)
+        assert direct.status_code == 429 and int(direct.headers['Retry-After']) >= 1, direct.status_code
+        assert client.get('/api/comments', environ_base={'REMOTE_ADDR': '10.0.0.44'}).status_code == 200
+
+
+def main():
+    names = sys.argv[1:]
+    tests = [(name, test) for name, test in globals().items()
+             if name.startswith('test_') and callable(test) and (not names or name in names)]
+    failures = 0
+    for name, test in tests:
+        output = io.StringIO()
+        try:
+            with redirect_stdout(output):
+                test()
+        except Exception:
+            failures += 1
+            print(f"❌ {name}")
+            print(traceback.format_exc())
+        else:
+            print(f"✅ {name}")
+    image_transcoder.shutdown()
+    print(f"\nTestes: {len(tests)} | falhas: {failures}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Script para normalizar as imagens já existentes em backend/uploads
+
+Cada imagem é convertida para IMAGE_FORMAT (sem EXIF, no máximo
+IMAGE_MAX_DIMENSION px) usando o mesmo pool de processos do app, e as
+referências no banco (fotos de comentários, fotos de perfil e imagens dos
+carros) passam a apontar para o arquivo novo. No fim, imprime o relatório de
+bytes economizados.
+
+Uso: python transcode_uploads.py [--dry-run]
+  --dry-run  apenas calcula a economia, sem gravar nem alterar o banco
+"""
+
+import sys
+import os
+
+# Adicionar o diretório atual ao path para importar os módulos
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import (app, db, Car, Comment, User, image_transcoder, record_event, bump_inventory_version)
+from image_processing import IMAGE_EXTENSIONS, PENDING_MARKER, output_extension
+
+def find_images(upload_folder, target_extension):
+    """Arquivos de imagem ainda não normalizados"""
+    images = []
+    for filename in sorted(os.listdir(upload_folder)):
+        stem, extension = os.path.splitext(filename)
+        if extension.lower() not in IMAGE_EXTENSIONS or extension.lower() == target_extension:
+            continue
+        if stem.endswith(PENDING_MARKER):
+            continue  # conversão de upload em andamento
+        images.append(filename)
+    return images
+
+def update_references(renamed):
+    """Troca /uploads/<antigo> por /uploads/<novo> nas colunas que guardam URLs de imagens"""
+    changed_cars = 0
+    for old_name, new_name in renamed.items():
+        old_url, new_url = f'/uploads/{old_name}', f'/uploads/{new_name}'
+        Comment.query.filter_by(photo=old_url).update({'photo': new_url})
+        User.query.filter_by(profile_photo=old_url).update({'profile_photo': new_url})
+        for car in Car.query.filter(Car.images.contains(old_url)):
+            car.images = car.images.replace(old_url, new_url)
+            record_event('car.updated', car_id=car.id, status=car.status)
+            changed_cars += 1
+    if changed_cars:
+        bump_inventory_version()
+    db.session.commit()
+    return changed_cars
+
+def transcode_uploads(dry_run=False):
+    upload_folder = app.config['UPLOAD_FOLDER']
+    if not image_transcoder.available:
+        print("❌ Pillow não está instalado (pip install Pillow)")
+        return
+    if not os.path.isdir(upload_folder):
+        print(f"Pasta {upload_folder} não encontrada")
+        return
+
+    target_extension = output_extension(app.config['IMAGE_FORMAT'])
+    images = find_images(upload_folder, target_extension)
+    print(f"Encontradas {len(images)} imagens para converter em {upload_folder}")
+    print(f"Formato: {app.config['IMAGE_FORMAT']} | dimensão máxima: {app.config['IMAGE_MAX_DIMENSION']} px | "
+          f"qualidade: {app.config['IMAGE_QUALITY']}")
+
+    jobs = {}
+    claimed = set()
+    for filename in images:
+        source_path = os.path.join(upload_folder, filename)
+        new_name = os.path.splitext(filename)[0] + target_extension
+        if os.path.exists(os.path.join(upload_folder, new_name)) or new_name in claimed:
+            print(f"{filename}: {new_name} já existe, ignorado")
+            continue
+        claimed.add(new_name)
+        if dry_run:
+            jobs[filename] = (new_name, image_transcoder.submit_measure(source_path))
+        else:
+            jobs[filename] = (new_name, image_transcoder.submit(source_path, os.path.join(upload_folder, new_name)))
+
+    total_before = total_after = 0
+    renamed = {}
+    print(f"{'arquivo':<48}{'antes (KB)':>12}{'depois (KB)':>13}{'economia':>10}")
+    for filename, (new_name, future) in jobs.items():
+        try:
+            before, after = future.result()
+        except Exception as e:
+            print(f"{filename:<48}  erro: {e}")
+            continue
+        total_before += before
+        total_after += after
+        renamed[filename] = new_name
+        print(f"{filename:<48}{before / 1024:>12.1f}{after / 1024:>13.1f}{1 - after / before:>10.0%}")
+
+    if total_before:
+        print(f"{'TOTAL':<48}{total_before / 1024:>12.1f}{total_after / 1024:>13.1f}"
+              f"{1 - total_after / total_before:>10.0%}")
+        print(f"Bytes economizados: {total_before - total_after}")
+
+    if dry_run:
+        print("Simulação: nenhum arquivo ou registro foi alterado")
+        return
+
+    with app.app_context():
+        changed_cars = update_references(renamed)
+    print(f"✅ {len(renamed)} imagens convertidas, {changed_cars} carros atualizados")
+
+if __name__ == "__main__":
+    transcode_uploads(dry_run='--dry-run' in sys.argv[1:])
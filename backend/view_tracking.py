@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Contagem de visualizações dos carros com gravação adiada (write-behind)
+
+Abrir o detalhe de um carro só incrementa um contador na memória do worker.
+Uma thread por processo junta os contadores e, a cada `interval` segundos,
+entrega todos de uma vez para `flush` (em app.py, um único UPSERT em lote), de
+modo que a leitura do carro nunca disputa o lock de escrita do SQLite. Se a
+gravação falhar, os contadores voltam ao buffer e entram no próximo lote.
+
+A pontuação de "em alta" decai exponencialmente com meia-vida `half_life`:
+cada visualização vale 1 no momento em que acontece e metade depois de uma
+meia-vida. Cada linha guarda a pontuação no instante da última gravação e é
+decaída até o presente ao ser lida ou atualizada.
+"""
+
+import atexit
+import math
+import os
+import threading
+
+# Acima disso o buffer é gravado antes do intervalo, para não crescer sem limite
+MAX_PENDING_CARS = 5000
+
+
+def decay_factor(elapsed, half_life):
+    """Fração da pontuação que resta depois de `elapsed` segundos"""
+    return math.exp(-math.log(2) * max(elapsed, 0) / half_life)
+
+
+class ViewBuffer:
+    """Contadores de visualização por carro, gravados em lote por uma thread do processo"""
+
+    def __init__(self, flush, interval=5.0):
+        self._flush = flush
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._counts = {}
+        self._thread = None
+        self._pid = None
+
+    def __len__(self):
+        return len(self._counts)
+
+    def record(self, car_id):
+        with self._lock:
+            self._counts[car_id] = self._counts.get(car_id, 0) + 1
+            pending = len(self._counts)
+            # A thread não sobrevive ao fork: é iniciada no processo que recebe as visualizações
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='view-buffer', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+        if pending >= MAX_PENDING_CARS:
+            self._wake.set()
+
+    def flush(self):
+        """Grava os contadores pendentes agora. Retorna quantas visualizações foram gravadas."""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        if not counts:
+            return 0
+        try:
+            self._flush(counts)
+        except Exception:
+            # Devolve ao buffer; somam-se às visualizações que chegaram nesse meio tempo
+            with self._lock:
+                for car_id, views in counts.items():
+                    self._counts[car_id] = self._counts.get(car_id, 0) + views
+            raise
+        return sum(counts.values())
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erro ao gravar visualizações (nova tentativa em {self.interval:.0f} s): {e}")
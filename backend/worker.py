@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Worker da fila de jobs em segundo plano (tabela job)
+
+Roda ao lado do gunicorn (ver start.sh). As rotas só gravam o job na mesma
+transação da alteração (enqueue_job em app.py); este processo os executa:
+  - um job por vez, reservado com UPDATE condicional (vários workers podem rodar juntos)
+  - falhas são repetidas com backoff exponencial até JOB_MAX_ATTEMPTS
+  - jobs presos em "Executando" (worker morto no meio) voltam para a fila após JOB_LOCK_TIMEOUT
+  - as alterações no banco feitas pelo handler e o status "Concluído" entram no mesmo commit
+
+Uso: python worker.py [--once]
+  --once  executa os jobs prontos e sai (útil em cron ou testes)
+"""
+
+import sys
+import os
+import json
+import random
+import signal
+import time
+import traceback
+from datetime import datetime, timedelta
+
+# Adicionar o diretório atual ao path para importar os módulos
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, Job, JOB_HANDLERS
+
+JOB_POLL_INTERVAL = 1.0  # segundos entre consultas quando a fila está vazia
+JOB_MAX_ATTEMPTS = 5
+JOB_BACKOFF_BASE = 5  # segundos; dobra a cada tentativa
+JOB_BACKOFF_MAX = 3600
+JOB_LOCK_TIMEOUT = timedelta(minutes=5)
+JOB_RETENTION = timedelta(days=7)  # jobs concluídos são apagados depois disso
+MAINTENANCE_INTERVAL = 60  # segundos entre liberação de jobs presos e limpeza
+
+stopping = False
+
+def request_stop(signum, frame):
+    global stopping
+    stopping = True
+
+def backoff_delay(attempts):
+    delay = min(JOB_BACKOFF_BASE * 2 ** (attempts - 1), JOB_BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+def claim_next_job():
+    """Reserva o próximo job pronto. Retorna o Job ou None se a fila está vazia."""
+    while True:
+        now = datetime.utcnow()
+        job_id = db.session.execute(
+            db.select(Job.id)
+            .where(Job.status == 'Pendente', Job.run_at <= now)
+            .order_by(Job.run_at, Job.id)
+            .limit(1)
+        ).scalar()
+        if job_id is None:
+            db.session.commit()
+            return None
+
+        claimed = db.session.execute(
+            db.update(Job)
+            .where(Job.id == job_id, Job.status == 'Pendente')
+            .values(status='Executando', locked_at=now, attempts=Job.attempts + 1),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        if claimed.rowcount == 1:
+            return db.session.get(Job, job_id)
+        # Outro worker pegou este job primeiro: tentar o próximo
+
+def run_job(job):
+    handler = JOB_HANDLERS.get(job.job_type)
+    started = time.perf_counter()
+    try:
+        if handler is None:
+            raise LookupError(f'Nenhum handler para o tipo {job.job_type}')
+        handler(**json.loads(job.payload or '{}'))
+        job.status = 'Concluído'
+        job.finished_at = datetime.utcnow()
+        job.last_error = None
+        db.session.commit()
+        print(f"✅ Job {job.id} ({job.job_type}) concluído em {(time.perf_counter() - started) * 1000:.1f} ms")
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job.id)
+        job.last_error = ''.join(traceback.format_exception_only(type(e), e)).strip()[:2000]
+        if job.attempts >= JOB_MAX_ATTEMPTS:
+            job.status = 'Falhou'
+            job.finished_at = datetime.utcnow()
+            print(f"❌ Job {job.id} ({job.job_type}) falhou após {job.attempts} tentativas: {job.last_error}")
+        else:
+            # Volta para a fila; se já houver outro pendente com a mesma dedupe_key, aquele basta
+            duplicate = job.dedupe_key and db.session.execute(
+                db.select(Job.id).where(Job.dedupe_key == job.dedupe_key, Job.status == 'Pendente')
+            ).scalar()
+            job.status = 'Concluído' if duplicate else 'Pendente'
+            job.run_at = datetime.utcnow() + backoff_delay(job.attempts)
+            if duplicate:
+                job.finished_at = datetime.utcnow()
+            print(f"⚠️ Job {job.id} ({job.job_type}) falhou (tentativa {job.attempts}): {job.last_error}")
+        db.session.commit()
+
+def maintenance():
+    now = datetime.utcnow()
+    stale_jobs = db.session.execute(
+        db.select(Job).where(Job.status == 'Executando', Job.locked_at < now - JOB_LOCK_TIMEOUT).order_by(Job.id)
+    ).scalars().all()
+    released = 0
+    for job in stale_jobs:
+        # Mesma regra do retry em run_job: se já há um job pendente com a mesma dedupe_key, aquele
+        # basta (o índice único de pendentes impediria devolver este à fila)
+        duplicate = job.dedupe_key and db.session.execute(
+            db.select(Job.id).where(Job.dedupe_key == job.dedupe_key, Job.status == 'Pendente')
+        ).scalar()
+        if duplicate:
+            job.status = 'Concluído'
+            job.finished_at = now
+        else:
+            job.status = 'Pendente'
+            job.run_at = now
+            released += 1
+        db.session.flush()
+    db.session.execute(
+        db.delete(Job).where(Job.status == 'Concluído', Job.finished_at < now - JOB_RETENTION)
+    )
+    db.session.commit()
+    if released:
+        print(f"Jobs presos devolvidos à fila: {released}")
+
+def run_worker(once=False):
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    print(f"Worker de jobs iniciado (pid {os.getpid()}), handlers: {', '.join(sorted(JOB_HANDLERS))}")
+
+    last_maintenance = 0
+    with app.app_context():
+        while not stopping:
+            if time.time() - last_maintenance > MAINTENANCE_INTERVAL:
+                try:
+                    maintenance()
+                except Exception as e:
+                    # Não derruba o worker: a manutenção é tentada de novo no próximo intervalo
+                    db.session.rollback()
+                    print(f"❌ Erro na manutenção da fila: {e}")
+                last_maintenance = time.time()
+
+            job = claim_next_job()
+            if job is None:
+                if once:
+                    break
+                time.sleep(JOB_POLL_INTERVAL)
+                continue
+            run_job(job)
+            db.session.expunge_all()
+    print("Worker de jobs encerrado")
+
+if __name__ == "__main__":
+    run_worker(once='--once' in sys.argv[1:])
@@ -204,28 +204,14 @@ const CarCatalog = ({ authToken, showBrandMenu = false, onBrandMenuPress = null,
     
     console.log('🔍 Total de carros filtrados:', filteredCars.length);
     
-    const normalCars = filteredCars.filter(car => {
-      const carType = car.car_type ? car.car_type.toLowerCase() : '';
-      const isTruck = carType.includes('truck') || carType.includes('camioneta');
-      const isBus = carType.includes('bus') || carType.includes('ônibus');
-      return car.price < 1000000 && !isTruck && !isBus;
-    });
-    
-    const premiumCars = filteredCars.filter(car => {
-      const carType = car.car_type ? car.car_type.toLowerCase() : '';
-      const isTruck = carType.includes('truck') || carType.includes('camioneta');
-      const isBus = carType.includes('bus') || carType.includes('ônibus');
-      return car.price >= 1000000 && !isTruck && !isBus;
-    });
-    
-    const pickupTrucks = filteredCars.filter(car => {
-      const carType = car.car_type ? car.car_type.toLowerCase() : '';
-      return carType.includes('truck') || carType.includes('camioneta');
-    });
-    
-    const buses = filteredCars.filter(car => {
-      const carType = car.car_type ? car.car_type.toLowerCase() : '';
-      return carType.includes('bus') || carType.includes('ônibus');
+    // A categoria é calculada pelo backend (car.category); uma única passada agrupa os carros
+    const normalCars = [];
+    const premiumCars = [];
+    const pickupTrucks = [];
+    const buses = [];
+    const groups = { normal: normalCars, premium: premiumCars, pickup: pickupTrucks, bus: buses };
+    filteredCars.forEach(car => {
+      (groups[car.category] || normalCars).push(car);
     });
     
     console.log('📊 Carros por categoria:', {
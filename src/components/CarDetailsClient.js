@@ -33,6 +33,9 @@ const CarDetailsClient = ({ car, onClose, onReserve, onFavorite, authToken }) =>
   const [newComment, setNewComment] = useState('');
   const [rating, setRating] = useState(0);
   const [loadingComments, setLoadingComments] = useState(false);
+  const [commentsHasMore, setCommentsHasMore] = useState(false);
+  const [commentsTotal, setCommentsTotal] = useState(0);
+  const [loadingMoreComments, setLoadingMoreComments] = useState(false);
   const [adminContact, setAdminContact] = useState({
     phone: '11999999999',
     name: 'Administrador',
@@ -89,43 +92,57 @@ const CarDetailsClient = ({ car, onClose, onReserve, onFavorite, authToken }) =>
   
   console.log('🚗 Carro:', car.id, '- Imagens finais:', images.length);
 
-  // Buscar informações de contato do administrador
+  // Buscar contato do admin, comentários e estado de favorito numa única requisição
   useEffect(() => {
-    const fetchAdminContact = async () => {
-      try {
-        const response = await axios.get(`${API_BASE_URL}/admin/contact`);
-        if (response.status === 200) {
-          setAdminContact(response.data);
-        }
-      } catch (error) {
-        console.error('Erro ao buscar contato do admin:', error);
-        // Manter os valores padrão se houver erro
-      }
-    };
-
-    fetchAdminContact();
-  }, []);
-
-  // Buscar comentários do carro
-  useEffect(() => {
-    const fetchComments = async () => {
+    const fetchBundle = async () => {
       if (!car?.id) return;
       setLoadingComments(true);
       try {
-        const response = await axios.get(`${API_BASE_URL}/cars/${car.id}/comments`);
+        const response = await axios.get(`${API_BASE_URL}/cars/${car.id}/bundle`, {
+          headers: authToken ? { 'Authorization': `Bearer ${authToken}` } : {},
+        });
         if (response.status === 200) {
-          setComments(response.data);
+          setAdminContact(response.data.admin_contact);
+          setComments(response.data.comments);
+          setCommentsHasMore(response.data.comments_has_more);
+          setCommentsTotal(response.data.rating_summary.count);
+          if (response.data.user_state) {
+            setIsFavorited(response.data.user_state.is_favorite);
+            car.favorite_id = response.data.user_state.favorite_id;
+          }
         }
       } catch (error) {
-        console.error('Erro ao buscar comentários:', error);
+        console.error('Erro ao buscar dados do carro:', error);
+        // Manter os valores padrão se houver erro
       } finally {
         setLoadingComments(false);
       }
     };
 
-    fetchComments();
+    fetchBundle();
   }, [car?.id]);
 
+  // Próxima página de comentários, a partir do mais antigo já exibido
+  const handleLoadMoreComments = async () => {
+    if (loadingMoreComments || comments.length === 0) return;
+    setLoadingMoreComments(true);
+    try {
+      const response = await axios.get(`${API_BASE_URL}/cars/${car.id}/comments`, {
+        params: { before: comments[comments.length - 1].id, limit: 10 },
+      });
+      if (response.status === 200) {
+        const loadedIds = new Set(comments.map((comment) => comment.id));
+        setComments([...comments, ...response.data.comments.filter((comment) => !loadedIds.has(comment.id))]);
+        setCommentsHasMore(response.data.has_more);
+      }
+    } catch (error) {
+      console.error('Erro ao carregar mais comentários:', error);
+      Alert.alert('Erro', 'Não foi possível carregar mais comentários');
+    } finally {
+      setLoadingMoreComments(false);
+    }
+  };
+
   // Handler para salvar comentário
   const handleSubmitComment = async () => {
     if (!newComment.trim() || rating === 0) {
@@ -154,7 +171,8 @@ const CarDetailsClient = ({ car, onClose, onReserve, onFavorite, authToken }) =>
       );
 
       if (response.status === 201) {
-        setComments([...comments, response.data]);
+        setComments([response.data, ...comments]); // lista do mais recente para o mais antigo
+        setCommentsTotal(commentsTotal + 1);
         setNewComment('');
         setRating(0);
         Alert.alert('Sucesso', 'Comentário adicionado com sucesso!');
@@ -471,7 +489,7 @@ const CarDetailsClient = ({ car, onClose, onReserve, onFavorite, authToken }) =>
             onPress={() => setActiveTab('comments')}
           >
             <Text style={[styles.tabText, activeTab === 'comments' && styles.activeTabText]}>
-              Comentários ({comments.length})
+              Comentários ({Math.max(commentsTotal, comments.length)})
             </Text>
           </TouchableOpacity>
         </View>
@@ -561,7 +579,7 @@ const CarDetailsClient = ({ car, onClose, onReserve, onFavorite, authToken }) =>
 
             {/* Lista de comentários */}
             <View style={styles.commentsListContainer}>
-              <Text style={styles.sectionTitle}>Comentários ({comments.length})</Text>
+              <Text style={styles.sectionTitle}>Comentários ({Math.max(commentsTotal, comments.length)})</Text>
               
               {loadingComments ? (
                 <Text style={styles.loadingText}>Carregando comentários...</Text>
@@ -579,6 +597,18 @@ const CarDetailsClient = ({ car, onClose, onReserve, onFavorite, authToken }) =>
                   </View>
                 ))
               )}
+
+              {!loadingComments && commentsHasMore && (
+                <TouchableOpacity
+                  style={styles.loadMoreCommentsButton}
+                  onPress={handleLoadMoreComments}
+                  disabled={loadingMoreComments}
+                >
+                  <Text style={styles.loadMoreCommentsText}>
+                    {loadingMoreComments ? 'Carregando...' : 'Carregar mais comentários'}
+                  </Text>
+                </TouchableOpacity>
+              )}
             </View>
           </>
         )}
@@ -1023,6 +1053,18 @@ const styles = StyleSheet.create({
     paddingHorizontal: 20,
     marginBottom: 20,
   },
+  loadMoreCommentsButton: {
+    paddingVertical: 12,
+    borderRadius: 10,
+    borderWidth: 1,
+    borderColor: '#FF6B00',
+    alignItems: 'center',
+  },
+  loadMoreCommentsText: {
+    color: '#FF6B00',
+    fontSize: 14,
+    fontWeight: '600',
+  },
   commentCard: {
     backgroundColor: '#1a1a1a',
     borderRadius: 10,
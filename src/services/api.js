@@ -156,6 +156,21 @@ export const carService = {
     }
   },
 
+  // Sincronização incremental: carros alterados e ids excluídos desde o token
+  // Sem token (ou com token expirado, status 410) o servidor devolve o catálogo completo
+  getCarChanges: async (since) => {
+    try {
+      const response = await api.get('/cars/changes', { params: since ? { since } : {} });
+      if (response.status === 410) {
+        const full = await api.get('/cars/changes');
+        return full.data;
+      }
+      return response.data;
+    } catch (error) {
+      throw error.response?.data || { error: 'Erro ao sincronizar carros' };
+    }
+  },
+
   // Obter detalhes de um carro
   getCarById: async (carId) => {
     try {
@@ -197,6 +212,92 @@ export const carService = {
   },
 };
 
+// Requisições em lote: várias chamadas numa única ida e volta HTTP (máx. 20)
+// Ex.: batchService.send([{ id: 'me', path: '/api/auth/me' }, { id: 'cars', path: '/api/cars' }])
+// Retorna um objeto { id: { status, body } }
+export const batchService = {
+  send: async (requests) => {
+    try {
+      const response = await api.post('/batch', { requests });
+      const results = {};
+      (response.data.responses || []).forEach((item) => {
+        results[item.id] = { status: item.status, body: item.body };
+      });
+      return results;
+    } catch (error) {
+      throw error.response?.data || { error: 'Erro ao executar requisições em lote' };
+    }
+  },
+};
+
+// Upload retomável de imagens: o arquivo vai em partes numeradas e, se uma parte
+// falhar, só ela é reenviada. Passe uploadId para retomar um upload interrompido.
+// Ex.: uploadService.uploadImage(uri, { carId: 3, onProgress: (sent, total) => {} })
+// Retorna { url, car } (car só quando carId é informado)
+const sha256Hex = async (blob) => {
+  const subtle = globalThis.crypto?.subtle;
+  if (!subtle) return null; // sem WebCrypto (React Native): o servidor apenas confere o tamanho
+  const digest = await subtle.digest('SHA-256', await blob.arrayBuffer());
+  return Array.from(new Uint8Array(digest)).map((b) => b.toString(16).padStart(2, '0')).join('');
+};
+
+// A instância api não rejeita respostas 4xx (validateStatus): aqui elas viram erro
+const expectOk = (response) => {
+  if (response.status >= 200 && response.status < 300) return response.data;
+  const error = new Error(`Falha no upload (status ${response.status})`);
+  error.response = response;
+  throw error;
+};
+
+export const uploadService = {
+  uploadImage: async (uri, { carId, uploadId, chunkSize = 256 * 1024, maxRetries = 3, onProgress } = {}) => {
+    try {
+      const blob = await (await fetch(uri)).blob();
+      let session;
+      if (uploadId) {
+        session = expectOk(await api.get(`/uploads/${uploadId}`));
+      } else {
+        const extension = (blob.type.split('/')[1] || 'jpg').replace('jpeg', 'jpg');
+        session = expectOk(await api.post('/uploads', {
+          filename: `foto.${extension}`,
+          size: blob.size,
+          chunk_size: chunkSize,
+          sha256: await sha256Hex(blob),
+        }));
+      }
+
+      let failures = 0;
+      while (session.offset < session.size) {
+        const start = session.next_chunk * session.chunk_size;
+        const chunk = blob.slice(start, Math.min(start + session.chunk_size, session.size));
+        let response;
+        try {
+          response = await api.put(`/uploads/${session.upload_id}/chunks/${session.next_chunk}`, chunk, {
+            headers: { 'Content-Type': 'application/octet-stream' },
+          });
+        } catch (error) {
+          // Sem resposta ou erro 5xx: espera e pergunta ao servidor de onde continuar
+          if (++failures > maxRetries) throw error;
+          await new Promise((resolve) => setTimeout(resolve, 1000 * failures));
+          session = expectOk(await api.get(`/uploads/${session.upload_id}`));
+          continue;
+        }
+        if (response.status === 409 && response.data?.upload_id) {
+          session = response.data; // servidor informa de onde continuar
+          continue;
+        }
+        session = expectOk(response);
+        failures = 0;
+        onProgress?.(session.offset, session.size);
+      }
+
+      return expectOk(await api.post(`/uploads/${session.upload_id}/complete`, carId ? { car_id: carId } : {}));
+    } catch (error) {
+      throw error.response?.data || { error: 'Erro ao enviar imagem' };
+    }
+  },
+};
+
 // Função para testar conexão com a API
 export const testConnection = async () => {
   try {
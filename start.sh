@@ -1,5 +1,9 @@
 #!/bin/bash
 cd backend
-gunicorn --bind 0.0.0.0:$PORT app:app
-
-
+# O Render fica na frente do app: o IP do cliente (limite de requisições) vem de X-Forwarded-For
+export TRUSTED_PROXY_COUNT=${TRUSTED_PROXY_COUNT:-1}
+# Worker da fila de jobs (worker.py), reiniciado se cair; ao sair, o script encerra o grupo todo
+trap 'kill 0' EXIT
+(while true; do python worker.py; sleep 5; done) &
+# gthread: conexões SSE de longa duração (/api/admin/events) ocupam uma thread, não o worker inteiro
+gunicorn --bind 0.0.0.0:$PORT --worker-class gthread --threads ${GUNICORN_THREADS:-8} app:app